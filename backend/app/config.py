@@ -1,5 +1,10 @@
+from typing import Literal
+
+from pydantic import field_validator, model_validator
 from pydantic_settings import BaseSettings
 
+from app.services.concerns import resolve_concerns
+
 
 class Settings(BaseSettings):
     """Application settings from environment variables"""
@@ -12,7 +17,63 @@ class Settings(BaseSettings):
     # OpenAI API Configuration (for AI-powered skin analysis)
     openai_api_key: str | None = None
     openai_model: str = "gpt-4o-mini"
+    openai_base_url: str = "https://api.openai.com/v1"
+    openai_rpm: int = 500  # Requests per minute limit of the account tier (split across workers)
+    openai_tpm: int = 200_000  # Tokens per minute limit of the account tier (split across workers)
+    openai_max_retries: int = 4  # Retries on 429/5xx/transport errors
+    openai_request_deadline_s: float = 60.0  # Total budget per request incl. retries
     ai_analysis_enabled: bool = True  # Toggle to enable/disable AI analysis
+    ai_analysis_mode: Literal["fanout", "batched"] = "fanout"  # 1 GPT call per concern / 1 in total
+
+    # AI text cache (key: concern, model, prompt version, quantized scores)
+    ai_cache_enabled: bool = True
+    ai_cache_bucket_width: float = 5.0  # Score bucket width (0-100 scale)
+    ai_cache_max_entries: int = 1024  # In-memory LRU size, disk tier lives in results_dir
+    ai_cache_disk_max_bytes: int = 64 * 1024 * 1024  # Disk tier, least recently used trimmed first
+    ai_cache_max_age_s: int = 7 * 24 * 3600
+    ai_cache_janitor_interval_s: int = 3600
+
+    # Deadline mode: template texts first, GPT texts if they arrive within the budget
+    ai_text_budget_ms: int | None = None  # None = block the response on GPT
+    openai_stream: bool = False  # Stream late GPT texts field by field (requests with a budget)
+
+    # Precomputed AI text library (scripts/build_ai_text_library.py), loaded at startup
+    ai_text_library_path: str | None = None
+
+    # Startup warmup (models, synthetic inference, codecs); GET /api/ready is 503 until done
+    warmup_enabled: bool = True
+
+    # Per-stage timings: Server-Timing response header and GET /metrics (Prometheus)
+    metrics_enabled: bool = True
+    # Also record peak RSS / traced allocations per stage and request (tracemalloc, slow)
+    memory_tracking_enabled: bool = False
+
+    # Sampling profiler (results_dir/profiles, GET /api/admin/profiles)
+    profiling_enabled: bool = False
+    profile_sample_rate: float = 0.01  # Fraction of POST /api/analyze requests profiled
+    profile_header: str = "X-Debug-Profile"  # Profiles requests whose header value is the token
+    profile_token: str | None = None  # Required with profiling; also guards /api/admin/profiles
+    profile_interval_ms: float = 10.0
+    profile_max_files: int = 200
+
+    # Overlay rendering: "pil" (Image layers + alpha_composite) or "opencv" (fused uint8 kernels)
+    render_backend: Literal["pil", "opencv"] = "pil"
+    # Concern overlays: "images" (one JPEG per concern) or "layers" (UV-tinted base once plus
+    # a cropped alpha PNG per concern, composited by the frontend)
+    overlay_mode: Literal["images", "layers"] = "images"
+
+    # Default concern subset, comma-separated YouCam actions (e.g. "acne,pore"); None = all.
+    # Only these are requested from YouCam, rendered and analyzed (see services/concerns.py).
+    # Validated at startup and normalized to the actions in registry order
+    analysis_concerns: str | None = None
+
+    # Threads per process for mask decode and overlay/composite encode (services/codec_executor.py);
+    # None = CPUs available to the process (affinity, cgroup quota) / SERVER_WORKERS, 1 = sequential
+    codec_workers: int | None = None
+
+    # Production server (python -m app.server): prefork worker processes; more than one
+    # needs a shared RESULT_BACKEND (sqlite or redis), the memory store is per process
+    server_workers: int = 1
 
     # Development settings
     bypass_youcam: bool = False  # Bypass YouCam API for development (uses mock data)
@@ -22,6 +83,20 @@ class Settings(BaseSettings):
     results_dir: str = "/tmp/results"
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
 
+    # Result store (completed analyses served by GET /api/result/{task_id})
+    # "memory" (single worker), "sqlite" (one host) or "redis"
+    result_backend: Literal["memory", "sqlite", "redis"] = "memory"
+    redis_url: str = "redis://localhost:6379/0"
+    result_store_max_bytes: int = 512 * 1024 * 1024  # Raw image bytes + metadata (not redis)
+    result_store_ttl_s: int = 3600
+    result_store_max_entries: int = 1000
+
+    # Image artifacts on disk (results_dir/artifacts), served by GET /api/artifacts/{id}
+    artifacts_enabled: bool = True
+    artifact_max_bytes: int = 2 * 1024 * 1024 * 1024
+    artifact_max_age_s: int = 24 * 3600
+    artifact_janitor_interval_s: int = 600
+
     # CORS settings (will be parsed from comma-separated string)
     cors_origins: str = "http://localhost:5173,http://localhost:3000"
 
@@ -29,6 +104,28 @@ class Settings(BaseSettings):
         env_file = ".env"
         case_sensitive = False
 
+    @field_validator(
+        "ai_analysis_mode", "render_backend", "overlay_mode", "result_backend", mode="before"
+    )
+    @classmethod
+    def lowercase_choice(cls, value):
+        """Mode names are case-insensitive (RESULT_BACKEND=SQLite)"""
+        return value.lower() if isinstance(value, str) else value
+
+    @field_validator("analysis_concerns")
+    @classmethod
+    def check_analysis_concerns(cls, value: str | None) -> str | None:
+        """Unknown concern names fail at startup, not on every request"""
+        actions = resolve_concerns([value] if value else None)
+        return ",".join(actions) if actions else None
+
+    @model_validator(mode="after")
+    def check_profiling(self) -> "Settings":
+        """Profiles expose stacks and request paths: never without a token"""
+        if self.profiling_enabled and not self.profile_token:
+            raise ValueError("PROFILING_ENABLED requires PROFILE_TOKEN")
+        return self
+
     @property
     def cors_origins_list(self) -> list[str]:
         """Parse CORS origins from comma-separated string"""
@@ -1,13 +1,57 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.config import settings
+from app.middleware import ProfilingMiddleware, ServerTimingMiddleware
 from app.routes import api
+from app.services.ai_analysis_service import ai_analysis_service
+from app.services.ai_cache import ai_analysis_cache
+from app.services.artifact_store import artifact_store
+from app.services.metrics import stage_metrics
+from app.services.result_store import result_store
+from app.services.warmup import warmup, warmup_state
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks"""
+    # Precomputed AI texts (optional) - served before any OpenAI call
+    ai_analysis_service.load_library(settings.ai_text_library_path)
+    # Age/size janitor for image artifacts
+    janitor = asyncio.create_task(artifact_store.run_janitor(settings.artifact_janitor_interval_s))
+    # Age/size janitor for the disk tier of the AI text cache
+    if settings.ai_cache_enabled:
+        cache_janitor = asyncio.create_task(
+            ai_analysis_cache.run_janitor(settings.ai_cache_janitor_interval_s)
+        )
+    else:
+        cache_janitor = None
+    # Load MediaPipe and warm the render path in the background; /api/ready gates traffic
+    if settings.warmup_enabled:
+        warming = asyncio.create_task(warmup(warmup_state))
+    else:
+        warming = None
+        warmup_state.ready = True
+    yield
+    for task in (janitor, cache_janitor, warming):
+        if task is not None:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+    ai_analysis_service.close_library()
+    await ai_analysis_service.client.aclose()
+    await result_store.aclose()
+
 
 app = FastAPI(
     title="YouCam Skin Analysis API",
     description="Backend API for YouCam Skin Analysis integration",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -19,6 +63,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Server-Timing header with the pipeline stages of each request
+if settings.metrics_enabled:
+    app.add_middleware(ServerTimingMiddleware)
+
+# Opt-in sampling profiler for a fraction of analyses / requests with the debug header
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+
 # Include API routes
 app.include_router(api.router)
 
@@ -27,3 +79,11 @@ app.include_router(api.router)
 async def root():
     """Root endpoint"""
     return {"message": "YouCam Skin Analysis API", "docs": "/docs", "health": "/api/health"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: per-stage and per-concern duration histograms of this worker"""
+    return PlainTextResponse(
+        stage_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,102 @@
+"""ASGI middleware"""
+
+import time
+
+from app.config import settings
+from app.services.metrics import (
+    end_request_timings,
+    server_timing_header,
+    stage,
+    start_request_timings,
+)
+from app.services.profiler import request_profiler
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a Server-Timing header with the pipeline stages of the request.
+
+    Plain ASGI (no BaseHTTPMiddleware) so streaming responses pass through
+    untouched. Stages that finish after the headers were sent (late GPT
+    texts, event streams) still go to the /metrics histograms.
+
+    In memory tracking mode the whole request is a "request" stage and the
+    total entry carries its peak RSS / traced allocations.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings, token = start_request_timings()
+        request_stage = stage("request") if settings.memory_tracking_enabled else None
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                header = server_timing_header(
+                    timings,
+                    time.perf_counter() - started,
+                    request_stage.memory_so_far() if request_stage is not None else None,
+                )
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", header.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            if request_stage is None:
+                await self.app(scope, receive, send_with_timing)
+            else:
+                with request_stage:
+                    await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request_timings(token)
+
+
+class ProfilingMiddleware:
+    """
+    Samples the stacks of selected requests (see app.services.profiler).
+
+    The profile id is returned in the X-Profile-Id header; the profile is
+    written once the response has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not request_profiler.wants(scope):
+            await self.app(scope, receive, send)
+            return
+
+        started_profile = request_profiler.start()
+        if started_profile is None:
+            # Another request is being profiled
+            await self.app(scope, receive, send)
+            return
+
+        profile_id, sampler = started_profile
+        started = time.perf_counter()
+        meta = {"method": scope["method"], "path": scope["path"], "status": None}
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                meta["status"] = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"x-profile-id", profile_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            meta["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            if await request_profiler.finish(profile_id, sampler, meta):
+                print(f"Profiled {meta['method']} {meta['path']}: {profile_id}")
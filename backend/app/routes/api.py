@@ -1,17 +1,53 @@
-from fastapi import APIRouter, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+import json
+import os
+from typing import Literal
 
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+
+from app.config import settings
 from app.schemas import ResultResponse
+from app.services.ai_analysis_service import ai_analysis_service
+from app.services.ai_cache import ai_analysis_cache
+from app.services.artifact_store import MEDIA_TYPES, artifact_store
+from app.services.concerns import resolve_concerns
+from app.services.metrics import stage
+from app.services.profiler import request_profiler
+from app.services.result_events import follow_result_store, result_events
+from app.services.result_store import encode_result, result_store
+from app.services.warmup import warmup_state
 from app.services.youcam_service import youcam_service
 
 router = APIRouter(prefix="/api", tags=["skin-analysis"])
 
-# In-memory storage for results (in production, use Redis or database)
-results_cache: dict[str, dict] = {}
-
 
 @router.post("/analyze")
-async def analyze_skin(file: UploadFile = File(...)):
+async def analyze_skin(
+    file: UploadFile = File(...),
+    ai_mode: Literal["fanout", "batched"] | None = Query(
+        None, description="GPT call mode for this request (default: AI_ANALYSIS_MODE setting)"
+    ),
+    ai_budget_ms: int | None = Query(
+        None,
+        ge=0,
+        description="GPT latency budget in ms; template texts are returned for late concerns",
+    ),
+    ai_stream: bool | None = Query(
+        None,
+        description="Stream late GPT texts field by field on /api/result/{task_id}/stream "
+        "(requires ai_budget_ms or AI_TEXT_BUDGET_MS)",
+    ),
+    overlay_mode: Literal["images", "layers"] | None = Query(
+        None,
+        description="Concern overlays as one JPEG each, or one base image plus per-concern "
+        "alpha layers (default: OVERLAY_MODE setting)",
+    ),
+    concerns: list[str] | None = Query(
+        None,
+        description="Analyze only these concerns (YouCam actions, repeated or comma-separated, "
+        "e.g. acne,pore; default: ANALYSIS_CONCERNS setting or all)",
+    ),
+):
     """
     Upload an image and perform complete skin analysis.
 
@@ -19,6 +55,21 @@ async def analyze_skin(file: UploadFile = File(...)):
     - BYPASS_YOUCAM=true: Uses mock data + MediaPipe + GPT-4o-mini
     - BYPASS_YOUCAM=false: Uses real YouCam API + MediaPipe + GPT-4o-mini
 
+    The optional `ai_mode` query parameter selects per request whether GPT is
+    called once per concern ("fanout") or once for all concerns ("batched").
+    With `ai_budget_ms` (or AI_TEXT_BUDGET_MS), the response does not wait for
+    GPT past the budget: late concerns carry template texts, are listed in
+    `analysis_texts_pending`, and are replaced via GET /api/result/{task_id}.
+    Their progress can also be followed live on GET /api/result/{task_id}/stream
+    (field by field when `ai_stream` / OPENAI_STREAM is enabled).
+
+    With `overlay_mode=layers` (or OVERLAY_MODE) `concern_overlays` is empty:
+    the UV-tinted image comes once as `overlay_base` and every concern as a
+    small PNG in `overlay_layers`, placed and colored per `overlay_layer_info`.
+
+    With `concerns` (or ANALYSIS_CONCERNS) only that subset is requested from
+    YouCam, extracted, rendered and analyzed by GPT; unknown names are a 400.
+
     Returns complete analysis results (scores, overlays, AI analysis texts)
     """
     try:
@@ -26,6 +77,17 @@ async def analyze_skin(file: UploadFile = File(...)):
         if not file.content_type or not file.content_type.startswith("image/"):
             raise HTTPException(status_code=400, detail="File must be an image")
 
+        try:
+            selected_concerns = resolve_concerns(concerns)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Streaming only applies to late texts, i.e. with a latency budget
+        if ai_stream and ai_budget_ms is None and settings.ai_text_budget_ms is None:
+            raise HTTPException(
+                status_code=400, detail="ai_stream requires ai_budget_ms or AI_TEXT_BUDGET_MS"
+            )
+
         # Read file content
         content = await file.read()
 
@@ -35,13 +97,19 @@ async def analyze_skin(file: UploadFile = File(...)):
 
         # Perform complete analysis (respects BYPASS_YOUCAM setting)
         result = await youcam_service.analyze_image(
-            content, file.filename or "image.jpg", file.content_type
+            content,
+            file.filename or "image.jpg",
+            file.content_type,
+            ai_mode=ai_mode,
+            ai_budget_ms=ai_budget_ms,
+            ai_stream=ai_stream,
+            overlay_mode=overlay_mode,
+            concerns=selected_concerns,
         )
 
-        # Cache the result
-        results_cache[result["task_id"]] = result
-
-        return JSONResponse(content=result)
+        # The result is already in the result store (raw bytes), encode images for the response
+        with stage("encode"):
+            return JSONResponse(content=encode_result(result))
 
     except HTTPException:
         raise
@@ -59,67 +127,21 @@ async def get_result(task_id: str):
     """
     Get analysis results for a task
 
-    Polls YouCam API and returns results when ready
+    Polls YouCam API and returns results when ready. Concurrent requests for
+    the same task share a single poll/download/render.
     """
     try:
-        # Check if we've already completed this task
-        if task_id in results_cache and results_cache[task_id].get("status") == "completed":
-            return JSONResponse(content=results_cache[task_id])
-
-        # Poll the task
-        task_result = await youcam_service.poll_task(task_id, max_attempts=1, interval=0)
-
-        task_status = task_result.get("task_status")
-
-        if task_status == "success":  # YouCam v2 API returns 'success' not 'completed'
-            # Download and extract results
-            zip_url = task_result["results"]["url"]
-            scores, masks = await youcam_service.download_and_extract_zip(zip_url, task_id)
-
-            # Generate composite visualization
-            import base64
-
-            from app.services.image_processing import create_composite_visualization
-
-            composite_b64 = None
-
-            # Try to generate composite if we have original image cached
-            if task_id in results_cache and results_cache[task_id].get("original_image"):
-                try:
-                    original_b64 = results_cache[task_id]["original_image"]
-                    original_bytes = base64.b64decode(original_b64)
-
-                    composite_bytes = create_composite_visualization(original_bytes, masks, scores)
-                    composite_b64 = base64.b64encode(composite_bytes).decode("utf-8")
-                except Exception as e:
-                    print(f"Warning: Failed to create composite: {e}")
-                    # Fallback to original image
-                    composite_b64 = original_b64
-
-            # Convert masks to base64
-            masks_b64 = {
-                name: base64.b64encode(content).decode("utf-8") for name, content in masks.items()
-            }
-
-            result = {
-                "task_id": task_id,
-                "status": "completed",
-                "scores": scores,
-                "composite_image": composite_b64,
-                "masks": masks_b64,
-                "original_image": None,  # Don't send back to frontend (too large)
-            }
-
-            # Cache the result
-            results_cache[task_id] = result
-
-            return JSONResponse(content=result)
-
-        elif task_status == "error":  # YouCam v2 API returns 'error' not 'failed'
-            error = task_result.get("error", "Unknown error")
-            error_msg = task_result.get("error_message", "No error message")
+        result = await youcam_service.get_task_result(task_id)
+
+        if result["status"] == "completed":
+            with stage("encode"):
+                return JSONResponse(content=encode_result(result))
+        elif result["status"] == "failed":
             return ResultResponse(
-                task_id=task_id, status="failed", error=error, error_message=error_msg
+                task_id=task_id,
+                status="failed",
+                error=result["error"],
+                error_message=result["error_message"],
             )
         else:
             # Still processing
@@ -132,7 +154,148 @@ async def get_result(task_id: str):
         return ResultResponse(task_id=task_id, status="processing")
 
 
+@router.get("/result/{task_id}/stream")
+async def stream_result(task_id: str):
+    """
+    Server-Sent Events for analysis texts still being generated (deadline mode)
+
+    Events (JSON in `data`):
+    - field: {"concern", "field", "value"} - one GPT field as soon as it is complete
+    - analysis: {"concern", "analysis"} - complete GPT analysis replacing the template
+    - complete: no more events for this task
+
+    With several workers (RESULT_BACKEND sqlite/redis) a client connected to
+    another worker than the one running the task follows it in the result
+    store and receives analysis/complete events only.
+    """
+    events = result_events.subscribe(task_id)
+    if events is None and result_store.backend != "memory":
+        # Channel may be in another worker: follow the task in the shared result store
+        events = follow_result_store(task_id, result_store)
+
+    async def event_source():
+        if events is None:
+            # Nothing in flight for this task (unknown, blocking mode or already finished)
+            yield _sse_event({"type": "complete"})
+            return
+        async for event in events:
+            yield _sse_event(event)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, request: Request):
+    """
+    Serve a stored image artifact (URLs from `artifact_urls`)
+
+    Artifacts are content-addressed and never change: the ETag is the
+    content hash, If-None-Match answers 304 and Range requests are supported.
+    They show the user's face, so neither shared caches nor the browser's
+    disk cache may keep them (private, no-store).
+    """
+    path = artifact_store.path_for(artifact_id)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    digest, extension = artifact_id.split(".")
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-store"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, media_type=MEDIA_TYPES[extension], headers=headers)
+
+
+@router.get("/admin/ai-cache")
+async def ai_cache_stats():
+    """AI analysis cache statistics (hits, misses, entries)"""
+    stats = ai_analysis_cache.stats()
+    library = ai_analysis_service.library
+    stats["library"] = library.stats() if library is not None else None
+    return stats
+
+
+@router.get("/admin/results")
+async def result_store_stats():
+    """Result store statistics (entries, bytes, hits, evictions, coalesced polls)"""
+    stats = await result_store.stats()
+    flight = youcam_service.result_flight
+    stats["polls"] = {
+        "calls": flight.calls,
+        "coalesced": flight.coalesced,
+        "inflight": flight.inflight(),
+    }
+    return stats
+
+
+@router.get("/admin/artifacts")
+async def artifact_store_stats():
+    """Image artifact statistics (writes, dedup hits, janitor removals)"""
+    return artifact_store.stats()
+
+
+def require_profile_token(request: Request) -> None:
+    """Profile endpoints need the PROFILE_HEADER header set to PROFILE_TOKEN"""
+    value = request.headers.get(settings.profile_header)
+    if not request_profiler.check_token(value.encode("latin-1") if value is not None else None):
+        raise HTTPException(status_code=403, detail="Invalid or missing profile token")
+
+
+@router.get("/admin/profiles", dependencies=[Depends(require_profile_token)])
+async def list_profiles(limit: int = Query(50, ge=1, le=500)):
+    """Recent request profiles (sampling profiler, PROFILING_ENABLED), newest first"""
+    return {**request_profiler.stats(), "profiles": request_profiler.recent(limit)}
+
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_profile_token)])
+async def get_profile(profile_id: str):
+    """
+    Collapsed stacks of a profile
+
+    One "thread;frame;...;frame count" line per stack, the input format of
+    flamegraph.pl, speedscope and inferno.
+    """
+    path = request_profiler.path_for(profile_id)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+
+@router.get("/admin/openai")
+async def openai_client_metrics():
+    """OpenAI client metrics (throttling delay, retries, 429/5xx counts)"""
+    return ai_analysis_service.client.metrics()
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "ok", "service": "youcam-skin-analysis"}
+
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint for load balancers
+
+    503 until the startup warmup (MediaPipe models, synthetic inference,
+    render path) has finished, then 200. /api/health stays the liveness check.
+    """
+    if not warmup_state.ready:
+        return JSONResponse(
+            status_code=503, content={"status": "warming_up", "warmup": warmup_state.as_dict()}
+        )
+    return {"status": "ready", "warmup": warmup_state.as_dict()}
@@ -78,6 +78,7 @@ class AIAnalysisText(BaseModel):
     root_cause: str
     lifestyle_tips: list[str]
     product_ingredients: list[str]
+    source: str = "ai"  # "ai" (GPT) atau "template" (analysis_texts.py)
 
 
 class AnalysisResponse(BaseModel):
@@ -98,6 +99,17 @@ class LandmarkStatus(BaseModel):
     visualization_source: str = "none"  # "mediapipe", "mask_only", "none"
 
 
+class OverlayLayerInfo(BaseModel):
+    """Position and color of a concern layer (overlay_mode=layers)"""
+
+    x: int  # Offset of the layer in the overlay_base image
+    y: int
+    width: int
+    height: int
+    format: str  # "alpha" (grayscale PNG = alpha, drawn in `color`) or "rgba"
+    color: list[int] | None = None  # RGB for "alpha" layers
+
+
 class ResultResponse(BaseModel):
     """Response with complete analysis results"""
 
@@ -108,9 +120,16 @@ class ResultResponse(BaseModel):
     concern_overlays: dict[str, str] | None = (
         None  # concern_name -> base64 encoded overlay (landmark-enhanced)
     )
+    overlay_base: str | None = None  # base64 UV-tinted image the layers are drawn on
+    overlay_layers: dict[str, str] | None = None  # concern_name -> base64 PNG layer
+    overlay_layer_info: dict[str, OverlayLayerInfo] | None = None  # concern_name -> placement
+    concerns: list[str] | None = None  # Requested concern subset (None = all concerns)
     masks: dict[str, str] | None = None  # mask_name -> base64 encoded image
     original_image: str | None = None  # base64 encoded original image
+    # Same image fields as URLs under /api/artifacts/ (these are left out of the base64 fields)
+    artifact_urls: dict | None = None
     analysis_texts: dict[str, AIAnalysisText] | None = None  # AI-generated analysis texts
+    analysis_texts_pending: list[str] | None = None  # Concerns whose GPT text is still coming
     landmark_statuses: dict[str, LandmarkStatus] | None = None  # Status landmark per concern
     error: str | None = None
     error_message: str | None = None
@@ -0,0 +1,219 @@
+"""
+Production server: prefork workers sharing preloaded modules.
+
+`uvicorn --workers N` spawns N fresh interpreters that each import numpy,
+cv2, mediapipe and the app, so memory and startup time grow with N. This
+server imports all of that once in the master process, loads the static
+tables, freezes the GC (so collections in the workers do not touch the
+preloaded objects and un-share their pages) and then forks the workers,
+which share those pages copy-on-write and accept on one listening socket.
+
+MediaPipe graphs are not fork-safe: LandmarkService is only built inside
+each worker (lifespan warmup), never in the master.
+
+More than one worker needs a result store shared by the workers
+(RESULT_BACKEND=sqlite or redis); with the per-process memory store the
+server refuses to start.
+
+Usage (from backend/):
+    RESULT_BACKEND=sqlite python -m app.server --host 0.0.0.0 --port 8000 --workers 4
+"""
+
+import argparse
+import gc
+import importlib
+import os
+import resource
+import signal
+import socket
+import sys
+import time
+
+from app.config import settings
+
+# Heavy modules imported once in the master, in dependency order
+PRELOAD_MODULES = (
+    "numpy",
+    "PIL.Image",
+    "cv2",
+    "mediapipe",
+    "httpx",
+    "fastapi",
+    "app.services.landmark_service",
+    "app.services.image_processing",
+    "app.services.mock_data",
+    "app.services.analysis_texts",
+    "app.main",
+)
+
+# Seconds to wait before restarting a worker that exited
+RESTART_DELAY_S = 1.0
+
+
+def preload_modules() -> dict[str, float]:
+    """Import PRELOAD_MODULES, returning the import time of each in ms"""
+    timings = {}
+    for name in PRELOAD_MODULES:
+        started = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    return timings
+
+
+def preload_tables() -> int:
+    """Touch the static lookup tables so they are built before fork. Returns entry count."""
+    from app.services import analysis_texts, landmark_service
+
+    tables = (
+        landmark_service.FACIAL_ZONES,
+        landmark_service.CONCERN_ZONE_MAPPING,
+        landmark_service.SEVERITY_COLOR_LEVELS,
+        landmark_service.SEVERITY_THRESHOLDS,
+        landmark_service.CONCERN_COLORS,
+        landmark_service.HEATMAP_ZONE_COLORS,
+        landmark_service.EXCLUSION_ZONES,
+        landmark_service.ZONE_POLYGONS,
+        landmark_service.CONCERN_ZONE_POLYGONS,
+        analysis_texts.CONCERN_TEXTS,
+    )
+    return sum(len(table) for table in tables)
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Listening socket shared by all workers"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, log_level: str) -> None:
+    """Serve the preloaded app on the shared socket (runs in a forked child)"""
+    import uvicorn
+
+    from app.main import app
+
+    # Default handlers again; uvicorn installs its own for graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    config = uvicorn.Config(app, lifespan="on", log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int, log_level: str) -> int:
+    """Preload in the master, fork workers and restart them if they exit"""
+    started = time.perf_counter()
+    timings = preload_modules()
+    table_entries = preload_tables()
+
+    print("[server] Import times (ms):")
+    for name, ms in timings.items():
+        print(f"[server]   {name:<36} {ms:>8.1f}")
+    print(
+        f"[server] Preloaded {len(timings)} modules and {table_entries} table entries "
+        f"in {(time.perf_counter() - started) * 1000:.0f} ms, master max RSS {_max_rss_mb()} MB"
+    )
+
+    sock = bind_socket(host, port)
+    # Objects allocated so far are never collected in the workers, so their
+    # pages stay shared instead of being dirtied by GC bookkeeping
+    gc.collect()
+    gc.freeze()
+
+    children: dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(sock, log_level)
+            except BaseException as e:
+                print(f"[server] Worker {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+        print(f"[server] Started worker {pid}")
+
+    def stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"[server] Listening on {host}:{port} with {workers} worker(s)")
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.pop(pid, None)
+        if stopping:
+            continue
+        print(f"[server] Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+        time.sleep(RESTART_DELAY_S)
+        if not stopping:
+            spawn()
+
+    sock.close()
+    print("[server] Stopped")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prefork production server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.server_workers,
+        help="Worker processes (default: SERVER_WORKERS)",
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.workers > 1 and settings.result_backend == "memory":
+        # Polls, late AI texts and SSE of a task would land on workers that never saw it
+        parser.error(
+            "--workers > 1 needs a shared result store: set RESULT_BACKEND=sqlite or redis "
+            "(the memory store is per worker)"
+        )
+    # Per-process shares (OpenAI rate limits, codec threads) are sized from the
+    # worker count; set before app modules are imported (and for uvicorn's workers)
+    settings.server_workers = args.workers
+    os.environ["SERVER_WORKERS"] = str(args.workers)
+
+    if not hasattr(os, "fork"):
+        # No fork (Windows): plain uvicorn, each worker imports on its own
+        import uvicorn
+
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+        return 0
+
+    return serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,22 @@
 """AI-powered skin analysis service using OpenAI GPT-4o-mini"""
 
+import asyncio
+import inspect
 import json
-from typing import TypedDict
+import os
+from collections.abc import Awaitable, Callable
 
-import httpx
+from pydantic import TypeAdapter, ValidationError
+from typing_extensions import NotRequired, TypedDict  # pydantic needs these on py<3.12
 
 from app.config import settings
+from app.services.ai_cache import ai_analysis_cache
+from app.services.ai_text_library import AITextLibrary
+from app.services.analysis_texts import CONCERN_TEXTS, get_analysis_text
+from app.services.concerns import CONCERNS
+from app.services.incremental_json import IncrementalJSONParser
+from app.services.metrics import stage
+from app.services.openai_client import OpenAIClient, OpenAIError
 
 
 class AIAnalysisResult(TypedDict):
@@ -17,23 +28,39 @@ class AIAnalysisResult(TypedDict):
     root_cause: str
     lifestyle_tips: list[str]
     product_ingredients: list[str]
+    source: NotRequired[str]  # "ai", "library" atau "template" (diisi oleh service, bukan GPT)
 
 
-# Mapping dari key YouCam ke nama Indonesia
-CONCERN_NAMES = {
-    "oiliness": "Sebum/Minyak",
-    "pore": "Pori-Pori",
-    "age_spot": "Flek/Bintik Usia",
-    "wrinkle": "Keriput",
-    "acne": "Jerawat",
-    "dark_circle_v2": "Lingkaran Hitam",
-    "radiance": "Kecerahan Kulit",
-    "texture": "Tekstur Kulit",
-    "redness": "Kemerahan/Sensitivitas",
-    "firmness": "Kekencangan/Kolagen",
-    "moisture": "Kelembaban",
-    "eye_bag": "Kantung Mata",
-}
+_ANALYSIS_RESULT_ADAPTER = TypeAdapter(AIAnalysisResult)
+
+# Fields GPT generates (source is added by the service)
+ANALYSIS_FIELDS = (
+    "quantitative",
+    "precautions",
+    "recommendations",
+    "root_cause",
+    "lifestyle_tips",
+    "product_ingredients",
+)
+
+# on_field(concern_key, field_name, value) - streamed field as soon as it is complete
+FieldCallback = Callable[[str, str, object], None]
+
+# on_late_result(concern_key, analysis) - may be async, awaited before the next result
+LateResultCallback = Callable[[str, AIAnalysisResult | None], Awaitable[None] | None]
+
+# Mode pemanggilan GPT untuk generate_all_analyses
+# - "fanout": satu chat completion per concern (paralel)
+# - "batched": satu chat completion untuk semua concern, retry per concern jika invalid
+AI_ANALYSIS_MODES = ("fanout", "batched")
+
+# Naikkan versi ini setiap kali SYSTEM_PROMPT / template prompt berubah
+# agar cache AI tidak menyajikan teks dari prompt lama
+PROMPT_VERSION = "v1"
+
+
+# Mapping dari key YouCam ke nama Indonesia (concern dengan analisis AI)
+CONCERN_NAMES = {concern.action: concern.name for concern in CONCERNS if concern.name}
 
 SYSTEM_PROMPT = """Anda adalah ahli dermatologi dan skincare profesional. Tugas Anda adalah menganalisis hasil pemindaian kulit wajah dan memberikan analisis yang akurat, informatif, dan actionable dalam Bahasa Indonesia formal.
 
@@ -56,6 +83,32 @@ FORMAT OUTPUT (JSON):
 """
 
 
+BATCH_SYSTEM_PROMPT = """Anda adalah ahli dermatologi dan skincare profesional. Tugas Anda adalah menganalisis hasil pemindaian kulit wajah dan memberikan analisis yang akurat, informatif, dan actionable dalam Bahasa Indonesia formal untuk BEBERAPA kategori sekaligus.
+
+ATURAN PENTING:
+1. Gunakan Bahasa Indonesia formal dan direct
+2. Berikan analisis berdasarkan data score yang diberikan (0-100, semakin tinggi semakin baik)
+3. Jangan memberikan diagnosis medis spesifik
+4. Fokus pada edukasi dan rekomendasi perawatan yang aman
+5. Selalu rekomendasikan konsultasi dermatolog untuk kondisi serius
+6. Berikan analisis untuk SETIAP key kategori yang diminta, gunakan key persis seperti yang diberikan
+
+FORMAT OUTPUT (JSON):
+{
+    "analyses": {
+        "<key_kategori>": {
+            "quantitative": "Deskripsi kondisi kulit berdasarkan data (2-3 kalimat)",
+            "precautions": "Hal-hal yang perlu diwaspadai (2-3 kalimat)",
+            "recommendations": ["Rekomendasi 1", "Rekomendasi 2", "Rekomendasi 3"],
+            "root_cause": "Penyebab utama kondisi ini (1-2 kalimat)",
+            "lifestyle_tips": ["Tips gaya hidup 1", "Tips gaya hidup 2", "Tips gaya hidup 3"],
+            "product_ingredients": ["Bahan aktif 1", "Bahan aktif 2", "Bahan aktif 3"]
+        }
+    }
+}
+"""
+
+
 def format_scores_for_prompt(scores: dict) -> str:
     """Format YouCam scores into readable text for GPT prompt"""
     lines = []
@@ -80,6 +133,19 @@ def format_scores_for_prompt(scores: dict) -> str:
     return "\n".join(lines)
 
 
+def score_vector(scores: dict) -> list[float | None]:
+    """Ordered score values that feed the prompts (used as AI cache key)"""
+    all_score = scores.get("all")
+    vector = [
+        all_score.get("score") if isinstance(all_score, dict) else None,
+        scores.get("skin_age"),
+    ]
+    for key in CONCERN_NAMES:
+        score_data = scores.get(key)
+        vector.append(score_data.get("raw_score") if isinstance(score_data, dict) else None)
+    return vector
+
+
 def create_concern_prompt(concern_key: str, scores: dict) -> str:
     """Create prompt for specific concern analysis"""
     concern_name = CONCERN_NAMES.get(concern_key, concern_key)
@@ -104,6 +170,112 @@ Berikan response dalam format JSON yang valid."""
     return prompt
 
 
+def create_batch_prompt(concern_keys: list[str], scores: dict) -> str:
+    """Create a single prompt covering several concerns (batched mode)"""
+    all_scores_text = format_scores_for_prompt(scores)
+
+    focus_lines = []
+    for key in concern_keys:
+        score_data = scores.get(key, {})
+        raw_score = score_data.get("raw_score", 50) if isinstance(score_data, dict) else 50
+        focus_lines.append(f'- "{key}": {CONCERN_NAMES.get(key, key)} (Score: {raw_score:.1f}/100)')
+
+    focus_text = "\n".join(focus_lines)
+
+    prompt = f"""Analisis kondisi kulit untuk beberapa kategori sekaligus.
+
+DATA PEMINDAIAN KULIT:
+{all_scores_text}
+
+KATEGORI YANG HARUS DIANALISIS (key: nama):
+{focus_text}
+
+Berikan analisis lengkap untuk setiap kategori di atas dengan mempertimbangkan konteks score lainnya.
+Ingat: Score lebih tinggi = kondisi lebih baik.
+
+Berikan response dalam format JSON yang valid dengan object "analyses" yang di-key per kategori."""
+
+    return prompt
+
+
+def validate_analysis(data: object) -> AIAnalysisResult | None:
+    """Validate a parsed GPT entry against AIAnalysisResult, None if it does not match"""
+    try:
+        analysis = _ANALYSIS_RESULT_ADAPTER.validate_python(data)
+    except ValidationError:
+        return None
+    # source is set by the service, never trusted from GPT output
+    analysis.pop("source", None)
+    return analysis
+
+
+def template_analysis(concern_key: str, scores: dict) -> AIAnalysisResult | None:
+    """
+    Build an analysis from the curated texts in analysis_texts.py (fast tier).
+
+    Returns None for concerns without curated texts (e.g. moisture, eye_bag).
+    """
+    if concern_key not in CONCERN_TEXTS:
+        return None
+
+    score_data = scores.get(concern_key)
+    if not isinstance(score_data, dict):
+        return None
+    score = score_data.get("ui_score", score_data.get("raw_score"))
+    if score is None:
+        return None
+
+    text = get_analysis_text(concern_key, float(score))
+    return {
+        "quantitative": text["quantitative"],
+        "precautions": text["precautions"],
+        "recommendations": text["recommendations"],
+        "root_cause": "",
+        "lifestyle_tips": [],
+        "product_ingredients": [],
+        "source": "template",
+    }
+
+
+def _concern_keys(scores: dict, concerns: list[str] | None) -> list[str]:
+    """Concern dengan analisis AI yang ada di scores (dan di subset, jika ada)"""
+    return [key for key in CONCERN_NAMES if key in scores and (concerns is None or key in concerns)]
+
+
+def _tag_source(analysis: AIAnalysisResult, source: str) -> AIAnalysisResult:
+    """Tag an analysis with its origin, keeping a source already set (e.g. "library")"""
+    return {"source": source, **analysis}
+
+
+class _FieldFanout:
+    """
+    Streamed fields of one GPT call, passed to every caller waiting on it.
+
+    Callers that join while the call is streaming first receive the fields
+    emitted so far.
+    """
+
+    def __init__(self):
+        self._callbacks: list[FieldCallback] = []
+        self._emitted: list[tuple[str, str, object]] = []
+
+    def add(self, callback: FieldCallback) -> None:
+        for args in self._emitted:
+            callback(*args)
+        self._callbacks.append(callback)
+
+    def remove(self, callback: FieldCallback) -> None:
+        self._callbacks.remove(callback)
+
+    def __bool__(self) -> bool:
+        return bool(self._callbacks)
+
+    def __call__(self, concern_key: str, field: str, value: object) -> None:
+        self._emitted.append((concern_key, field, value))
+        for callback in list(self._callbacks):
+            callback(concern_key, field, value)
+
+
 class AIAnalysisService:
     """Service for generating AI-powered skin analysis using GPT-4o-mini"""
 
@@ -111,106 +283,483 @@ class AIAnalysisService:
         self.api_key = settings.openai_api_key
         self.model = settings.openai_model
         self.enabled = settings.ai_analysis_enabled and self.api_key is not None
-        self.base_url = "https://api.openai.com/v1/chat/completions"
+        self.mode = settings.ai_analysis_mode
+        self.cache = ai_analysis_cache if settings.ai_cache_enabled else None
+        self.library: AITextLibrary | None = None
+        self.client = OpenAIClient(
+            api_key=self.api_key,
+            base_url=settings.openai_base_url,
+            # Prefork workers each pace their share of the account limits
+            rpm=max(1, settings.openai_rpm // settings.server_workers),
+            tpm=max(1, settings.openai_tpm // settings.server_workers),
+            max_retries=settings.openai_max_retries,
+            default_deadline_s=settings.openai_request_deadline_s,
+        )
+        # Strong references to late GPT tasks (deadline mode) so they are not GC'd
+        self._background_tasks: set[asyncio.Task] = set()
+        # Cache key -> field callbacks of the callers waiting on that GPT call
+        self._field_fanouts: dict[str, _FieldFanout] = {}
+
+    def load_library(self, path: str | None) -> None:
+        """
+        Load the precomputed AI text library (see scripts/build_ai_text_library.py).
+
+        A missing file or a library built for another model / prompt version
+        is ignored with a warning, the service then falls back to the API.
+        """
+        self.close_library()
+        if not path:
+            return
+        if not os.path.exists(path):
+            print(f"Warning: AI text library not found: {path}")
+            return
+
+        try:
+            library = AITextLibrary(path)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Failed to load AI text library: {e}")
+            return
+
+        if library.model != self.model or library.prompt_version != PROMPT_VERSION:
+            print(
+                f"Warning: AI text library {path} was built for {library.model}/"
+                f"{library.prompt_version}, expected {self.model}/{PROMPT_VERSION}; ignoring"
+            )
+            library.close()
+            return
+
+        self.library = library
+        print(f"AI text library loaded: {library.count} entries from {path}")
+
+    def close_library(self) -> None:
+        if self.library is not None:
+            self.library.close()
+            self.library = None
 
-    async def generate_analysis(self, concern_key: str, scores: dict) -> AIAnalysisResult | None:
+    def _lookup_library(self, concern_key: str, scores: dict) -> AIAnalysisResult | None:
+        """Precomputed analysis for the concern's score bucket, if the library has one"""
+        if self.library is None:
+            return None
+        score_data = scores.get(concern_key)
+        if not isinstance(score_data, dict) or score_data.get("raw_score") is None:
+            return None
+        analysis = self.library.lookup(concern_key, score_data["raw_score"])
+        return _tag_source(analysis, "library") if analysis is not None else None
+
+    async def _request_completion(
+        self, system_prompt: str, prompt: str, timeout: float | None = None
+    ) -> str | None:
+        """
+        Send one chat completion request and return the raw message content.
+
+        Goes through the rate-limit-aware client (RPM/TPM pacing, retries on
+        429/5xx with backoff, per-request deadline).
+
+        Args:
+            system_prompt: System message content
+            prompt: User message content
+            timeout: Request deadline in seconds (default: OPENAI_REQUEST_DEADLINE_S)
+
+        Returns:
+            Message content string or None if the API call failed
+        """
+        try:
+            result = await self.client.chat_completion(
+                self._completion_payload(system_prompt, prompt), deadline_s=timeout
+            )
+        except OpenAIError as e:
+            print(f"OpenAI API error: {e}")
+            return None
+
+        return result["choices"][0]["message"]["content"]
+
+    async def _stream_completion(
+        self,
+        system_prompt: str,
+        prompt: str,
+        emit_depth: int,
+        on_value: Callable[[tuple, object], None],
+        timeout: float | None = None,
+    ) -> str | None:
+        """
+        Streaming variant of _request_completion.
+
+        The JSON content is parsed incrementally; every value at emit_depth is
+        passed to on_value(path, value) as soon as it is complete.
+
+        Returns:
+            Full message content or None if the API call failed
+        """
+        parser = IncrementalJSONParser(emit_depth)
+        try:
+            async for chunk in self.client.stream_chat_completion(
+                self._completion_payload(system_prompt, prompt), deadline_s=timeout
+            ):
+                for path, value in parser.feed(chunk):
+                    on_value(path, value)
+        except OpenAIError as e:
+            print(f"OpenAI API error: {e}")
+            return None
+
+        return parser.text
+
+    def _completion_payload(self, system_prompt: str, prompt: str) -> dict:
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.7,
+            "response_format": {"type": "json_object"},
+        }
+
+    def _cache_key(self, concern_key: str, scores: dict) -> str:
+        return self.cache.make_key(concern_key, self.model, PROMPT_VERSION, score_vector(scores))
+
+    async def generate_analysis(
+        self, concern_key: str, scores: dict, on_field: FieldCallback | None = None
+    ) -> AIAnalysisResult | None:
         """
         Generate AI analysis for a specific concern.
 
+        Lookup order: precomputed library, score-bucketed AI cache, then the
+        OpenAI API (concurrent identical requests share a single GPT call).
+
         Args:
             concern_key: The YouCam concern key (e.g., 'acne', 'oiliness')
             scores: Complete scores dict from YouCam
+            on_field: If set, GPT is streamed and on_field(concern_key, field, value)
+                      is called as soon as each top-level field is complete
 
         Returns:
             AIAnalysisResult dict or None if failed
         """
+        prebuilt = self._lookup_library(concern_key, scores)
+        if prebuilt is not None:
+            return prebuilt
+
         if not self.enabled:
             return None
 
-        try:
-            prompt = create_concern_prompt(concern_key, scores)
+        if self.cache is None:
+            return await self._generate_uncached(concern_key, scores, on_field)
 
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.base_url,
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "system", "content": SYSTEM_PROMPT},
-                            {"role": "user", "content": prompt},
-                        ],
-                        "temperature": 0.7,
-                        "response_format": {"type": "json_object"},
-                    },
+        # Callers coalesced onto one GPT call (SingleFlight) all receive its streamed fields
+        key = self._cache_key(concern_key, scores)
+        fanout = None
+        if on_field is not None:
+            fanout = self._field_fanouts.setdefault(key, _FieldFanout())
+            fanout.add(on_field)
+
+        async def compute() -> AIAnalysisResult | None:
+            try:
+                return await self._generate_uncached(
+                    concern_key, scores, self._field_fanouts.get(key)
                 )
+            finally:
+                self._field_fanouts.pop(key, None)
 
-                if response.status_code != 200:
-                    print(f"OpenAI API error: {response.status_code} - {response.text}")
-                    return None
+        try:
+            return await self.cache.get_or_compute(key, compute, validate_analysis)
+        finally:
+            if fanout is not None:
+                fanout.remove(on_field)
+                if not fanout and self._field_fanouts.get(key) is fanout:
+                    del self._field_fanouts[key]
+
+    async def generate_fresh_analysis(
+        self, concern_key: str, scores: dict
+    ) -> AIAnalysisResult | None:
+        """
+        Generate a validated analysis straight from GPT, bypassing library and cache.
 
-                result = response.json()
-                content = result["choices"][0]["message"]["content"]
+        Used to build the precomputed library (scripts/build_ai_text_library.py).
 
-                # Parse JSON response
-                analysis = json.loads(content)
+        Returns:
+            AIAnalysisResult dict or None if disabled, failed or malformed
+        """
+        if not self.enabled:
+            return None
+        return await self._generate_uncached(concern_key, scores)
 
-                # Validate required fields
-                return {
-                    "quantitative": analysis.get("quantitative", ""),
-                    "precautions": analysis.get("precautions", ""),
-                    "recommendations": analysis.get("recommendations", []),
-                    "root_cause": analysis.get("root_cause", ""),
-                    "lifestyle_tips": analysis.get("lifestyle_tips", []),
-                    "product_ingredients": analysis.get("product_ingredients", []),
-                }
+    async def _generate_uncached(
+        self, concern_key: str, scores: dict, on_field: FieldCallback | None = None
+    ) -> AIAnalysisResult | None:
+        """Call GPT for a single concern (no cache), streamed if on_field is given"""
+        try:
+            prompt = create_concern_prompt(concern_key, scores)
+            if on_field is None:
+                with stage("gpt", concern_key):
+                    content = await self._request_completion(SYSTEM_PROMPT, prompt)
+            else:
+
+                def on_value(path: tuple, value: object) -> None:
+                    if path[0] in ANALYSIS_FIELDS:
+                        on_field(concern_key, path[0], value)
+
+                with stage("gpt", concern_key):
+                    content = await self._stream_completion(
+                        SYSTEM_PROMPT, prompt, emit_depth=1, on_value=on_value
+                    )
+            if content is None:
+                return None
+
+            # Same check as the batched entries: a malformed reply is a failure, not empty texts
+            analysis = validate_analysis(json.loads(content))
+            if analysis is None:
+                print(f"AI analysis error for {concern_key}: invalid analysis fields")
+            return analysis
 
         except Exception as e:
             print(f"AI analysis error for {concern_key}: {e}")
             return None
 
-    async def generate_all_analyses(self, scores: dict) -> dict[str, AIAnalysisResult]:
+    async def _generate_fanout(
+        self, scores: dict, concern_keys: list[str], on_field: FieldCallback | None = None
+    ) -> dict[str, AIAnalysisResult]:
+        """Fan-out mode: one chat completion per concern, executed in parallel"""
+
+        async def process_concern(key: str):
+            ai_result = await self.generate_analysis(key, scores, on_field)
+            # No fallback - return raw result (could be None)
+            return key, ai_result
+
+        completed = await asyncio.gather(*(process_concern(key) for key in concern_keys))
+
+        # If analysis is None, key won't be in results (no fallback)
+        return {key: analysis for key, analysis in completed if analysis is not None}
+
+    async def _generate_batched(
+        self, scores: dict, concern_keys: list[str], on_field: FieldCallback | None = None
+    ) -> dict[str, AIAnalysisResult]:
+        """
+        Batched mode: one chat completion for all concerns.
+
+        Every entry of the "analyses" object is validated against AIAnalysisResult.
+        Concerns that are missing or fail validation are retried individually
+        through generate_analysis (fan-out), so a single malformed entry does not
+        cost the whole batch.
+        """
+        results: dict[str, AIAnalysisResult] = {}
+
+        # Serve library / cached concerns first, only batch the misses
+        for key in concern_keys:
+            prebuilt = self._lookup_library(key, scores)
+            if prebuilt is not None:
+                results[key] = prebuilt
+        concern_keys = [key for key in concern_keys if key not in results]
+        if not concern_keys or not self.enabled:
+            return results
+
+        if self.cache is not None:
+            for key in concern_keys:
+                cached = await self.cache.get(self._cache_key(key, scores), validate_analysis)
+                if cached is not None:
+                    results[key] = cached
+            concern_keys = [key for key in concern_keys if key not in results]
+            if not concern_keys:
+                return results
+
+        try:
+            prompt = create_batch_prompt(concern_keys, scores)
+            # Output for all concerns is ~10x larger than a single analysis
+            if on_field is None:
+                with stage("gpt_batch"):
+                    content = await self._request_completion(
+                        BATCH_SYSTEM_PROMPT, prompt, timeout=120.0
+                    )
+            else:
+                batch_keys = set(concern_keys)
+
+                def on_value(path: tuple, value: object) -> None:
+                    # path = ("analyses", concern_key, field)
+                    if path[0] == "analyses" and path[1] in batch_keys:
+                        if path[2] in ANALYSIS_FIELDS:
+                            on_field(path[1], path[2], value)
+
+                with stage("gpt_batch"):
+                    content = await self._stream_completion(
+                        BATCH_SYSTEM_PROMPT, prompt, emit_depth=3, on_value=on_value, timeout=120.0
+                    )
+            if content is not None:
+                analyses = json.loads(content).get("analyses", {})
+                if isinstance(analyses, dict):
+                    for key in concern_keys:
+                        analysis = validate_analysis(analyses.get(key))
+                        if analysis is not None:
+                            results[key] = analysis
+                            if self.cache is not None:
+                                await self.cache.put(self._cache_key(key, scores), analysis)
+        except Exception as e:
+            print(f"AI batched analysis error: {e}")
+
+        failed_keys = [key for key in concern_keys if key not in results]
+        if failed_keys:
+            print(f"AI batched analysis: retrying {len(failed_keys)} concern(s) individually")
+            results.update(await self._generate_fanout(scores, failed_keys, on_field))
+
+        return results
+
+    async def generate_all_analyses(
+        self, scores: dict, mode: str | None = None, concerns: list[str] | None = None
+    ) -> dict[str, AIAnalysisResult]:
         """
         Generate AI analyses for all available concerns.
         No fallback - returns raw results for development debugging.
 
         Args:
             scores: Complete scores dict from YouCam
+            mode: "fanout" or "batched", defaults to AI_ANALYSIS_MODE setting
+            concerns: Optional subset of concerns (YouCam actions); None = all
 
         Returns:
             Dict mapping concern keys to analysis results (empty if disabled)
         """
-        import asyncio
+        concern_keys = _concern_keys(scores, concerns)
 
-        results = {}
-        concern_keys = [k for k in CONCERN_NAMES.keys() if k in scores]
-
-        if not self.enabled:
+        if not self.enabled and self.library is None:
             # AI disabled - return empty dict (no fallback)
             print(
                 "AI Analysis is disabled. Set AI_ANALYSIS_ENABLED=true and provide OPENAI_API_KEY."
             )
-            return results
-
-        # Generate AI analyses in parallel
-        async def process_concern(key: str):
-            ai_result = await self.generate_analysis(key, scores)
-            # No fallback - return raw result (could be None)
-            return key, ai_result
+            return {}
+
+        if not concern_keys:
+            return {}
+
+        mode = self._resolve_mode(mode)
+
+        if mode == "batched":
+            results = await self._generate_batched(scores, concern_keys)
+        else:
+            results = await self._generate_fanout(scores, concern_keys)
+
+        return {key: _tag_source(results[key], "ai") for key in concern_keys if key in results}
+
+    def _resolve_mode(self, mode: str | None) -> str:
+        mode = mode or self.mode
+        if mode not in AI_ANALYSIS_MODES:
+            raise ValueError(f"Unknown AI analysis mode: {mode}")
+        return mode
+
+    async def generate_analyses_within_budget(
+        self,
+        scores: dict,
+        budget_s: float,
+        mode: str | None = None,
+        on_late_result: LateResultCallback | None = None,
+        on_field: FieldCallback | None = None,
+        concerns: list[str] | None = None,
+    ) -> tuple[dict[str, AIAnalysisResult], list[str]]:
+        """
+        Deadline mode: template texts immediately, GPT texts if they arrive in time.
 
-        # Execute all analyses in parallel
-        tasks = [process_concern(key) for key in concern_keys]
-        completed = await asyncio.gather(*tasks)
+        Every concern starts with its curated template text (source="template").
+        GPT texts that finish within budget_s replace them (source="ai"). GPT
+        calls still running at the deadline keep going in the background and
+        are delivered through on_late_result(concern_key, analysis); analysis
+        is None if the late call failed (the template then stays).
 
-        for key, analysis in completed:
-            if analysis is not None:
-                results[key] = analysis
-            # If analysis is None, key won't be in results (no fallback)
+        Args:
+            scores: Complete scores dict from YouCam
+            budget_s: Latency budget for GPT in seconds
+            mode: "fanout" or "batched", defaults to AI_ANALYSIS_MODE setting
+            on_late_result: Callback for GPT results that miss the deadline
+            on_field: If set, GPT is streamed and each completed field is passed to
+                      on_field(concern_key, field, value) while generation runs
+            concerns: Optional subset of concerns (YouCam actions); None = all
 
-        return results
+        Returns:
+            Tuple of (texts per concern, concern keys still pending)
+        """
+        concern_keys = _concern_keys(scores, concerns)
+
+        texts: dict[str, AIAnalysisResult] = {}
+        for key in concern_keys:
+            template = template_analysis(key, scores)
+            if template is not None:
+                texts[key] = template
+
+        # Library texts are as rich as GPT output and available instantly
+        for key in concern_keys:
+            prebuilt = self._lookup_library(key, scores)
+            if prebuilt is not None:
+                texts[key] = prebuilt
+        concern_keys = [
+            key for key in concern_keys if texts.get(key, {}).get("source") != "library"
+        ]
+
+        if not self.enabled or not concern_keys:
+            return texts, []
+
+        mode = self._resolve_mode(mode)
+
+        # One task per unit of GPT work: per concern (fanout) or all concerns (batched)
+        if mode == "batched":
+            tasks = {
+                asyncio.ensure_future(
+                    self._generate_batched(scores, concern_keys, on_field)
+                ): concern_keys
+            }
+        else:
+            tasks = {
+                asyncio.ensure_future(self._generate_single(key, scores, on_field)): [key]
+                for key in concern_keys
+            }
+
+        done, pending = await asyncio.wait(tasks, timeout=budget_s)
+
+        for task in done:
+            for key, analysis in self._task_results(task).items():
+                texts[key] = _tag_source(analysis, "ai")
+
+        late_keys = {key for task in pending for key in tasks[task]}
+        pending_keys = [key for key in concern_keys if key in late_keys]
+        if pending:
+            late = asyncio.ensure_future(
+                self._deliver_late_results({task: tasks[task] for task in pending}, on_late_result)
+            )
+            self._background_tasks.add(late)
+            late.add_done_callback(self._background_tasks.discard)
+
+        return texts, pending_keys
+
+    async def _generate_single(
+        self, concern_key: str, scores: dict, on_field: FieldCallback | None = None
+    ) -> dict[str, AIAnalysisResult]:
+        analysis = await self.generate_analysis(concern_key, scores, on_field)
+        return {concern_key: analysis} if analysis is not None else {}
+
+    @staticmethod
+    def _task_results(task: asyncio.Task) -> dict[str, AIAnalysisResult]:
+        if task.cancelled():
+            return {}
+        if task.exception() is not None:
+            print(f"AI analysis task error: {task.exception()}")
+            return {}
+        return task.result()
+
+    async def _deliver_late_results(
+        self,
+        pending: dict[asyncio.Task, list[str]],
+        on_late_result: LateResultCallback | None,
+    ) -> None:
+        """Wait for GPT calls that missed the deadline and hand them to the callback"""
+        remaining = set(pending)
+        while remaining:
+            done, remaining = await asyncio.wait(remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                results = self._task_results(task)
+                for key in pending[task]:
+                    analysis = results.get(key)
+                    if on_late_result is not None:
+                        # None = GPT failed, caller keeps the template text
+                        delivered = on_late_result(
+                            key, _tag_source(analysis, "ai") if analysis else None
+                        )
+                        if inspect.isawaitable(delivered):
+                            await delivered
 
 
 # Singleton instance
@@ -0,0 +1,279 @@
+"""
+Score-bucketed cache for AI analysis texts.
+
+GPT output depends only on the concern, the model, the prompt version and the
+score vector. Scores cluster heavily, so the vector is quantized into buckets
+(AI_CACHE_BUCKET_WIDTH) and used as part of the cache key.
+
+Tiers:
+1. In-memory LRU (OrderedDict, bounded by AI_CACHE_MAX_ENTRIES)
+2. On-disk JSON store under RESULTS_DIR/ai_cache (survives restarts, shared by workers);
+   a janitor removes entries older than AI_CACHE_MAX_AGE_S and, least recently
+   used first, trims it to AI_CACHE_DISK_MAX_BYTES
+
+Identical concurrent misses are deduplicated with SingleFlight, so only one
+GPT request is made per key at a time. Callers pass a validate function:
+only values it accepts are stored or served, so a malformed GPT reply never
+sticks to a score bucket.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+
+from app.config import settings
+from app.services.singleflight import SingleFlight
+
+# validate(value) -> validated value, or None if the value must not be cached/served
+Validator = Callable[[dict], dict | None]
+
+
+class AIAnalysisCache:
+    """Two-tier (memory LRU + disk) cache for AI analysis results"""
+
+    def __init__(
+        self,
+        cache_dir: str,
+        bucket_width: float = 5.0,
+        max_entries: int = 1024,
+        disk_max_bytes: int = 64 * 1024 * 1024,
+        max_age_s: float = 7 * 24 * 3600,
+    ):
+        self.cache_dir = cache_dir
+        self.bucket_width = bucket_width
+        self.max_entries = max_entries
+        self.disk_max_bytes = disk_max_bytes
+        self.max_age_s = max_age_s
+
+        self._memory: OrderedDict[str, dict] = OrderedDict()
+        self._flight = SingleFlight()
+
+        # Counters
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.rejected = 0
+        self.removed = 0
+
+    def quantize(self, value: float | None) -> str:
+        """Map a score to its bucket index ("-" if missing)"""
+        if value is None:
+            return "-"
+        return str(int(float(value) // self.bucket_width))
+
+    def make_key(
+        self,
+        concern_key: str,
+        model: str,
+        prompt_version: str,
+        score_vector: Sequence[float | None],
+    ) -> str:
+        """
+        Build the cache key for a concern analysis.
+
+        Args:
+            concern_key: YouCam concern key (e.g., 'acne')
+            model: OpenAI model name
+            prompt_version: Version tag of the prompts used to generate the text
+            score_vector: Ordered score values that feed the prompt
+
+        Returns:
+            Cache key string
+        """
+        buckets = ",".join(self.quantize(v) for v in score_vector)
+        return f"{concern_key}|{model}|{prompt_version}|w{self.bucket_width:g}|{buckets}"
+
+    def _disk_path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    def _read_disk(self, key: str) -> dict | None:
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Guard against sha256 prefix collisions / stale files
+        if entry.get("key") != key:
+            return None
+        # Refresh age so the janitor trims least recently used entries first
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry.get("value")
+
+    def _remove_disk(self, key: str) -> None:
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+    def _write_disk(self, key: str, value: dict) -> None:
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "value": value}, f, ensure_ascii=False)
+        # Atomic rename so concurrent workers never read partial files
+        os.replace(tmp_path, path)
+
+    def _remember(self, key: str, value: dict) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str, validate: Validator | None = None) -> dict | None:
+        """
+        Look up a key in memory, then on disk (promoting disk hits to memory).
+
+        Disk entries rejected by validate (e.g. written by an older release)
+        are deleted and count as a miss.
+        """
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return value
+
+        value = await asyncio.to_thread(self._read_disk, key)
+        if value is not None and validate is not None and validate(value) is None:
+            self.rejected += 1
+            await asyncio.to_thread(self._remove_disk, key)
+            value = None
+        if value is not None:
+            self._remember(key, value)
+            self.disk_hits += 1
+            return value
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: dict) -> None:
+        """Store a value in both tiers"""
+        self._remember(key, value)
+        self.stores += 1
+        try:
+            await asyncio.to_thread(self._write_disk, key, value)
+        except OSError as e:
+            print(f"Warning: Failed to persist AI cache entry: {e}")
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[dict | None]],
+        validate: Validator | None = None,
+    ) -> dict | None:
+        """
+        Return the cached value for key, computing it once on a miss.
+
+        Concurrent misses for the same key share a single compute() call.
+        None results (failed generations) and results rejected by validate
+        are returned as None and not cached.
+        """
+        value = await self.get(key, validate)
+        if value is not None:
+            return value
+
+        async def compute_and_store() -> dict | None:
+            result = await compute()
+            if result is not None and validate is not None and validate(result) is None:
+                self.rejected += 1
+                return None
+            if result is not None:
+                await self.put(key, result)
+            return result
+
+        return await self._flight.do(key, compute_and_store)
+
+    def sweep(self) -> dict:
+        """Remove expired disk entries, then the least recently used ones over the byte budget"""
+        now = time.time()
+        files: list[tuple[float, int, str]] = []
+        removed = 0
+
+        if os.path.isdir(self.cache_dir):
+            for shard in os.scandir(self.cache_dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    # Expired entries and stale temp files of crashed writes
+                    if now - stat.st_mtime > self.max_age_s or (
+                        entry.name.endswith(".tmp") and now - stat.st_mtime > 3600
+                    ):
+                        removed += self._unlink(entry.path)
+                    elif not entry.name.endswith(".tmp"):
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        if total > self.disk_max_bytes:
+            for _, size, path in sorted(files):
+                if total <= self.disk_max_bytes:
+                    break
+                removed += self._unlink(path)
+                total -= size
+
+        self.removed += removed
+        return {"removed": removed, "bytes": total}
+
+    def _unlink(self, path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    async def run_janitor(self, interval_s: float) -> None:
+        """Sweep the disk tier periodically until cancelled (started from the app lifespan)"""
+        while True:
+            try:
+                result = await asyncio.to_thread(self.sweep)
+                if result["removed"]:
+                    print(f"AI cache janitor: removed {result['removed']} file(s)")
+            except Exception as e:
+                print(f"Warning: AI cache janitor sweep failed: {e}")
+            await asyncio.sleep(interval_s)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "bucket_width": self.bucket_width,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "coalesced": self._flight.coalesced,
+            "inflight": self._flight.inflight(),
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "rejected": self.rejected,
+            "disk_removed": self.removed,
+            "disk_max_bytes": self.disk_max_bytes,
+            "max_age_s": self.max_age_s,
+        }
+
+
+# Singleton instance
+ai_analysis_cache = AIAnalysisCache(
+    cache_dir=os.path.join(settings.results_dir, "ai_cache"),
+    bucket_width=settings.ai_cache_bucket_width,
+    max_entries=settings.ai_cache_max_entries,
+    disk_max_bytes=settings.ai_cache_disk_max_bytes,
+    max_age_s=settings.ai_cache_max_age_s,
+)
@@ -0,0 +1,206 @@
+"""
+Precomputed AI text library (memory-mapped index file).
+
+The library holds one AI analysis per (concern, score bucket), generated
+offline by scripts/build_ai_text_library.py with the regular concern prompts.
+AIAnalysisService serves from it before calling the OpenAI API.
+
+File layout (little-endian):
+    header   : magic "AITL", format version (u16), reserved (u16),
+               bucket width (f32), record count (u32), metadata length (u32)
+    metadata : UTF-8 JSON {"model", "prompt_version", "concerns", "created_at"}
+    records  : record count x (concern index u8, pad, bucket u16, offset u32, length u32),
+               sorted by (concern index, bucket) for binary search
+    payloads : compact UTF-8 JSON of each AIAnalysisResult, offsets relative to file start
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+
+LIBRARY_MAGIC = b"AITL"
+LIBRARY_FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sHHfII")
+_RECORD = struct.Struct("<BxHII")
+
+
+def score_bucket(score: float, bucket_width: float) -> int:
+    """Bucket index of a 0-100 score"""
+    score = min(100.0, max(0.0, float(score)))
+    return int(score // bucket_width)
+
+
+def bucket_count(bucket_width: float) -> int:
+    """Number of buckets covering 0-100 inclusive"""
+    return score_bucket(100.0, bucket_width) + 1
+
+
+def bucket_center(bucket: int, bucket_width: float) -> float:
+    """Representative score used to generate a bucket's text"""
+    return min(100.0, (bucket + 0.5) * bucket_width)
+
+
+def write_library(
+    path: str,
+    entries: dict[tuple[str, int], dict],
+    bucket_width: float,
+    model: str,
+    prompt_version: str,
+) -> None:
+    """
+    Write a library index file.
+
+    Args:
+        path: Output file path (written atomically)
+        entries: (concern_key, bucket) -> AIAnalysisResult dict
+        bucket_width: Score bucket width used to build the entries
+        model: OpenAI model that generated the texts
+        prompt_version: PROMPT_VERSION of the prompts used
+    """
+    concerns = sorted({concern for concern, _ in entries})
+    if len(concerns) > 255:
+        raise ValueError("AI text library supports at most 255 concerns")
+    concern_index = {concern: i for i, concern in enumerate(concerns)}
+
+    metadata = json.dumps(
+        {
+            "model": model,
+            "prompt_version": prompt_version,
+            "concerns": concerns,
+            "created_at": int(time.time()),
+        }
+    ).encode("utf-8")
+
+    keys = sorted(entries, key=lambda k: (concern_index[k[0]], k[1]))
+    payloads = [
+        json.dumps(entries[key], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        for key in keys
+    ]
+
+    offset = _HEADER.size + len(metadata) + _RECORD.size * len(keys)
+    records = bytearray()
+    for (concern, bucket), payload in zip(keys, payloads, strict=True):
+        records += _RECORD.pack(concern_index[concern], bucket, offset, len(payload))
+        offset += len(payload)
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(
+            _HEADER.pack(
+                LIBRARY_MAGIC,
+                LIBRARY_FORMAT_VERSION,
+                0,
+                bucket_width,
+                len(keys),
+                len(metadata),
+            )
+        )
+        f.write(metadata)
+        f.write(records)
+        for payload in payloads:
+            f.write(payload)
+    os.replace(tmp_path, path)
+
+
+class AITextLibrary:
+    """Read-only view over a library index file (memory-mapped, shared between workers)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file cannot be mapped
+            self._file.close()
+            raise ValueError(f"AI text library is empty: {path}") from None
+
+        try:
+            self._read_header()
+        except KeyError as e:
+            self.close()
+            raise ValueError(f"Invalid AI text library {path}: missing metadata key {e}") from None
+        except (struct.error, TypeError, ValueError) as e:
+            # Truncated / corrupt file: release the mapping, caller warns and skips it
+            self.close()
+            raise ValueError(f"Invalid AI text library {path}: {e}") from None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _read_header(self) -> None:
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f"header truncated ({len(self._mm)} bytes)")
+        magic, version, _, bucket_width, count, meta_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != LIBRARY_MAGIC or version != LIBRARY_FORMAT_VERSION:
+            raise ValueError(f"not an AI text library (v{LIBRARY_FORMAT_VERSION})")
+
+        records_offset = _HEADER.size + meta_len
+        if records_offset + count * _RECORD.size > len(self._mm):
+            raise ValueError("metadata or records truncated")
+
+        metadata = json.loads(self._mm[_HEADER.size : records_offset])
+        self.bucket_width = bucket_width
+        self.count = count
+        self.model: str = metadata["model"]
+        self.prompt_version: str = metadata["prompt_version"]
+        self.concerns: list[str] = metadata["concerns"]
+        self._concern_index = {concern: i for i, concern in enumerate(self.concerns)}
+        self._records_offset = records_offset
+
+    def _record(self, i: int) -> tuple[int, int, int, int]:
+        return _RECORD.unpack_from(self._mm, self._records_offset + i * _RECORD.size)
+
+    def lookup(self, concern_key: str, score: float) -> dict | None:
+        """
+        Find the precomputed analysis for a concern score.
+
+        Args:
+            concern_key: YouCam concern key (e.g., 'acne')
+            score: raw_score (0-100) of that concern
+
+        Returns:
+            AIAnalysisResult dict or None if the library has no entry
+        """
+        concern_idx = self._concern_index.get(concern_key)
+        if concern_idx is None:
+            self.misses += 1
+            return None
+
+        target = (concern_idx, score_bucket(score, self.bucket_width))
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            idx, bucket, offset, length = self._record(mid)
+            if (idx, bucket) < target:
+                lo = mid + 1
+            elif (idx, bucket) > target:
+                hi = mid
+            else:
+                self.hits += 1
+                return json.loads(self._mm[offset : offset + length])
+
+        self.misses += 1
+        return None
+
+    def close(self) -> None:
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "entries": self.count,
+            "concerns": len(self.concerns),
+            "bucket_width": self.bucket_width,
+            "model": self.model,
+            "prompt_version": self.prompt_version,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
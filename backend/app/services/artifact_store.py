@@ -0,0 +1,195 @@
+"""
+Content-addressed image artifacts on disk.
+
+Rendered images (composite, overlays) and extracted masks are written once
+to results_dir/artifacts/<sha[:2]>/<sha>.<ext> and served by
+GET /api/artifacts/{artifact_id} as file responses (ETag, Range), so
+clients can fetch images by URL instead of base64 strings in the JSON and
+identical images are stored only once. They survive process restarts.
+The uploaded photo itself is never persisted, and artifacts (which still
+show the face) are served private, no-store, so shared caches keep nothing.
+
+A janitor removes artifacts older than ARTIFACT_MAX_AGE_S and, oldest
+first, trims the directory to ARTIFACT_MAX_BYTES. Writing an existing
+artifact again refreshes its age.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+
+import aiofiles
+
+from app.config import settings
+from app.services.result_store import IMAGE_FIELDS, IMAGE_MAP_FIELDS
+
+ARTIFACT_URL_PREFIX = "/api/artifacts/"
+
+# Never written to disk: the user's uploaded photo is only returned inline
+PRIVATE_FIELDS = ("original_image",)
+
+_ARTIFACT_ID = re.compile(r"^[0-9a-f]{64}\.(png|jpg|webp|bin)$")
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "webp": "image/webp",
+    "bin": "application/octet-stream",
+}
+
+
+def image_extension(content: bytes) -> str:
+    """File extension from the image's magic bytes"""
+    if content.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if content.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "webp"
+    return "bin"
+
+
+class ArtifactStore:
+    """Content-addressed files with an age/size janitor"""
+
+    def __init__(self, root: str, max_bytes: int, max_age_s: float):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+
+        # Counters
+        self.writes = 0
+        self.dedup_hits = 0
+        self.removed = 0
+        self.sweeps = 0
+
+    def path_for(self, artifact_id: str) -> str | None:
+        """File path of an artifact, or None for an invalid id"""
+        if not _ARTIFACT_ID.match(artifact_id):
+            return None
+        return os.path.join(self.root, artifact_id[:2], artifact_id)
+
+    async def write(self, content: bytes) -> str:
+        """
+        Persist image bytes (no-op if the same content is already stored).
+
+        Returns:
+            Artifact id ("<sha256>.<ext>")
+        """
+        artifact_id = f"{hashlib.sha256(content).hexdigest()}.{image_extension(content)}"
+        path = self.path_for(artifact_id)
+
+        if os.path.exists(path):
+            try:
+                # Refresh age so the janitor keeps artifacts that are still referenced
+                os.utime(path)
+                self.dedup_hits += 1
+                return artifact_id
+            except FileNotFoundError:
+                pass  # Swept in between, write it again
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{id(content)}.tmp"
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(content)
+        os.replace(tmp_path, path)
+        self.writes += 1
+        return artifact_id
+
+    async def write_result(self, result: dict) -> dict:
+        """
+        Persist the images of a result (except PRIVATE_FIELDS).
+
+        Returns:
+            artifact_urls with the same shape as the image fields, e.g.
+            {"composite_image": "/api/artifacts/<id>", "masks": {"<name>": "..."}}
+        """
+        urls: dict = {}
+        for key in IMAGE_FIELDS:
+            if key in PRIVATE_FIELDS:
+                continue
+            content = result.get(key)
+            if content:
+                urls[key] = ARTIFACT_URL_PREFIX + await self.write(content)
+        for key in IMAGE_MAP_FIELDS:
+            images = result.get(key)
+            if images:
+                urls[key] = {
+                    name: ARTIFACT_URL_PREFIX + await self.write(content)
+                    for name, content in images.items()
+                }
+        return urls
+
+    def sweep(self) -> dict:
+        """Remove expired artifacts, then the oldest ones over the byte budget"""
+        now = time.time()
+        files: list[tuple[float, int, str]] = []
+        removed = 0
+
+        if os.path.isdir(self.root):
+            for shard in os.scandir(self.root):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    # Expired artifacts and stale temp files of crashed writes
+                    if now - stat.st_mtime > self.max_age_s or (
+                        entry.name.endswith(".tmp") and now - stat.st_mtime > 3600
+                    ):
+                        removed += self._unlink(entry.path)
+                    elif not entry.name.endswith(".tmp"):
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        if total > self.max_bytes:
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                removed += self._unlink(path)
+                total -= size
+
+        self.removed += removed
+        self.sweeps += 1
+        return {"removed": removed, "bytes": total}
+
+    def _unlink(self, path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    async def run_janitor(self, interval_s: float) -> None:
+        """Sweep periodically until cancelled (started from the app lifespan)"""
+        while True:
+            try:
+                result = await asyncio.to_thread(self.sweep)
+                if result["removed"]:
+                    print(f"Artifact janitor: removed {result['removed']} file(s)")
+            except Exception as e:
+                print(f"Warning: Artifact janitor sweep failed: {e}")
+            await asyncio.sleep(interval_s)
+
+    def stats(self) -> dict:
+        return {
+            "root": self.root,
+            "max_bytes": self.max_bytes,
+            "max_age_s": self.max_age_s,
+            "writes": self.writes,
+            "dedup_hits": self.dedup_hits,
+            "removed": self.removed,
+            "sweeps": self.sweeps,
+        }
+
+
+# Singleton instance
+artifact_store = ArtifactStore(
+    root=os.path.join(settings.results_dir, "artifacts"),
+    max_bytes=settings.artifact_max_bytes,
+    max_age_s=settings.artifact_max_age_s,
+)
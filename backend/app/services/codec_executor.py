@@ -0,0 +1,158 @@
+"""
+Codec executor: bounded thread pool for the per-mask and per-concern render work.
+
+PNG decoding of masks, JPEG encoding of overlays and the composite, and most
+of the PIL/OpenCV/NumPy work around them release the GIL, so these units of
+one request run in parallel on threads. The pool is sized to the CPUs this
+process may actually use (CPU affinity and the cgroup CPU quota, not
+os.cpu_count() of the host) divided among the prefork server workers
+(SERVER_WORKERS), or CODEC_WORKERS. With one worker every unit runs inline
+in the caller, exactly like the sequential code.
+
+imap() keeps at most `workers` units in flight and yields results in input
+order, so memory grows with the worker count, not with the number of masks
+or concerns. Units started from inside a pool thread run inline (no nested
+waits on the same pool). Context variables (per-request stage timings) are
+copied into the pool threads.
+"""
+
+import contextvars
+import math
+import os
+import threading
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from app.config import settings
+
+# cgroup v2 (cpu.max: "<quota> <period>" atau "max <period>") dan v1 (CFS quota/period)
+CGROUP_V2_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+CGROUP_V1_CFS_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+CGROUP_V1_CFS_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+
+
+def _read(path: str) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit() -> float | None:
+    """CPU quota dari cgroup (mis. 1.5 untuk --cpus=1.5), None jika tidak dibatasi"""
+    cpu_max = _read(CGROUP_V2_CPU_MAX)
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota == "max":
+            return None
+        try:
+            return int(quota) / int(period or 100_000)
+        except ValueError:
+            return None
+
+    quota, period = _read(CGROUP_V1_CFS_QUOTA), _read(CGROUP_V1_CFS_PERIOD)
+    try:
+        if quota and period and int(quota) > 0 and int(period) > 0:
+            return int(quota) / int(period)
+    except ValueError:
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    """CPU yang boleh dipakai proses ini: affinity, dibatasi CPU quota cgroup"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # Tidak ada di macOS
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+class CodecExecutor:
+    """Thread pool untuk codec work per mask / per concern (lihat docstring modul)"""
+
+    def __init__(self, workers: int | None = None):
+        self._workers = workers
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def workers(self) -> int:
+        """Jumlah thread: CODEC_WORKERS, atau available_cpus() dibagi rata antar server worker"""
+        if self._workers is None:
+            self._workers = settings.codec_workers or max(
+                1, available_cpus() // max(1, settings.server_workers)
+            )
+        return self._workers
+
+    def _mark_pool_thread(self) -> None:
+        self._local.in_pool = True
+
+    def _runs_inline(self) -> bool:
+        return self.workers <= 1 or getattr(self._local, "in_pool", False)
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="codec",
+                    initializer=self._mark_pool_thread,
+                )
+            return self._pool
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Jalankan fn(*args) di pool; inline (sudah selesai) jika satu worker
+        atau dipanggil dari thread pool.
+        """
+        if self._runs_inline():
+            future: Future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        # Stage timings request ini juga tercatat dari thread pool
+        context = contextvars.copy_context()
+        return self._get_pool().submit(context.run, fn, *args)
+
+    def imap(self, fn: Callable, items: Iterable) -> Iterator:
+        """
+        fn(item) untuk setiap item, hasil berurutan seperti items.
+
+        Maksimal `workers` item dikerjakan bersamaan; hasil yang belum
+        diambil tidak menumpuk lebih dari itu. Exception dari fn muncul saat
+        hasil item tersebut diambil.
+        """
+        if self._runs_inline():
+            for item in items:
+                yield fn(item)
+            return
+
+        pending: deque[Future] = deque()
+        for item in items:
+            pending.append(self.submit(fn, item))
+            if len(pending) >= self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def reset(self) -> None:
+        """Buang pool (tanpa menunggu); dipanggil di child setelah fork"""
+        self._pool = None
+        self._lock = threading.Lock()
+
+
+# Singleton instance
+codec_executor = CodecExecutor()
+
+# Thread pool tidak ikut ter-fork (prefork server): child membuat pool sendiri
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=codec_executor.reset)
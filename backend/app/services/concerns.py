@@ -0,0 +1,204 @@
+"""
+Concern registry: satu daftar concern untuk request YouCam, rendering dan AI.
+
+Setiap concern dikenal dengan dua nama:
+- action: YouCam dst_action, juga key di score_info.json, analysis_texts
+  dan CONCERN_NAMES (mis. "dark_circle_v2")
+- key: action tanpa suffix versi, dipakai untuk overlay, landmark status,
+  warna dan pencocokan nama mask (mis. "dark_circle")
+
+Tabel lain (dst_actions, CONCERN_NAMES, CONCERN_ZONE_MAPPING, warna overlay
+dan composite) diturunkan dari CONCERNS, sehingga subset per request
+(?concerns=acne,pore) berlaku sama di semua tahap: dst_actions, ekstraksi
+mask, composite, overlay per concern dan teks AI.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Concern:
+    """Satu concern YouCam dan keikutsertaannya di setiap tahap"""
+
+    action: str  # YouCam dst_action / key di score_info.json
+    name: str | None = None  # Nama Indonesia untuk teks AI; None = tanpa analisis AI
+    zones: tuple[str, ...] = ()  # Zona landmark overlay per concern; () = tanpa overlay zona
+    color: tuple[int, int, int] | None = None  # RGB overlay (dioptimalkan untuk UV tint)
+    overlay_alpha: int = 150  # Alpha overlay sederhana (fallback tanpa landmark)
+    composite_alpha: int | None = None  # Alpha di composite; None = tidak di composite
+
+    @property
+    def key(self) -> str:
+        return self.action.removesuffix("_v2")
+
+
+# Urutan = urutan concern di prompt dan cache key AI (jangan diubah tanpa PROMPT_VERSION)
+CONCERNS = (
+    Concern(
+        "oiliness",
+        "Sebum/Minyak",
+        ("t_zone", "u_zone"),  # T-zone (high sebum) + U-zone untuk perbandingan heat map
+        (255, 150, 135),
+        overlay_alpha=140,
+    ),
+    Concern(
+        "pore",
+        "Pori-Pori",
+        ("t_zone", "u_zone"),  # T-zone (lebih visible) + U-zone
+        (255, 140, 165),
+        overlay_alpha=160,
+        composite_alpha=150,
+    ),
+    Concern(
+        "age_spot",
+        "Flek/Bintik Usia",
+        ("left_cheek", "right_cheek", "forehead_center"),
+        (255, 150, 150),
+        overlay_alpha=160,
+        composite_alpha=150,
+    ),
+    Concern(
+        "wrinkle",
+        "Keriput",
+        (
+            "forehead_center",
+            "left_eye_area",
+            "right_eye_area",
+            "left_nasolabial",
+            "right_nasolabial",
+        ),
+        (200, 100, 220),
+        overlay_alpha=150,
+        composite_alpha=140,
+    ),
+    Concern(
+        "acne",
+        "Jerawat",
+        ("t_zone", "u_zone"),  # Seluruh wajah (T-zone sudah termasuk chin)
+        (255, 110, 130),
+        overlay_alpha=180,
+        composite_alpha=180,
+    ),
+    Concern(
+        "dark_circle_v2",
+        "Lingkaran Hitam",
+        ("left_under_eye", "right_under_eye"),
+        (180, 100, 200),
+        overlay_alpha=150,
+        composite_alpha=140,
+    ),
+    Concern(
+        "radiance",
+        "Kecerahan Kulit",
+        ("u_zone", "forehead_center"),
+        (200, 180, 200),
+        overlay_alpha=130,
+    ),
+    Concern(
+        "texture",
+        "Tekstur Kulit",
+        ("u_zone", "forehead_center"),
+        (180, 120, 220),
+        overlay_alpha=140,
+        composite_alpha=130,
+    ),
+    Concern(
+        "redness",
+        "Kemerahan/Sensitivitas",
+        ("u_zone", "t_zone"),
+        (255, 100, 130),
+        overlay_alpha=160,
+    ),
+    Concern(
+        "firmness",
+        "Kekencangan/Kolagen",
+        ("u_zone", "chin"),
+        (255, 140, 165),
+        overlay_alpha=130,
+    ),
+    Concern("moisture", "Kelembaban", color=(130, 150, 255), overlay_alpha=130),
+    Concern(
+        "eye_bag",
+        "Kantung Mata",
+        ("left_under_eye", "right_under_eye"),
+        (180, 100, 200),
+        overlay_alpha=150,
+        composite_alpha=140,
+    ),
+    # Hanya diminta dari YouCam (skor), tanpa overlay dan teks AI
+    Concern("droopy_upper_eyelid"),
+    Concern("droopy_lower_eyelid"),
+)
+
+# Urutan layer composite dari bawah ke atas (concern dengan composite_alpha)
+COMPOSITE_ORDER = ("acne", "pore", "wrinkle", "texture", "age_spot", "eye_bag", "dark_circle")
+
+# action dan key -> Concern
+CONCERNS_BY_NAME = {
+    **{concern.key: concern for concern in CONCERNS},
+    **{concern.action: concern for concern in CONCERNS},
+}
+
+
+def resolve_concerns(names: Iterable[str] | None) -> list[str] | None:
+    """
+    Validasi subset concern dari request.
+
+    Args:
+        names: Nama concern (action atau key, boleh dipisah koma), atau None
+
+    Returns:
+        List action dalam urutan registry, atau None (semua concern) jika kosong
+
+    Raises:
+        ValueError: Jika ada nama yang tidak dikenal
+    """
+    requested = {
+        part.strip().lower() for name in names or () for part in name.split(",") if part.strip()
+    }
+    if not requested:
+        return None
+    unknown = sorted(name for name in requested if name not in CONCERNS_BY_NAME)
+    if unknown:
+        raise ValueError(
+            f"Unknown concern(s): {', '.join(unknown)} "
+            f"(available: {', '.join(concern.action for concern in CONCERNS)})"
+        )
+    selected = {CONCERNS_BY_NAME[name].action for name in requested}
+    return [concern.action for concern in CONCERNS if concern.action in selected]
+
+
+def selected_concerns(actions: Iterable[str] | None = None) -> tuple[Concern, ...]:
+    """Concern yang dipilih (semua jika actions None), dalam urutan registry"""
+    if actions is None:
+        return CONCERNS
+    actions = set(actions)
+    return tuple(concern for concern in CONCERNS if concern.action in actions)
+
+
+def is_selected_mask(mask_name: str, actions: Iterable[str] | None) -> bool:
+    """True jika mask (mis. sd_acne_output_all.png) milik concern yang dipilih"""
+    if actions is None:
+        return True
+    name = mask_name.lower()
+    return any(concern.key in name for concern in selected_concerns(actions))
+
+
+def filter_masks(masks: dict[str, bytes], actions: Iterable[str] | None) -> dict[str, bytes]:
+    """Masks milik concern yang dipilih"""
+    if actions is None:
+        return masks
+    return {name: data for name, data in masks.items() if is_selected_mask(name, actions)}
+
+
+def filter_scores(scores: dict, actions: Iterable[str] | None) -> dict:
+    """Scores concern yang dipilih; skor keseluruhan ("all", "skin_age") tetap ada"""
+    if actions is None:
+        return scores
+    actions = set(actions)
+    return {
+        key: value
+        for key, value in scores.items()
+        if key not in CONCERNS_BY_NAME or CONCERNS_BY_NAME[key].action in actions
+    }
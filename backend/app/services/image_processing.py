@@ -2,13 +2,68 @@
 
 import io
 
+import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
 
+from app.services import render_kernels
+from app.services.codec_executor import codec_executor
+from app.services.concerns import COMPOSITE_ORDER, CONCERNS, CONCERNS_BY_NAME, selected_concerns
+from app.services.mock_data import open_mask
+
+
+def _blend_masks_fused(
+    base: np.ndarray,
+    masks: dict[str, bytes],
+    layers: list[tuple[str, tuple]],
+    alpha_gain: float,
+) -> None:
+    """
+    Render backend "opencv": blend mask layers langsung ke RGB array (in place).
+
+    Setara dengan alpha_composite berurutan ke overlay RGBA lalu ke original,
+    tanpa layer RGBA seukuran gambar per mask.
+
+    Args:
+        base: RGB uint8 array, diubah
+        masks: Dictionary of mask_name -> PNG bytes
+        layers: (mask_name, color) berurutan dari bawah ke atas
+        alpha_gain: Multiplier alpha (seperti ImageEnhance.Brightness pada alpha)
+    """
+    height, width = base.shape[:2]
+
+    def decode(layer: tuple[str, tuple]) -> np.ndarray | None:
+        mask_name = layer[0]
+        try:
+            mask_img = open_mask(masks[mask_name])
+            if mask_img.size != (width, height):
+                mask_img = mask_img.resize((width, height), Image.Resampling.LANCZOS)
+            if mask_img.mode == "RGBA":
+                mask_intensity = mask_img.getchannel("A")
+            elif mask_img.mode != "L":
+                mask_intensity = mask_img.convert("L")
+            else:
+                mask_intensity = mask_img
+
+            alpha = np.array(mask_intensity)
+            if alpha_gain != 1.0:
+                render_kernels.mask_alpha(alpha, alpha_gain)
+            return alpha
+
+        except Exception as e:
+            print(f"Warning: Failed to process mask {mask_name}: {e}")
+            return None
+
+    # Decode paralel di codec executor, blend tetap berurutan dari bawah ke atas
+    for (_, color), alpha in zip(layers, codec_executor.imap(decode, layers), strict=True):
+        if alpha is not None:
+            render_kernels.blend(base, color, alpha)
+
 
 def create_composite_visualization(
     original_image_bytes: bytes,
     masks: dict[str, bytes],
     scores: dict,
+    concerns: list[str] | None = None,
 ) -> bytes:
     """
     Create a composite visualization combining original image with mask overlays
@@ -17,6 +72,7 @@ def create_composite_visualization(
         original_image_bytes: Original uploaded image
         masks: Dictionary of mask_name -> PNG bytes
         scores: Score information from YouCam API
+        concerns: Optional subset of concerns (YouCam actions); None = all
 
     Returns:
         PNG image bytes with composite visualization
@@ -33,59 +89,74 @@ def create_composite_visualization(
     # Create overlay layer
     overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
 
-    # Priority masks to overlay (in order of visibility)
+    # Priority masks to overlay (in order of visibility, see COMPOSITE_ORDER)
     # UPDATED: Warna dioptimalkan untuk UV tint cyan/teal background
+    selected = {concern.key for concern in selected_concerns(concerns)}
     mask_priorities = [
-        ("acne", (255, 110, 130, 180)),  # Pink coral - high visibility
-        ("pore", (255, 140, 165, 150)),  # Salmon pink
-        ("wrinkle", (200, 100, 220, 140)),  # Magenta
-        ("texture", (180, 120, 220, 130)),  # Purple
-        ("age_spot", (255, 150, 150, 150)),  # Salmon
-        ("eye_bag", (180, 100, 200, 140)),  # Orchid
-        ("dark_circle", (180, 100, 200, 140)),  # Orchid
+        (key, (*CONCERNS_BY_NAME[key].color, CONCERNS_BY_NAME[key].composite_alpha))
+        for key in COMPOSITE_ORDER
+        if key in selected
+    ]
+
+    # (mask_name, color) dari bawah ke atas: mask yang cocok per concern, urut prioritas
+    layers = [
+        (name, color)
+        for concern_name, color in mask_priorities
+        for name in masks.keys()
+        if concern_name in name.lower()
     ]
 
-    # Apply each mask with appropriate color
-    for concern_name, color in mask_priorities:
-        # Find matching mask files
-        matching_masks = [name for name in masks.keys() if concern_name in name.lower()]
-
-        for mask_name in matching_masks:
-            try:
-                # Load mask
-                mask_img = Image.open(io.BytesIO(masks[mask_name]))
-
-                # Resize if needed
-                if mask_img.size != (width, height):
-                    mask_img = mask_img.resize((width, height), Image.Resampling.LANCZOS)
-
-                # Convert to grayscale to use as intensity map
-                if mask_img.mode != "L":
-                    if mask_img.mode == "RGBA":
-                        # Use alpha channel if available
-                        mask_intensity = mask_img.split()[3]
-                    else:
-                        mask_intensity = mask_img.convert("L")
+    if render_kernels.use_fused_kernels():
+        base = np.array(original)
+        _blend_masks_fused(base, masks, layers, alpha_gain=0.8)
+        final_rgb = Image.fromarray(base, "RGB").filter(
+            ImageFilter.UnsharpMask(radius=1, percent=120, threshold=3)
+        )
+        output = io.BytesIO()
+        final_rgb.save(output, format="JPEG", quality=95)
+        return output.getvalue()
+
+    def colorize(layer: tuple[str, tuple]) -> Image.Image | None:
+        mask_name, color = layer
+        try:
+            # Load mask
+            mask_img = open_mask(masks[mask_name])
+
+            # Resize if needed
+            if mask_img.size != (width, height):
+                mask_img = mask_img.resize((width, height), Image.Resampling.LANCZOS)
+
+            # Convert to grayscale to use as intensity map
+            if mask_img.mode != "L":
+                if mask_img.mode == "RGBA":
+                    # Use alpha channel if available
+                    mask_intensity = mask_img.split()[3]
                 else:
-                    mask_intensity = mask_img
+                    mask_intensity = mask_img.convert("L")
+            else:
+                mask_intensity = mask_img
 
-                # Create colored overlay from mask
-                colored_overlay = Image.new("RGBA", (width, height), color)
+            # Create colored overlay from mask
+            colored_overlay = Image.new("RGBA", (width, height), color)
 
-                # Apply mask intensity to alpha
-                colored_overlay.putalpha(mask_intensity)
+            # Apply mask intensity to alpha
+            colored_overlay.putalpha(mask_intensity)
 
-                # Enhance opacity for better visibility
-                alpha = colored_overlay.split()[3]
-                alpha = ImageEnhance.Brightness(alpha).enhance(0.8)  # Increase visibility
-                colored_overlay.putalpha(alpha)
+            # Enhance opacity for better visibility
+            alpha = colored_overlay.split()[3]
+            alpha = ImageEnhance.Brightness(alpha).enhance(0.8)  # Increase visibility
+            colored_overlay.putalpha(alpha)
+            return colored_overlay
 
-                # Composite onto overlay layer
-                overlay = Image.alpha_composite(overlay, colored_overlay)
+        except Exception as e:
+            print(f"Warning: Failed to process mask {mask_name}: {e}")
+            return None
 
-            except Exception as e:
-                print(f"Warning: Failed to process mask {mask_name}: {e}")
-                continue
+    # Apply each mask with appropriate color: decode + colorize paralel di codec
+    # executor, composite ke overlay layer tetap dalam urutan prioritas
+    for colored_overlay in codec_executor.imap(colorize, layers):
+        if colored_overlay is not None:
+            overlay = Image.alpha_composite(overlay, colored_overlay)
 
     # Convert composite to RGBA for blending
     composite = composite.convert("RGBA")
@@ -134,18 +205,7 @@ def create_simple_composite(
 # UPDATED: Warna dioptimalkan untuk UV tint cyan/teal background
 # Menggunakan pink/coral/magenta yang kontras dengan background cyan
 CONCERN_COLORS = {
-    "acne": (255, 110, 130, 180),  # Pink coral - kontras dengan cyan
-    "pore": (255, 140, 165, 160),  # Salmon pink
-    "wrinkle": (200, 100, 220, 150),  # Magenta
-    "texture": (180, 120, 220, 140),  # Purple
-    "age_spot": (255, 150, 150, 160),  # Salmon
-    "eye_bag": (180, 100, 200, 150),  # Orchid
-    "dark_circle": (180, 100, 200, 150),  # Orchid
-    "oiliness": (255, 150, 135, 140),  # Coral
-    "redness": (255, 100, 130, 160),  # Coral pink
-    "firmness": (255, 140, 165, 130),  # Salmon pink
-    "radiance": (200, 180, 200, 130),  # Lavender gray
-    "moisture": (130, 150, 255, 130),  # Periwinkle
+    concern.key: (*concern.color, concern.overlay_alpha) for concern in CONCERNS if concern.color
 }
 
 
@@ -178,10 +238,17 @@ def create_concern_overlay(
     # Find matching mask files for this concern
     matching_masks = [name for name in masks.keys() if concern_key.lower() in name.lower()]
 
+    if render_kernels.use_fused_kernels():
+        base = np.array(original)
+        _blend_masks_fused(base, masks, [(name, color) for name in matching_masks], 1.0)
+        output = io.BytesIO()
+        Image.fromarray(base, "RGB").save(output, format="JPEG", quality=95)
+        return output.getvalue()
+
     for mask_name in matching_masks:
         try:
             # Load mask
-            mask_img = Image.open(io.BytesIO(masks[mask_name]))
+            mask_img = open_mask(masks[mask_name])
 
             # Resize if needed
             if mask_img.size != (width, height):
@@ -226,6 +293,7 @@ def create_concern_overlay(
 def create_all_concern_overlays(
     original_image_bytes: bytes,
     masks: dict[str, bytes],
+    concerns: list[str] | None = None,
 ) -> dict[str, bytes]:
     """
     Create overlay images for all concerns.
@@ -233,27 +301,17 @@ def create_all_concern_overlays(
     Args:
         original_image_bytes: Original uploaded image
         masks: Dictionary of mask_name -> PNG bytes
+        concerns: Optional subset of concerns (YouCam actions); None = all
 
     Returns:
         Dictionary of concern_key -> JPEG image bytes
     """
     result = {}
 
-    # List of concerns to generate overlays for
-    concerns = [
-        "acne",
-        "pore",
-        "wrinkle",
-        "age_spot",
-        "dark_circle",
-        "oiliness",
-        "redness",
-        "firmness",
-        "radiance",
-        "texture",
-    ]
+    # Concerns to generate overlays for: the same as the landmark zone overlays
+    keys = [concern.key for concern in selected_concerns(concerns) if concern.zones]
 
-    for concern in concerns:
+    for concern in keys:
         try:
             overlay_bytes = create_concern_overlay(original_image_bytes, masks, concern)
             result[concern] = overlay_bytes
@@ -273,6 +331,7 @@ def create_landmark_enhanced_overlays(
     original_image_bytes: bytes,
     masks: dict[str, bytes],
     scores: dict | None = None,
+    concerns: list[str] | None = None,
 ) -> tuple[dict[str, bytes], dict[str, dict]]:
     """
     Create landmark-enhanced overlay images for all concerns with severity-based colors.
@@ -288,6 +347,7 @@ def create_landmark_enhanced_overlays(
         masks: Dictionary of mask_name -> PNG bytes
         scores: Optional dictionary of scores from YouCam API for severity coloring
                 Format: {"oiliness": {"ui_score": 45.2}, ...}
+        concerns: Optional subset of concerns (YouCam actions); None = all
 
     Returns:
         Tuple of:
@@ -308,4 +368,38 @@ def create_landmark_enhanced_overlays(
     from app.services.landmark_service import get_landmark_service
 
     service = get_landmark_service()
-    return service.create_all_zone_visualizations(original_image_bytes, masks, scores)
+    return service.create_all_zone_visualizations(original_image_bytes, masks, scores, concerns)
+
+
+def create_landmark_enhanced_layers(
+    original_image_bytes: bytes,
+    masks: dict[str, bytes],
+    scores: dict | None = None,
+    concerns: list[str] | None = None,
+) -> tuple[dict, dict[str, dict]]:
+    """
+    Layered variant of create_landmark_enhanced_overlays (overlay_mode "layers").
+
+    The UV-tinted image is sent once; every concern gets an 8-bit PNG cropped
+    to its non-zero area plus offset and color, composited by the frontend.
+
+    Args:
+        original_image_bytes: Original uploaded image
+        masks: Dictionary of mask_name -> PNG bytes
+        scores: Optional dictionary of scores from YouCam API for severity coloring
+        concerns: Optional subset of concerns (YouCam actions); None = all
+
+    Returns:
+        Tuple of:
+        - Result fields: overlay_base (JPEG bytes), overlay_layers
+          (concern_key -> PNG bytes), overlay_layer_info (concern_key -> dict)
+        - Dictionary of concern_key -> status dict
+    """
+    from app.services.landmark_service import get_landmark_service
+
+    service = get_landmark_service()
+    base, layers, layer_info, statuses = service.create_all_zone_layers(
+        original_image_bytes, masks, scores, concerns
+    )
+    fields = {"overlay_base": base, "overlay_layers": layers, "overlay_layer_info": layer_info}
+    return fields, statuses
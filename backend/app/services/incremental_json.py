@@ -0,0 +1,133 @@
+"""Incremental JSON parser for streamed GPT output"""
+
+import json
+from dataclasses import dataclass, field
+
+
+@dataclass
+class _Frame:
+    """Open JSON container while scanning"""
+
+    is_object: bool
+    key: str | None = None
+    index: int = 0
+    expect_key: bool = field(default=False)
+
+
+class IncrementalJSONParser:
+    """
+    Emit JSON values at a fixed nesting depth as soon as they are complete.
+
+    Feed the text chunks of a streamed JSON document; every value whose
+    nesting depth equals `emit_depth` is returned from feed() once its last
+    character has arrived, together with its path.
+
+    Example (emit_depth=1):
+        '{"quantitative": "…", "recommendations": ["a", "b"]'
+        -> (("quantitative",), "…"), (("recommendations",), ["a", "b"])
+
+    For {"analyses": {"acne": {...}}} use emit_depth=3 to get
+    (("analyses", "acne", "quantitative"), "…") per field.
+    """
+
+    def __init__(self, emit_depth: int = 1):
+        self.emit_depth = emit_depth
+        self._text = ""
+        self._pos = 0
+        self._stack: list[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._value_start: int | None = None
+        self._in_primitive = False
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return self._text
+
+    def _path(self) -> tuple:
+        return tuple(frame.key if frame.is_object else frame.index for frame in self._stack)
+
+    def _emit(self, end: int, emitted: list) -> None:
+        raw = self._text[self._value_start : end]
+        self._value_start = None
+        self._in_primitive = False
+        try:
+            emitted.append((self._path(), json.loads(raw)))
+        except json.JSONDecodeError:
+            pass  # Malformed value, the full-document parse will report it
+
+    def _at_emit_depth(self) -> bool:
+        if len(self._stack) != self.emit_depth or self._value_start is not None:
+            return False
+        # Values inside objects only start after their key
+        frame = self._stack[-1] if self._stack else None
+        return frame is None or not frame.is_object or frame.key is not None
+
+    def feed(self, chunk: str) -> list[tuple[tuple, object]]:
+        """
+        Append a chunk and return the values completed by it.
+
+        Returns:
+            List of (path, value) tuples in document order
+        """
+        self._text += chunk
+        emitted: list[tuple[tuple, object]] = []
+        text = self._text
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        frame = self._stack[-1]
+                        frame.key = json.loads(text[self._string_start : i + 1])
+                        frame.expect_key = False
+                    elif self._value_start == self._string_start:
+                        self._emit(i + 1, emitted)
+                continue
+
+            if self._in_primitive and c in ",}] \t\r\n":
+                self._emit(i, emitted)
+
+            if c == '"':
+                frame = self._stack[-1] if self._stack else None
+                self._string_is_key = frame is not None and frame.is_object and frame.expect_key
+                if not self._string_is_key and self._at_emit_depth():
+                    self._value_start = i
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                if self._at_emit_depth():
+                    self._value_start = i
+                self._stack.append(_Frame(is_object=c == "{", expect_key=c == "{"))
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if len(self._stack) == self.emit_depth and self._value_start is not None:
+                    self._emit(i + 1, emitted)
+            elif c == ",":
+                if self._stack:
+                    frame = self._stack[-1]
+                    if frame.is_object:
+                        frame.expect_key = True
+                        frame.key = None
+                    else:
+                        frame.index += 1
+            elif c in ": \t\r\n":
+                pass
+            elif not self._in_primitive and self._at_emit_depth():
+                # Number / true / false / null
+                self._value_start = i
+                self._in_primitive = True
+
+        self._pos = len(text)
+        return emitted
@@ -14,6 +14,12 @@ import mediapipe as mp
 import numpy as np
 from PIL import Image, ImageDraw
 
+from app.services import render_kernels
+from app.services.codec_executor import codec_executor
+from app.services.concerns import CONCERNS, selected_concerns
+from app.services.metrics import stage
+from app.services.mock_data import open_mask
+
 
 class LandmarkStatus(str, Enum):
     """Status hasil deteksi landmark"""
@@ -64,6 +70,44 @@ class LandmarkResult:
     face_bbox: FaceBoundingBox | None = None  # Bounding box wajah
 
 
+@dataclass
+class RenderBase:
+    """Input bersama semua visualisasi concern dari satu gambar (dihitung sekali)"""
+
+    landmark_result: LandmarkResult
+    # Gambar dengan UV tint - read-only, renderer membuat salinan. Render backend "pil":
+    # PIL Image RGBA; "opencv": RGB uint8 array (kernel di render_kernels)
+    tinted: Image.Image | np.ndarray
+
+
+@dataclass
+class ZoneLayer:
+    """Overlay satu concern di atas RenderBase.tinted, hanya seluas box (x1, y1, x2, y2)"""
+
+    box: tuple[int, int, int, int]
+    color: tuple[int, int, int] | None = None  # Warna tunggal (None: warna per pixel di rgba)
+    alpha: np.ndarray | None = None  # uint8 alpha seukuran box, dengan color
+    rgba: Image.Image | None = None  # Overlay RGBA seukuran box (jika alpha None)
+
+
+def _canvas_size(canvas: Image.Image | np.ndarray) -> tuple[int, int]:
+    """(width, height) dari PIL Image atau RGB array"""
+    if isinstance(canvas, np.ndarray):
+        return canvas.shape[1], canvas.shape[0]
+    return canvas.size
+
+
+def _encode_jpeg(canvas: Image.Image | np.ndarray) -> bytes:
+    """JPEG (quality 95) dari PIL Image atau RGB array"""
+    if isinstance(canvas, np.ndarray):
+        image = Image.fromarray(canvas, "RGB")
+    else:
+        image = canvas.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=95)
+    return output.getvalue()
+
+
 # ============================================================================
 # UV TINT CONFIGURATION
 # Konfigurasi efek UV-like untuk tampilan analisis profesional
@@ -171,10 +215,8 @@ EXCLUDED_LANDMARK_INDICES = set()
 for zone_indices in EXCLUSION_ZONES.values():
     EXCLUDED_LANDMARK_INDICES.update(zone_indices)
 
-
-def is_excluded_landmark(landmark_idx: int) -> bool:
-    """Check if a landmark index should be excluded from visualization."""
-    return landmark_idx in EXCLUDED_LANDMARK_INDICES
+# Sorted index array untuk vectorized lookup
+EXCLUDED_LANDMARK_ARRAY = np.array(sorted(EXCLUDED_LANDMARK_INDICES), dtype=np.intp)
 
 
 def is_point_in_excluded_zone(
@@ -191,13 +233,10 @@ def is_point_in_excluded_zone(
     Returns:
         True if point should be excluded
     """
-    for idx in EXCLUDED_LANDMARK_INDICES:
-        if idx < len(landmarks):
-            lx, ly = landmarks[idx][0], landmarks[idx][1]
-            dist = np.sqrt((x - lx) ** 2 + (y - ly) ** 2)
-            if dist < threshold:
-                return True
-    return False
+    indices = EXCLUDED_LANDMARK_ARRAY[EXCLUDED_LANDMARK_ARRAY < len(landmarks)]
+    dx = landmarks[indices, 0] - x
+    dy = landmarks[indices, 1] - y
+    return bool(np.any(dx * dx + dy * dy < threshold * threshold))
 
 
 # ============================================================================
@@ -348,31 +387,91 @@ FACIAL_ZONES = {
     ],
 }
 
-# Mapping concern ke zona yang relevan
+# Mapping concern ke zona yang relevan (dari concern registry)
 # Updated berdasarkan research: T-zone untuk high-sebum, U-zone untuk comparison
-CONCERN_ZONE_MAPPING = {
-    # Oiliness: T-zone (high sebum) + U-zone untuk perbandingan heat map
-    "oiliness": ["t_zone", "u_zone"],
-    # Acne: seluruh wajah (T-zone sudah termasuk chin)
-    "acne": ["t_zone", "u_zone"],
-    # Pore: T-zone (lebih visible) + U-zone
-    "pore": ["t_zone", "u_zone"],
-    "wrinkle": [
-        "forehead_center",
-        "left_eye_area",
-        "right_eye_area",
-        "left_nasolabial",
-        "right_nasolabial",
-    ],
-    "dark_circle": ["left_under_eye", "right_under_eye"],
-    "eye_bag": ["left_under_eye", "right_under_eye"],
-    "age_spot": ["left_cheek", "right_cheek", "forehead_center"],
-    "redness": ["u_zone", "t_zone"],
-    "firmness": ["u_zone", "chin"],
-    "radiance": ["u_zone", "forehead_center"],
-    "texture": ["u_zone", "forehead_center"],
+CONCERN_ZONE_MAPPING = {concern.key: list(concern.zones) for concern in CONCERNS if concern.zones}
+
+# ============================================================================
+# COMPILED ZONE GEOMETRY
+# FACIAL_ZONES, EXCLUSION_ZONES dan CONCERN_ZONE_MAPPING dikompilasi sekali saat
+# import menjadi NumPy index arrays: duplikat dibuang, excluded landmarks sudah
+# difilter, dan zona gabungan (t_zone, u_zone) dipecah per sub-zone agar tiap
+# polygon tetap satu area. Titik polygon diambil dengan satu fancy-indexing per
+# zona; urutan vertex (convex hull) dihitung dari posisi landmark per request
+# karena index saja tidak punya geometri.
+# ============================================================================
+
+# Zona yang digambar dengan warna T-zone pada heatmap
+T_ZONE_NAMES = ("t_zone", "forehead", "nose", "chin")
+
+
+def _compile_polygon(indices: list[int]) -> np.ndarray:
+    """Index array tanpa duplikat (urutan kemunculan pertama) dan tanpa excluded landmarks"""
+    unique = dict.fromkeys(idx for idx in indices if idx not in EXCLUDED_LANDMARK_INDICES)
+    return np.array(list(unique), dtype=np.intp)
+
+
+def _compile_zone_table() -> dict[str, tuple[np.ndarray, ...]]:
+    """zone name -> polygon index arrays (satu per sub-zone untuk zona gabungan)"""
+    table: dict[str, tuple[np.ndarray, ...]] = {}
+    for main_zone, sub_zones in FACIAL_ZONES.items():
+        if isinstance(sub_zones, dict):
+            # Sub-zone pertama yang cocok menang (sama seperti lookup sebelumnya)
+            for sub_name, indices in sub_zones.items():
+                table.setdefault(sub_name, (_compile_polygon(indices),))
+            table.setdefault(
+                main_zone, tuple(_compile_polygon(indices) for indices in sub_zones.values())
+            )
+        else:
+            table.setdefault(main_zone, (_compile_polygon(sub_zones),))
+    return table
+
+
+ZONE_POLYGONS = _compile_zone_table()
+
+
+def _compile_concern_zones(zone_names: list[str]) -> tuple:
+    """((zone name, heatmap zone type, polygon index arrays), ...) untuk zona yang dikenal"""
+    return tuple(
+        (name, "t_zone" if name in T_ZONE_NAMES else "u_zone", ZONE_POLYGONS[name])
+        for name in zone_names
+        if name in ZONE_POLYGONS
+    )
+
+
+CONCERN_ZONE_POLYGONS = {
+    concern: _compile_concern_zones(zones) for concern, zones in CONCERN_ZONE_MAPPING.items()
 }
 
+# Default zones untuk concern di luar CONCERN_ZONE_MAPPING
+DEFAULT_HEATMAP_ZONES = _compile_concern_zones(["t_zone", "u_zone"])
+DEFAULT_BOUNDARY_ZONES = _compile_concern_zones(["left_cheek", "right_cheek"])
+
+
+def gather_zone_polygons(
+    polygons: tuple[np.ndarray, ...], landmarks: np.ndarray
+) -> list[list[tuple[int, int]]]:
+    """
+    Ambil titik polygon zona dari landmarks, berurutan sebagai convex hull.
+
+    Args:
+        polygons: Index arrays dari ZONE_POLYGONS / CONCERN_ZONE_POLYGONS
+        landmarks: Array of landmark coordinates (N, 3) dalam pixel
+
+    Returns:
+        List polygon (list of (x, y)); polygon dengan < 3 vertex dilewati
+    """
+    result = []
+    for indices in polygons:
+        indices = indices[indices < len(landmarks)]
+        if len(indices) < 3:
+            continue
+        points = landmarks[indices, :2].astype(np.int32)
+        hull = cv2.convexHull(points).reshape(-1, 2)
+        if len(hull) >= 3:
+            result.append([(int(x), int(y)) for x, y in hull])
+    return result
+
 # ============================================================================
 # VISUALIZATION STYLE MAPPING
 # Menentukan tipe visualisasi per concern berdasarkan sifat kondisi kulit:
@@ -543,19 +642,7 @@ SEVERITY_THRESHOLDS = {
 
 # Fallback: single color untuk backward compatibility
 # UPDATED: Warna dioptimalkan untuk UV tint (pink/coral tones)
-CONCERN_COLORS = {
-    "oiliness": (255, 150, 135),  # Coral - kontras dengan cyan
-    "acne": (255, 110, 130),  # Pink coral
-    "pore": (255, 140, 165),  # Salmon pink
-    "wrinkle": (200, 100, 220),  # Magenta - kontras dengan cyan
-    "dark_circle": (180, 100, 200),  # Orchid
-    "eye_bag": (180, 100, 200),  # Orchid - sama dengan dark_circle
-    "age_spot": (255, 150, 150),  # Salmon - kontras dengan cyan
-    "redness": (255, 100, 130),  # Coral pink
-    "firmness": (255, 140, 165),  # Salmon pink
-    "radiance": (200, 180, 200),  # Lavender gray
-    "texture": (180, 120, 220),  # Purple
-}
+CONCERN_COLORS = {concern.key: concern.color for concern in CONCERNS if concern.zones}
 
 
 def get_severity_level(score: float, num_levels: int) -> int:
@@ -699,6 +786,58 @@ def draw_severity_dots(
         )
 
 
+def face_region_roi(
+    width: int,
+    height: int,
+    face_bbox: "FaceBoundingBox | None",
+    landmarks: np.ndarray | None = None,
+) -> tuple[tuple[int, int, int, int], np.ndarray]:
+    """
+    Area wajah sebagai ROI: box tempat face region mask bukan nol, plus mask di dalamnya.
+
+    Di luar box mask selalu 0, jadi semua operasi per-pixel (threshold, exclusion,
+    blending) cukup dikerjakan di dalam box.
+
+    Args:
+        width: Image width
+        height: Image height
+        face_bbox: Bounding box wajah dari Face Detection
+        landmarks: Optional landmarks (dipakai jika face_bbox tidak ada)
+
+    Returns:
+        Tuple of ((x1, y1, x2, y2), float32 mask berukuran box)
+    """
+    if face_bbox is not None:
+        # Gunakan bounding box dengan soft edge, clamp ke image bounds
+        x1 = min(width, max(0, face_bbox.x))
+        y1 = min(height, max(0, face_bbox.y))
+        x2 = max(x1, min(width, face_bbox.x2))
+        y2 = max(y1, min(height, face_bbox.y2))
+        roi_mask = np.ones((y2 - y1, x2 - x1), dtype=np.float32)
+
+        # Soft edge dengan gradient di atas dan bawah
+        edge_size = int(min(x2 - x1, y2 - y1) * 0.05)
+        if edge_size > 0:
+            ramp = (np.arange(edge_size) / edge_size).astype(np.float32)
+            roi_mask[:edge_size] = ramp[:, None]
+            roi_mask[::-1][:edge_size] = np.minimum(roi_mask[::-1][:edge_size], ramp[:, None])
+        return (x1, y1, x2, y2), roi_mask
+
+    if landmarks is not None:
+        # Fallback: gunakan bounding box dari landmarks (tanpa scipy)
+        try:
+            x1 = min(width, max(0, int(np.min(landmarks[:, 0]))))
+            y1 = min(height, max(0, int(np.min(landmarks[:, 1]))))
+            x2 = max(x1, min(width, int(np.max(landmarks[:, 0]))))
+            y2 = max(y1, min(height, int(np.max(landmarks[:, 1]))))
+            return (x1, y1, x2, y2), np.ones((y2 - y1, x2 - x1), dtype=np.float32)
+        except Exception:
+            pass  # Jika gagal, fallback ke full image
+
+    # Tidak ada face info, gunakan full image
+    return (0, 0, width, height), np.ones((height, width), dtype=np.float32)
+
+
 def create_face_region_mask(
     width: int,
     height: int,
@@ -717,95 +856,117 @@ def create_face_region_mask(
     Returns:
         Binary mask (0 = exclude, 1 = include) sebagai float32 array
     """
+    (x1, y1, x2, y2), roi_mask = face_region_roi(width, height, face_bbox, landmarks)
     face_mask = np.zeros((height, width), dtype=np.float32)
+    face_mask[y1:y2, x1:x2] = roi_mask
+    return face_mask
 
-    if face_bbox is not None:
-        # Gunakan bounding box dengan soft edge
-        x1, y1 = face_bbox.x, face_bbox.y
-        x2, y2 = face_bbox.x2, face_bbox.y2
 
-        # Clamp to image bounds
-        x1 = max(0, x1)
-        y1 = max(0, y1)
-        x2 = min(width, x2)
-        y2 = min(height, y2)
+def _clear_excluded_discs(
+    mask_array: np.ndarray, landmarks: np.ndarray, box: tuple[int, int, int, int], radius: int
+) -> None:
+    """Nol-kan mask (ROI di box) dalam radius dari landmark mata, mulut, alis"""
+    x1, y1, x2, y2 = box
+    radius_sq = radius * radius
+    for idx in EXCLUDED_LANDMARK_ARRAY[EXCLUDED_LANDMARK_ARRAY < len(landmarks)]:
+        cx, cy = int(landmarks[idx][0]), int(landmarks[idx][1])
+        # Hanya window di sekitar titik, dipotong ke ROI
+        top, bottom = max(y1, cy - radius), min(y2, cy + radius + 1)
+        left, right = max(x1, cx - radius), min(x2, cx + radius + 1)
+        if top >= bottom or left >= right:
+            continue
+        dy = np.arange(top, bottom)[:, None] - cy
+        dx = np.arange(left, right)[None, :] - cx
+        window = mask_array[top - y1 : bottom - y1, left - x1 : right - x1]
+        window[dx * dx + dy * dy < radius_sq] = 0
 
-        # Fill face region
-        face_mask[y1:y2, x1:x2] = 1.0
 
-        # Optional: create soft edge dengan gradient
-        # Ini membuat transisi lebih halus di edge wajah
-        edge_size = int(min(x2 - x1, y2 - y1) * 0.05)
-        if edge_size > 0:
-            # Top edge gradient
-            for i in range(edge_size):
-                alpha = i / edge_size
-                if y1 + i < height:
-                    face_mask[y1 + i, x1:x2] = min(face_mask[y1 + i, x1], alpha)
-            # Bottom edge gradient
-            for i in range(edge_size):
-                alpha = i / edge_size
-                if y2 - i - 1 >= 0:
-                    row_idx = y2 - i - 1
-                    face_mask[row_idx, x1:x2] = np.minimum(
-                        face_mask[row_idx, x1:x2], alpha
-                    )
+def _composite_roi(
+    image: Image.Image | np.ndarray, overlay: Image.Image, box: tuple[int, int, int, int]
+) -> Image.Image | np.ndarray:
+    """Salinan image dengan overlay (seukuran box) di-alpha-composite pada box"""
+    result = image.copy()
+    if isinstance(image, np.ndarray):
+        x1, y1, x2, y2 = box
+        render_kernels.blend_rgba(result[y1:y2, x1:x2], np.asarray(overlay))
+        return result
+    result.paste(Image.alpha_composite(image.crop(box), overlay), box[:2])
+    return result
 
-    elif landmarks is not None:
-        # Fallback: gunakan bounding box dari landmarks (tanpa scipy)
-        try:
-            x_coords = landmarks[:, 0]
-            y_coords = landmarks[:, 1]
-            x_min = max(0, int(np.min(x_coords)))
-            y_min = max(0, int(np.min(y_coords)))
-            x_max = min(width, int(np.max(x_coords)))
-            y_max = min(height, int(np.max(y_coords)))
-
-            # Fill landmark bounding box region
-            face_mask[y_min:y_max, x_min:x_max] = 1.0
-        except Exception:
-            # Jika gagal, fallback ke full image
-            face_mask = np.ones((height, width), dtype=np.float32)
-    else:
-        # Tidak ada face info, gunakan full image
-        face_mask = np.ones((height, width), dtype=np.float32)
 
-    return face_mask
+def _face_weight(face_region_mask: np.ndarray) -> np.ndarray:
+    """Face region mask ROI (float 0-1) sebagai bobot uint8 0-255 untuk kernel fused"""
+    return cv2.convertScaleAbs(face_region_mask, alpha=255.0)
 
 
-def draw_mask_based_visualization(
-    image: Image.Image,
+def _polygon_box(
+    polygons: list[list[tuple[int, int]]], width: int, height: int
+) -> tuple[int, int, int, int] | None:
+    """Box yang memuat semua polygon (termasuk outline), dipotong ke image; None jika kosong"""
+    if not polygons:
+        return None
+    xs = [x for points in polygons for x, _ in points]
+    ys = [y for points in polygons for _, y in points]
+    x1, y1 = max(0, min(xs) - 1), max(0, min(ys) - 1)
+    x2, y2 = min(width, max(xs) + 2), min(height, max(ys) + 2)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2, y2
+
+
+def _shift_points(
+    points: list[tuple[int, int]], box: tuple[int, int, int, int]
+) -> list[tuple[int, int]]:
+    """Koordinat image -> koordinat ROI"""
+    return [(x - box[0], y - box[1]) for x, y in points]
+
+
+def mask_layer(
+    width: int,
+    height: int,
     mask_bytes: bytes,
     color: tuple[int, int, int],
     landmarks: np.ndarray | None = None,
     face_bbox: "FaceBoundingBox | None" = None,
     intensity_threshold: int = 50,
     alpha_multiplier: float = 0.8,
-) -> Image.Image:
+    fused: bool = False,
+) -> ZoneLayer | None:
     """
-    Buat visualisasi berdasarkan mask intensity dari YouCam.
+    Layer berdasarkan mask intensity dari YouCam, hanya di ROI wajah.
 
     PENTING: Visualisasi HANYA muncul di area wajah (face_bbox).
-    Area di luar wajah (background, tembok, dll) tidak akan ditampilkan.
+    Area di luar wajah (background, tembok, dll) tidak akan ditampilkan,
+    jadi semua pekerjaan per-pixel hanya dilakukan di ROI wajah.
 
     Args:
-        image: PIL Image (RGBA) untuk di-overlay
+        width: Image width
+        height: Image height
         mask_bytes: PNG bytes dari YouCam mask
         color: RGB tuple warna overlay
         landmarks: Optional landmarks untuk exclusion zone check
         face_bbox: Bounding box wajah untuk membatasi area visualisasi
         intensity_threshold: Minimum mask intensity untuk ditampilkan
         alpha_multiplier: Multiplier untuk alpha channel
+        fused: Hitung alpha dengan kernel uint8 (render backend "opencv")
 
     Returns:
-        PIL Image dengan mask overlay (hanya di area wajah)
+        ZoneLayer (alpha + color) seluas ROI wajah, atau None jika ROI kosong
     """
-    width, height = image.size
+    # =========================================================================
+    # FACE REGION ROI - Batasi visualisasi ke area wajah saja
+    # Ini mencegah dots/overlay muncul di background/tembok
+    # =========================================================================
+    box, face_region_mask = face_region_roi(width, height, face_bbox, landmarks)
+    x1, y1, x2, y2 = box
+    if x2 <= x1 or y2 <= y1:
+        return None
 
     # Load mask
-    mask_img = Image.open(io.BytesIO(mask_bytes))
+    mask_img = open_mask(mask_bytes)
     if mask_img.size != (width, height):
         mask_img = mask_img.resize((width, height), Image.Resampling.LANCZOS)
+    mask_img = mask_img.crop(box)
 
     # Convert ke grayscale untuk intensity
     if mask_img.mode != "L":
@@ -816,44 +977,169 @@ def draw_mask_based_visualization(
     else:
         mask_intensity = mask_img
 
+    exclusion_radius = int(min(width, height) * 0.03)
+    if fused:
+        # Kernel fused: threshold, face region, exclusion dan alpha dalam uint8
+        weight = _face_weight(face_region_mask)
+        if landmarks is not None:
+            _clear_excluded_discs(weight, landmarks, box, exclusion_radius)
+        alpha = render_kernels.mask_alpha(
+            np.array(mask_intensity), alpha_multiplier, intensity_threshold, weight
+        )
+        return ZoneLayer(box=box, color=color, alpha=alpha)
+
     mask_array = np.array(mask_intensity, dtype=np.float32)
 
     # Apply threshold - hanya tampilkan area dengan intensity tinggi
     mask_array[mask_array < intensity_threshold] = 0
-
-    # =========================================================================
-    # FACE REGION MASK - Batasi visualisasi ke area wajah saja
-    # Ini mencegah dots/overlay muncul di background/tembok
-    # =========================================================================
-    face_region_mask = create_face_region_mask(width, height, face_bbox, landmarks)
     mask_array = mask_array * face_region_mask
 
-    # Create exclusion mask untuk mata, mulut, alis
+    # Exclusion untuk mata, mulut, alis (radius berdasarkan ukuran gambar)
     if landmarks is not None:
-        exclusion_mask = np.ones((height, width), dtype=np.float32)
-        for idx in EXCLUDED_LANDMARK_INDICES:
-            if idx < len(landmarks):
-                cx, cy = int(landmarks[idx][0]), int(landmarks[idx][1])
-                # Radius exclusion berdasarkan ukuran gambar
-                exclusion_radius = int(min(width, height) * 0.03)
-                y_indices, x_indices = np.ogrid[:height, :width]
-                dist = np.sqrt((x_indices - cx) ** 2 + (y_indices - cy) ** 2)
-                exclusion_mask[dist < exclusion_radius] = 0
-
-        # Apply exclusion
-        mask_array = mask_array * exclusion_mask
-
-    # Create colored overlay
-    overlay = Image.new("RGBA", (width, height), (*color, 0))
+        _clear_excluded_discs(mask_array, landmarks, box, exclusion_radius)
 
     # Alpha = mask intensity * multiplier
-    alpha_array = (mask_array * alpha_multiplier).clip(0, 255).astype(np.uint8)
-    overlay.putalpha(Image.fromarray(alpha_array))
+    alpha = (mask_array * alpha_multiplier).clip(0, 255).astype(np.uint8)
+    return ZoneLayer(box=box, color=color, alpha=alpha)
 
-    # Composite
-    result = Image.alpha_composite(image, overlay)
 
-    return result
+def mask_only_layer(
+    width: int,
+    height: int,
+    mask_bytes: bytes,
+    color: tuple[int, int, int],
+    face_bbox: "FaceBoundingBox | None" = None,
+    fused: bool = False,
+) -> ZoneLayer | None:
+    """Fallback tanpa landmark: mask (enhanced) sebagai alpha, dibatasi face region jika ada"""
+    # Face region constraint jika ada: kerjakan hanya ROI wajah
+    if face_bbox is not None:
+        box, face_region_mask = face_region_roi(width, height, face_bbox, None)
+    else:
+        box, face_region_mask = (0, 0, width, height), None
+    x1, y1, x2, y2 = box
+    if x2 <= x1 or y2 <= y1:
+        return None
+
+    # Load mask
+    mask_img = open_mask(mask_bytes)
+    if mask_img.size != (width, height):
+        mask_img = mask_img.resize((width, height), Image.Resampling.LANCZOS)
+    mask_img = mask_img.crop(box)
+
+    # Convert to grayscale
+    if mask_img.mode != "L":
+        mask_img = mask_img.convert("L")
+
+    if fused:
+        # Kernel fused: enhanced alpha * face region dalam uint8
+        weight = _face_weight(face_region_mask) if face_region_mask is not None else None
+        alpha = render_kernels.mask_alpha(np.array(mask_img), 1.5, weight=weight)
+        return ZoneLayer(box=box, color=color, alpha=alpha)
+
+    # Use mask as alpha, enhanced
+    mask_array = np.array(mask_img, dtype=np.float32)
+    mask_enhanced = np.clip(mask_array * 1.5, 0, 255)
+    if face_region_mask is not None:
+        mask_enhanced = mask_enhanced * face_region_mask
+    return ZoneLayer(box=box, color=color, alpha=mask_enhanced.astype(np.uint8))
+
+
+def composite_layer(canvas: Image.Image | np.ndarray, layer: ZoneLayer) -> Image.Image | np.ndarray:
+    """Salinan canvas (PIL Image atau RGB array) dengan layer di-composite pada box-nya"""
+    x1, y1, x2, y2 = layer.box
+    if layer.alpha is None:
+        return _composite_roi(canvas, layer.rgba, layer.box)
+    if isinstance(canvas, np.ndarray):
+        result = canvas.copy()
+        render_kernels.blend(result[y1:y2, x1:x2], layer.color, layer.alpha)
+        return result
+    # Colored overlay dengan alpha dari layer
+    overlay = Image.new("RGBA", (x2 - x1, y2 - y1), (*layer.color, 0))
+    overlay.putalpha(Image.fromarray(layer.alpha))
+    return _composite_roi(canvas, overlay, layer.box)
+
+
+def encode_layer(layer: ZoneLayer) -> tuple[bytes, dict] | None:
+    """
+    Layer sebagai PNG 8-bit, dipotong ke bbox pixel dengan alpha > 0.
+
+    Layer warna tunggal menjadi PNG grayscale (alpha) plus warna di info;
+    layer dengan warna per pixel (heatmap) menjadi PNG RGBA.
+
+    Args:
+        layer: ZoneLayer dari LandmarkService.create_zone_layer
+
+    Returns:
+        Tuple of (png_bytes, info) dengan info {"x", "y", "width", "height"
+        (koordinat gambar), "format": "alpha" | "rgba", "color": [r, g, b] | None},
+        atau None jika layer tidak menutupi pixel apa pun
+    """
+    if layer.color is not None:
+        pixels = layer.alpha if layer.alpha is not None else np.asarray(layer.rgba.getchannel("A"))
+        alpha = pixels
+    else:
+        pixels = np.asarray(layer.rgba)
+        alpha = np.ascontiguousarray(pixels[..., 3])
+
+    x, y, w, h = cv2.boundingRect(alpha)
+    if w == 0 or h == 0:
+        return None
+
+    crop = np.ascontiguousarray(pixels[y : y + h, x : x + w])
+    output = io.BytesIO()
+    Image.fromarray(crop).save(output, format="PNG")
+    info = {
+        "x": layer.box[0] + x,
+        "y": layer.box[1] + y,
+        "width": w,
+        "height": h,
+        "format": "alpha" if layer.color is not None else "rgba",
+        "color": list(layer.color) if layer.color is not None else None,
+    }
+    return output.getvalue(), info
+
+
+def draw_mask_based_visualization(
+    image: Image.Image | np.ndarray,
+    mask_bytes: bytes,
+    color: tuple[int, int, int],
+    landmarks: np.ndarray | None = None,
+    face_bbox: "FaceBoundingBox | None" = None,
+    intensity_threshold: int = 50,
+    alpha_multiplier: float = 0.8,
+) -> Image.Image | np.ndarray:
+    """
+    Buat visualisasi berdasarkan mask intensity dari YouCam (lihat mask_layer).
+
+    Args:
+        image: PIL Image (RGBA), atau RGB uint8 array untuk kernel fused
+               (render backend "opencv"), untuk di-overlay (tidak diubah)
+        mask_bytes: PNG bytes dari YouCam mask
+        color: RGB tuple warna overlay
+        landmarks: Optional landmarks untuk exclusion zone check
+        face_bbox: Bounding box wajah untuk membatasi area visualisasi
+        intensity_threshold: Minimum mask intensity untuk ditampilkan
+        alpha_multiplier: Multiplier untuk alpha channel
+
+    Returns:
+        Gambar (tipe sama dengan image) dengan mask overlay (hanya di area wajah)
+    """
+    width, height = _canvas_size(image)
+    layer = mask_layer(
+        width,
+        height,
+        mask_bytes,
+        color,
+        landmarks,
+        face_bbox,
+        intensity_threshold,
+        alpha_multiplier,
+        fused=isinstance(image, np.ndarray),
+    )
+    if layer is None:
+        return image.copy()
+    return composite_layer(image, layer)
 
 
 def draw_filled_zone_overlay(
@@ -952,6 +1238,41 @@ def draw_heatmap_zone(
     draw.polygon(points, fill=(*color, alpha), outline=(*color, min(255, alpha + 40)))
 
 
+def _concern_inputs(
+    masks: dict[str, bytes], scores: dict | None, concerns: list[str] | None = None
+) -> list[tuple[str, bytes | None, float | None]]:
+    """(concern_key, mask_bytes, score) untuk concern terpilih di CONCERN_ZONE_MAPPING"""
+    selected = {concern.key for concern in selected_concerns(concerns)}
+    inputs = []
+    for concern_key in CONCERN_ZONE_MAPPING:
+        if concern_key not in selected:
+            continue
+
+        # Cari mask yang cocok
+        mask_bytes = None
+        for mask_name, mask_data in masks.items():
+            if concern_key.lower() in mask_name.lower():
+                mask_bytes = mask_data
+                break
+
+        # Extract score for this concern if available
+        concern_score = None
+        if scores:
+            score_data = scores.get(concern_key)
+            if score_data:
+                # Handle different score formats
+                if isinstance(score_data, dict):
+                    concern_score = score_data.get("ui_score") or score_data.get("raw_score")
+                    # Handle nested 'whole' structure
+                    if concern_score is None and "whole" in score_data:
+                        concern_score = score_data["whole"].get("ui_score")
+                elif isinstance(score_data, (int, float)):
+                    concern_score = float(score_data)
+
+        inputs.append((concern_key, mask_bytes, concern_score))
+    return inputs
+
+
 class LandmarkService:
     """Service untuk deteksi landmark wajah menggunakan MediaPipe"""
 
@@ -1098,26 +1419,53 @@ class LandmarkService:
                 status=LandmarkStatus.FAILED, error_message=f"Error deteksi landmark: {str(e)}"
             )
 
-    def create_zone_visualization(
+    def prepare_render_base(self, image_bytes: bytes, concern_key: str | None = None) -> RenderBase:
+        """
+        Deteksi landmark dan UV tint sekali per gambar untuk semua concern.
+
+        Args:
+            image_bytes: Original image bytes
+            concern_key: Label concern untuk stage metrics (None = dipakai bersama)
+
+        Returns:
+            RenderBase dengan landmark result dan gambar UV-tinted (PIL Image RGBA,
+            atau RGB array untuk render backend "opencv")
+        """
+        with stage("landmarks", concern_key):
+            landmark_result = self.detect_landmarks(image_bytes)
+
+        # Apply UV tint untuk efek analisis profesional (cyan/teal base)
+        if render_kernels.use_fused_kernels():
+            original = np.asarray(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+            with stage("uv_tint", concern_key):
+                tinted = render_kernels.apply_uv_tint(original, UV_TINT_CONFIG)
+        else:
+            original = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
+            with stage("uv_tint", concern_key):
+                tinted = _apply_uv_tint(original)
+        return RenderBase(landmark_result=landmark_result, tinted=tinted)
+
+    def create_zone_layer(
         self,
         image_bytes: bytes,
         concern_key: str,
         mask_bytes: bytes | None = None,
-        style: str = "canny",
         score: float | None = None,
-    ) -> tuple[bytes, dict]:
+        base: RenderBase | None = None,
+    ) -> tuple[ZoneLayer | None, dict]:
         """
-        Buat visualisasi zona untuk concern tertentu dengan severity-based colors.
+        Overlay zona untuk concern tertentu dengan severity-based colors, tanpa base image.
 
         Args:
             image_bytes: Original image bytes
             concern_key: Key concern (e.g., 'oiliness', 'acne')
             mask_bytes: Optional mask dari YouCam untuk intensity
-            style: 'canny' untuk outline, 'filled' untuk filled polygon
             score: Optional score dari YouCam API (0-100) untuk menentukan severity color
+            base: Optional RenderBase dari prepare_render_base (landmark + UV tint
+                  bersama untuk semua concern); dibuat dari image_bytes jika None
 
         Returns:
-            Tuple of (visualization_bytes, status_dict)
+            Tuple of (ZoneLayer atau None jika tidak ada overlay, status_dict)
 
         Color Selection Logic (based on dermatological literature):
             - If score provided: Use severity-based color from SEVERITY_COLOR_LEVELS
@@ -1129,8 +1477,9 @@ class LandmarkService:
             - Baumann Skin Typing System (oiliness)
             - Clinical pore assessment scales
         """
-        # Deteksi landmark
-        landmark_result = self.detect_landmarks(image_bytes)
+        if base is None:
+            base = self.prepare_render_base(image_bytes, concern_key)
+        landmark_result = base.landmark_result
 
         # Determine color based on score (severity-based) or fallback
         if score is not None:
@@ -1153,12 +1502,9 @@ class LandmarkService:
             "color_rgb": color,
         }
 
-        # Load original image
-        original = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
-        width, height = original.size
-
-        # Apply UV tint untuk efek analisis profesional (cyan/teal base)
-        original_with_uv = _apply_uv_tint(original)
+        # UV-tinted base (cyan/teal): layer dihitung untuk ukuran dan backend-nya
+        width, height = _canvas_size(base.tinted)
+        fused = isinstance(base.tinted, np.ndarray)
 
         if landmark_result.status == LandmarkStatus.FAILED:
             # Fallback: gunakan mask saja jika ada (dengan UV tint)
@@ -1168,14 +1514,11 @@ class LandmarkService:
                 status["fallback_used"] = True
                 status["visualization_source"] = "mask_only"
                 status["face_bbox_detected"] = fallback_bbox is not None
-                return self._apply_mask_only(
-                    original_with_uv, mask_bytes, concern_key, score, fallback_bbox
+                return mask_only_layer(
+                    width, height, mask_bytes, color, fallback_bbox, fused
                 ), status
-            else:
-                # Return UV-tinted image dengan status failed
-                output = io.BytesIO()
-                original_with_uv.convert("RGB").save(output, format="JPEG", quality=95)
-                return output.getvalue(), status
+            # UV-tinted image saja dengan status failed
+            return None, status
 
         # Success: buat visualisasi dengan landmark
         landmarks = landmark_result.landmarks
@@ -1195,14 +1538,16 @@ class LandmarkService:
         if viz_style == "dots" and mask_bytes:
             # Gunakan mask-based visualization - BUKAN dots di semua landmarks
             # Ini mempertegas hasil YouCam yang sudah ada
-            result = draw_mask_based_visualization(
-                image=original_with_uv,
+            layer = mask_layer(
+                width,
+                height,
                 mask_bytes=mask_bytes,
                 color=color,
                 landmarks=landmarks,
                 face_bbox=face_bbox,  # Constraint ke area wajah
                 intensity_threshold=40,  # Hanya tampilkan area dengan concern
                 alpha_multiplier=0.7,
+                fused=fused,
             )
             status["visualization_source"] = "mask_based"
 
@@ -1210,41 +1555,30 @@ class LandmarkService:
         # HEATMAP VISUALIZATION untuk oiliness (T-zone vs U-zone)
         # =====================================================================
         elif viz_style == "heatmap":
-            overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-            draw = ImageDraw.Draw(overlay)
-
-            zones = CONCERN_ZONE_MAPPING.get(concern_key, ["t_zone", "u_zone"])
-            for zone_name in zones:
-                zone_indices = self._get_zone_indices(zone_name)
-                if not zone_indices:
-                    continue
-
-                points = []
-                for idx in zone_indices:
-                    if idx < len(landmarks) and not is_excluded_landmark(idx):
-                        x, y = landmarks[idx][0], landmarks[idx][1]
-                        points.append((int(x), int(y)))
-
-                if len(points) < 3:
-                    continue
-
-                # Determine zone type
-                if zone_name in ["t_zone", "forehead", "nose", "chin"]:
-                    zone_type = "t_zone"
-                else:
-                    zone_type = "u_zone"
-
-                heatmap_score = score if score is not None else 50.0
-                draw_heatmap_zone(
-                    draw=draw,
-                    points=points,
-                    zone_type=zone_type,
-                    score=heatmap_score,
-                    width=width,
-                    height=height,
-                )
-
-            result = Image.alpha_composite(original_with_uv, overlay)
+            zones = CONCERN_ZONE_POLYGONS.get(concern_key, DEFAULT_HEATMAP_ZONES)
+            heatmap_score = score if score is not None else 50.0
+            shapes = [
+                (zone_type, points)
+                for _zone_name, zone_type, polygons in zones
+                for points in gather_zone_polygons(polygons, landmarks)
+            ]
+
+            # Overlay hanya seluas polygon (ROI), warna per zona
+            box = _polygon_box([points for _, points in shapes], width, height)
+            layer = None
+            if box is not None:
+                overlay = Image.new("RGBA", (box[2] - box[0], box[3] - box[1]), (0, 0, 0, 0))
+                draw = ImageDraw.Draw(overlay)
+                for zone_type, points in shapes:
+                    draw_heatmap_zone(
+                        draw=draw,
+                        points=_shift_points(points, box),
+                        zone_type=zone_type,
+                        score=heatmap_score,
+                        width=width,
+                        height=height,
+                    )
+                layer = ZoneLayer(box=box, rgba=overlay)
             status["visualization_source"] = "heatmap_zones"
 
         # =====================================================================
@@ -1255,111 +1589,79 @@ class LandmarkService:
         else:
             if mask_bytes:
                 # Mask-based overlay untuk area concerns
-                result = draw_mask_based_visualization(
-                    image=original_with_uv,
+                layer = mask_layer(
+                    width,
+                    height,
                     mask_bytes=mask_bytes,
                     color=color,
                     landmarks=landmarks,
                     face_bbox=face_bbox,  # Constraint ke area wajah
                     intensity_threshold=30,
                     alpha_multiplier=0.6,
+                    fused=fused,
                 )
                 status["visualization_source"] = "mask_overlay"
             else:
                 # Fallback: filled polygon berdasarkan zones
-                overlay = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-                draw = ImageDraw.Draw(overlay)
-
-                zones = CONCERN_ZONE_MAPPING.get(concern_key, ["left_cheek", "right_cheek"])
-                for zone_name in zones:
-                    zone_indices = self._get_zone_indices(zone_name)
-                    if not zone_indices:
-                        continue
-
-                    points = []
-                    for idx in zone_indices:
-                        if idx < len(landmarks) and not is_excluded_landmark(idx):
-                            x, y = landmarks[idx][0], landmarks[idx][1]
-                            points.append((int(x), int(y)))
-
-                    if len(points) < 3:
-                        continue
-
+                zones = CONCERN_ZONE_POLYGONS.get(concern_key, DEFAULT_BOUNDARY_ZONES)
+                shapes = [
+                    points
+                    for _zone_name, _zone_type, polygons in zones
+                    for points in gather_zone_polygons(polygons, landmarks)
+                ]
+
+                # Overlay hanya seluas polygon (ROI), satu warna
+                box = _polygon_box(shapes, width, height)
+                layer = None
+                if box is not None:
+                    overlay = Image.new("RGBA", (box[2] - box[0], box[3] - box[1]), (0, 0, 0, 0))
+                    draw = ImageDraw.Draw(overlay)
                     # Alpha berdasarkan severity
                     alpha = 60 + (current_severity * 30)
-                    draw_filled_zone_overlay(draw, points, color, alpha)
-
-                result = Image.alpha_composite(original_with_uv, overlay)
+                    for points in shapes:
+                        draw_filled_zone_overlay(draw, _shift_points(points, box), color, alpha)
+                    layer = ZoneLayer(box=box, color=color, rgba=overlay)
                 status["visualization_source"] = "zone_polygon"
 
-        # Convert ke JPEG
-        output = io.BytesIO()
-        result.convert("RGB").save(output, format="JPEG", quality=95)
-
-        return output.getvalue(), status
-
-    def _get_zone_indices(self, zone_name: str) -> list[int]:
-        """Dapatkan landmark indices untuk zona tertentu"""
-        # Cek di nested zones (t_zone)
-        for main_zone, sub_zones in FACIAL_ZONES.items():
-            if isinstance(sub_zones, dict):
-                if zone_name in sub_zones:
-                    return sub_zones[zone_name]
-                if zone_name == main_zone:
-                    # Gabungkan semua sub-zones
-                    all_indices = []
-                    for sub_zone in sub_zones.values():
-                        all_indices.extend(sub_zone)
-                    return list(set(all_indices))
-            elif zone_name == main_zone:
-                return sub_zones
-        return []
-
-    def _apply_mask_only(
+        return layer, status
+
+    def create_zone_visualization(
         self,
-        original: Image.Image,
-        mask_bytes: bytes,
+        image_bytes: bytes,
         concern_key: str,
+        mask_bytes: bytes | None = None,
+        style: str = "canny",
         score: float | None = None,
-        face_bbox: FaceBoundingBox | None = None,
-    ) -> bytes:
-        """Fallback: apply mask tanpa landmark dengan face region constraint"""
-        width, height = original.size
-
-        # Use severity-based color if score provided
-        if score is not None:
-            color = get_color_for_severity(concern_key, score)
-        else:
-            color = CONCERN_COLORS.get(concern_key, (0, 212, 255))
-
-        # Load mask
-        mask_img = Image.open(io.BytesIO(mask_bytes))
-        if mask_img.size != (width, height):
-            mask_img = mask_img.resize((width, height), Image.Resampling.LANCZOS)
-
-        # Convert to grayscale
-        if mask_img.mode != "L":
-            mask_img = mask_img.convert("L")
+        base: RenderBase | None = None,
+    ) -> tuple[bytes, dict]:
+        """
+        Buat visualisasi zona untuk concern tertentu: layer dari create_zone_layer
+        di-composite di atas gambar UV-tinted.
 
-        # Use mask as alpha, enhanced
-        mask_array = np.array(mask_img, dtype=np.float32)
-        mask_enhanced = np.clip(mask_array * 1.5, 0, 255)
+        Args:
+            image_bytes: Original image bytes
+            concern_key: Key concern (e.g., 'oiliness', 'acne')
+            mask_bytes: Optional mask dari YouCam untuk intensity
+            style: 'canny' untuk outline, 'filled' untuk filled polygon
+            score: Optional score dari YouCam API (0-100) untuk menentukan severity color
+            base: Optional RenderBase dari prepare_render_base (landmark + UV tint
+                  bersama untuk semua concern); dibuat dari image_bytes jika None
 
-        # Apply face region constraint jika ada
-        if face_bbox is not None:
-            face_region_mask = create_face_region_mask(width, height, face_bbox, None)
-            mask_enhanced = mask_enhanced * face_region_mask
+        Returns:
+            Tuple of (visualization_bytes, status_dict)
+        """
+        if base is None:
+            base = self.prepare_render_base(image_bytes, concern_key)
+        layer, status = self.create_zone_layer(image_bytes, concern_key, mask_bytes, score, base)
 
-        # Create colored overlay dengan enhanced alpha
-        overlay = Image.new("RGBA", (width, height), (*color, 0))
-        overlay.putalpha(Image.fromarray(mask_enhanced.astype(np.uint8)))
+        # UV-tinted base dipakai bersama - composite_layer membuat salinan
+        result = base.tinted if layer is None else composite_layer(base.tinted, layer)
 
-        # Composite
-        result = Image.alpha_composite(original, overlay)
+        # Convert ke JPEG
+        with stage("jpeg_encode", concern_key):
+            viz_bytes = _encode_jpeg(result)
 
-        output = io.BytesIO()
-        result.convert("RGB").save(output, format="JPEG", quality=95)
-        return output.getvalue()
+        return viz_bytes, status
 
     def _add_intensity_dots(
         self, overlay: Image.Image, mask_bytes: bytes, landmarks: np.ndarray, color: tuple
@@ -1373,7 +1675,7 @@ class LandmarkService:
 
         try:
             # Load mask
-            mask_img = Image.open(io.BytesIO(mask_bytes)).convert("L")
+            mask_img = open_mask(mask_bytes).convert("L")
             if mask_img.size != (width, height):
                 mask_img = mask_img.resize((width, height), Image.Resampling.LANCZOS)
 
@@ -1403,6 +1705,7 @@ class LandmarkService:
         image_bytes: bytes,
         masks: dict[str, bytes],
         scores: dict | None = None,
+        concerns: list[str] | None = None,
     ) -> tuple[dict[str, bytes], dict[str, dict]]:
         """
         Buat visualisasi untuk semua concern dengan severity-based colors.
@@ -1412,6 +1715,8 @@ class LandmarkService:
             masks: Dictionary of mask_name -> PNG bytes
             scores: Optional dictionary of scores from YouCam API for severity coloring
                     Format: {"oiliness": {"ui_score": 45.2}, "acne": {"ui_score": 72.1}, ...}
+            concerns: Optional subset of concerns (YouCam actions, see concerns.py);
+                      None = all concerns
 
         Returns:
             Tuple of (visualizations_dict, statuses_dict)
@@ -1423,43 +1728,96 @@ class LandmarkService:
         visualizations = {}
         statuses = {}
 
-        concerns = list(CONCERN_ZONE_MAPPING.keys())
-
-        for concern_key in concerns:
-            # Cari mask yang cocok
-            mask_bytes = None
-            for mask_name, mask_data in masks.items():
-                if concern_key.lower() in mask_name.lower():
-                    mask_bytes = mask_data
-                    break
-
-            # Extract score for this concern if available
-            concern_score = None
-            if scores:
-                score_data = scores.get(concern_key)
-                if score_data:
-                    # Handle different score formats
-                    if isinstance(score_data, dict):
-                        concern_score = score_data.get("ui_score") or score_data.get("raw_score")
-                        # Handle nested 'whole' structure
-                        if concern_score is None and "whole" in score_data:
-                            concern_score = score_data["whole"].get("ui_score")
-                    elif isinstance(score_data, (int, float)):
-                        concern_score = float(score_data)
-
-            viz_bytes, status = self.create_zone_visualization(
-                image_bytes,
-                concern_key,
-                mask_bytes=mask_bytes,
-                style="canny",
-                score=concern_score,
-            )
+        inputs = _concern_inputs(masks, scores, concerns)
+        if not inputs:
+            # Subset tanpa concern ber-overlay: tidak perlu deteksi landmark
+            return visualizations, statuses
+
+        # Landmark + UV tint dihitung sekali; tiap concern hanya menggambar di ROI wajah
+        base = self.prepare_render_base(image_bytes)
 
+        def render(concern_input: tuple) -> tuple[bytes, dict]:
+            concern_key, mask_bytes, concern_score = concern_input
+            with stage("zone", concern_key):
+                return self.create_zone_visualization(
+                    image_bytes,
+                    concern_key,
+                    mask_bytes=mask_bytes,
+                    style="canny",
+                    score=concern_score,
+                    base=base,
+                )
+
+        # Render + JPEG encode per concern paralel di codec executor (base read-only)
+        for (concern_key, _, _), (viz_bytes, status) in zip(
+            inputs, codec_executor.imap(render, inputs), strict=True
+        ):
             visualizations[concern_key] = viz_bytes
             statuses[concern_key] = status
 
         return visualizations, statuses
 
+    def create_all_zone_layers(
+        self,
+        image_bytes: bytes,
+        masks: dict[str, bytes],
+        scores: dict | None = None,
+        concerns: list[str] | None = None,
+    ) -> tuple[bytes | None, dict[str, bytes], dict[str, dict], dict[str, dict]]:
+        """
+        Layered delivery: gambar UV-tinted sekali plus satu layer kecil per concern.
+
+        Frontend meng-composite layer di atas base; hasilnya sama dengan
+        create_all_zone_visualizations tanpa JPEG penuh per concern.
+
+        Args:
+            image_bytes: Original image bytes
+            masks: Dictionary of mask_name -> PNG bytes
+            scores: Optional dictionary of scores from YouCam API for severity coloring
+            concerns: Optional subset of concerns (YouCam actions, see concerns.py);
+                      None = all concerns
+
+        Returns:
+            Tuple of:
+            - UV-tinted base image (JPEG bytes), None jika tidak ada concern ber-overlay
+            - Dictionary of concern_key -> layer PNG (lihat encode_layer)
+            - Dictionary of concern_key -> layer info (posisi, ukuran, format, warna)
+            - Dictionary of concern_key -> status dict
+            Concern tanpa overlay (mis. landmark gagal tanpa mask) tidak punya layer.
+        """
+        layers = {}
+        layer_info = {}
+        statuses = {}
+
+        inputs = _concern_inputs(masks, scores, concerns)
+        if not inputs:
+            return None, layers, layer_info, statuses
+
+        base = self.prepare_render_base(image_bytes)
+        with stage("jpeg_encode"):
+            base_bytes = _encode_jpeg(base.tinted)
+
+        def render(concern_input: tuple) -> tuple[tuple[bytes, dict] | None, dict]:
+            concern_key, mask_bytes, concern_score = concern_input
+            with stage("zone", concern_key):
+                layer, status = self.create_zone_layer(
+                    image_bytes, concern_key, mask_bytes, concern_score, base
+                )
+            if layer is None:
+                return None, status
+            with stage("layer_encode", concern_key):
+                return encode_layer(layer), status
+
+        # Layer + PNG encode per concern paralel di codec executor
+        for (concern_key, _, _), (encoded, status) in zip(
+            inputs, codec_executor.imap(render, inputs), strict=True
+        ):
+            if encoded is not None:
+                layers[concern_key], layer_info[concern_key] = encoded
+            statuses[concern_key] = status
+
+        return base_bytes, layers, layer_info, statuses
+
 
 # Singleton instance
 _landmark_service: LandmarkService | None = None
@@ -0,0 +1,333 @@
+"""
+Per-stage timing of the analysis pipeline.
+
+Code wraps each pipeline step in `stage("name")` (or
+`stage("name", concern)` for per-concern work). Every stage is recorded in
+two places:
+
+- the current request's timings, sent back by ServerTimingMiddleware as a
+  `Server-Timing` header (durations of the same stage are summed)
+- Prometheus histograms served by GET /metrics:
+  analysis_stage_duration_seconds{stage} and
+  analysis_concern_stage_duration_seconds{stage, concern}
+
+A stage costs two perf_counter() calls, a bisect and a short lock, so it is
+cheap enough to stay on in production. Metrics are per worker process.
+
+Memory tracking mode (MEMORY_TRACKING_ENABLED) additionally records, per
+stage and per request ("request" stage), the peak RSS of the process and
+the peak of tracemalloc-traced allocations above the stage's start
+(Python and NumPy; PIL image buffers are only visible in RSS). The RSS peak
+is exact on Linux, where VmHWM is reset through /proc/self/clear_refs when a
+stage starts. Both are process-wide, so concurrent requests inflate each
+other's numbers, and tracemalloc slows allocation-heavy code down: use it
+for sizing runs, not in regular production traffic. The values show up in
+the Server-Timing descriptions and as analysis_stage_peak_rss_bytes /
+analysis_stage_peak_traced_bytes histograms.
+"""
+
+import os
+import re
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar, Token
+
+from app.config import settings
+
+# Histogram upper bounds in seconds (1 ms .. 2 min: codecs up to GPT and YouCam polling)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Histogram upper bounds in bytes for memory tracking mode (1 MB .. 8 GB)
+BYTE_BUCKETS = tuple(float(2**exponent * 1024 * 1024) for exponent in range(0, 14))
+
+# (stage name, seconds, memory) of the stages run for the current request;
+# memory is (peak RSS bytes, peak traced bytes) in memory tracking mode, else None
+_request_timings: ContextVar[list | None] = ContextVar("request_timings", default=None)
+
+_MB = 1024 * 1024
+
+
+class _Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# Metric families: name -> (help text, bucket bounds)
+_FAMILIES = {
+    "analysis_stage_duration_seconds": ("Duration of analysis pipeline stages", BUCKETS),
+    "analysis_concern_stage_duration_seconds": (
+        "Duration of per-concern analysis pipeline stages",
+        BUCKETS,
+    ),
+    "analysis_stage_peak_rss_bytes": (
+        "Peak process RSS during analysis pipeline stages (memory tracking mode)",
+        BYTE_BUCKETS,
+    ),
+    "analysis_stage_peak_traced_bytes": (
+        "Peak traced allocations above the stage start (memory tracking mode)",
+        BYTE_BUCKETS,
+    ),
+}
+
+
+class StageMetrics:
+    """Histograms keyed by (metric family, stage, concern)"""
+
+    def __init__(self):
+        self._histograms: dict[tuple[str, str, str | None], _Histogram] = {}
+        # Stages also finish in worker threads (rendering, MediaPipe)
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        name: str,
+        concern: str | None,
+        seconds: float,
+        memory: tuple[int | None, int] | None = None,
+    ) -> None:
+        if concern is None:
+            values = [("analysis_stage_duration_seconds", seconds)]
+        else:
+            values = [("analysis_concern_stage_duration_seconds", seconds)]
+        if memory is not None:
+            rss_peak, traced_peak = memory
+            if rss_peak is not None:
+                values.append(("analysis_stage_peak_rss_bytes", rss_peak))
+            values.append(("analysis_stage_peak_traced_bytes", traced_peak))
+
+        with self._lock:
+            for family, value in values:
+                key = (family, name, concern)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = _Histogram(_FAMILIES[family][1])
+                histogram.observe(value)
+
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, seconds, memory))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            snapshot = [
+                (key, h.bounds, list(h.counts), h.sum, h.count)
+                for key, h in self._histograms.items()
+            ]
+        snapshot.sort(key=lambda s: (s[0][0], s[0][1], s[0][2] or ""))
+
+        lines: list[str] = []
+        for metric, (help_text, _) in _FAMILIES.items():
+            series = [s for s in snapshot if s[0][0] == metric]
+            if not series and "duration" not in metric:
+                continue  # Memory families only appear in memory tracking mode
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for (_, name, concern), bounds, counts, total, count in series:
+                labels = f'stage="{_escape(name)}"'
+                if concern is not None:
+                    labels += f',concern="{_escape(concern)}"'
+                cumulative = 0
+                for bound, bucket_count in zip(bounds, counts, strict=False):
+                    cumulative += bucket_count
+                    le = int(bound) if bound.is_integer() else bound
+                    lines.append(f'{metric}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{metric}_sum{{{labels}}} {total:.6f}")
+                lines.append(f"{metric}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_STATUS_FIELDS = re.compile(r"^(VmRSS|VmHWM):\s+(\d+) kB", re.MULTILINE)
+
+
+def _read_rss() -> tuple[int | None, int | None]:
+    """Current and peak (VmHWM) RSS in bytes, (None, None) without /proc"""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(_STATUS_FIELDS.findall(f.read()))
+    except OSError:
+        return None, None
+    rss, hwm = fields.get("VmRSS"), fields.get("VmHWM")
+    return (
+        int(rss) * 1024 if rss is not None else None,
+        int(hwm) * 1024 if hwm is not None else None,
+    )
+
+
+class MemoryTracker:
+    """Peak RSS and traced allocations of the currently open stages"""
+
+    def __init__(self):
+        self._open: list[_Stage] = []
+        self._lock = threading.Lock()
+        self._can_reset_rss = os.path.exists("/proc/self/clear_refs")
+
+    def _reset_rss_peak(self) -> None:
+        if not self._can_reset_rss:
+            return
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")  # Reset VmHWM to the current RSS
+        except OSError:
+            self._can_reset_rss = False
+
+    def _update_open(self) -> None:
+        _, traced_peak = tracemalloc.get_traced_memory()
+        rss, hwm = _read_rss()
+        rss_peak = hwm if self._can_reset_rss else rss
+        for open_stage in self._open:
+            open_stage.traced_max = max(open_stage.traced_max, traced_peak)
+            if rss_peak is not None:
+                open_stage.rss_max = max(open_stage.rss_max or 0, rss_peak)
+
+    def enter(self, entered: "_Stage") -> None:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            # Fold the peaks so far into the enclosing stages before resetting them
+            self._update_open()
+            tracemalloc.reset_peak()
+            self._reset_rss_peak()
+            entered.traced_start = entered.traced_max = tracemalloc.get_traced_memory()[0]
+            entered.rss_max = _read_rss()[0]
+            self._open.append(entered)
+
+    def peek(self, open_stage: "_Stage") -> tuple[int | None, int]:
+        """(peak RSS, peak traced bytes above start) of a stage that is still open"""
+        with self._lock:
+            self._update_open()
+        return open_stage.rss_max, open_stage.traced_max - open_stage.traced_start
+
+    def exit(self, exited: "_Stage") -> tuple[int | None, int]:
+        with self._lock:
+            self._update_open()
+            self._open.remove(exited)
+        return exited.rss_max, exited.traced_max - exited.traced_start
+
+
+class _Stage:
+    __slots__ = ("name", "concern", "started", "traced_start", "traced_max", "rss_max")
+
+    def __init__(self, name: str, concern: str | None):
+        self.name = name
+        self.concern = concern
+
+    def __enter__(self) -> "_Stage":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        stage_metrics.observe(self.name, self.concern, time.perf_counter() - self.started)
+        return False
+
+
+class _MemoryStage(_Stage):
+    __slots__ = ()
+
+    def __enter__(self) -> "_Stage":
+        memory_tracker.enter(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        seconds = time.perf_counter() - self.started
+        stage_metrics.observe(self.name, self.concern, seconds, memory_tracker.exit(self))
+        return False
+
+    def memory_so_far(self) -> tuple[int | None, int]:
+        return memory_tracker.peek(self)
+
+
+_DISABLED = nullcontext()
+
+
+def stage(name: str, concern: str | None = None):
+    """
+    Time a block as a pipeline stage (sync or async code, also in threads).
+
+    Example:
+        with stage("composite"):
+            composite_bytes = create_composite_visualization(...)
+    """
+    if not settings.metrics_enabled:
+        return _DISABLED
+    if settings.memory_tracking_enabled:
+        return _MemoryStage(name, concern)
+    return _Stage(name, concern)
+
+
+def start_request_timings() -> tuple[list, Token]:
+    """Collect the stages of the current request (called by ServerTimingMiddleware)"""
+    timings: list = []
+    return timings, _request_timings.set(timings)
+
+
+def end_request_timings(token: Token) -> None:
+    _request_timings.reset(token)
+
+
+def _memory_desc(memory: tuple[int | None, int]) -> str:
+    rss_peak, traced_peak = memory
+    parts = [f"rss {rss_peak / _MB:.0f}MB"] if rss_peak is not None else []
+    parts.append(f"traced +{traced_peak / _MB:.0f}MB")
+    return ", ".join(parts)
+
+
+def _max_memory(a: tuple | None, b: tuple | None) -> tuple | None:
+    if a is None or b is None:
+        return a or b
+    rss = max(a[0], b[0]) if a[0] is not None and b[0] is not None else a[0] or b[0]
+    return rss, max(a[1], b[1])
+
+
+def server_timing_header(
+    timings: list, total_s: float | None = None, total_memory: tuple | None = None
+) -> str:
+    """Server-Timing value: one entry per stage (summed, memory peaks maxed), plus total"""
+    durations: dict[str, list] = {}
+    for name, seconds, memory in list(timings):
+        entry = durations.setdefault(name, [0.0, 0, None])
+        entry[0] += seconds
+        entry[1] += 1
+        entry[2] = _max_memory(entry[2], memory)
+
+    parts = []
+    for name, (seconds, count, memory) in durations.items():
+        desc = []
+        if count > 1:
+            desc.append(f"{count} calls, summed")
+        if memory is not None:
+            desc.append(_memory_desc(memory))
+        part = f"{name};dur={seconds * 1000:.1f}"
+        if desc:
+            part += f';desc="{", ".join(desc)}"'
+        parts.append(part)
+    if total_s is not None:
+        part = f"total;dur={total_s * 1000:.1f}"
+        if total_memory is not None:
+            part += f';desc="{_memory_desc(total_memory)}"'
+        parts.append(part)
+    return ", ".join(parts)
+
+
+# Singleton instance
+stage_metrics = StageMetrics()
+memory_tracker = MemoryTracker()
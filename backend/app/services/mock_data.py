@@ -1,12 +1,18 @@
 """Mock data for YouCam bypass mode - enables testing without consuming API tokens"""
 
 import io
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
 
 import numpy as np
 from PIL import Image, ImageDraw
 
+from app.services.concerns import filter_masks, filter_scores
 
-def generate_mock_scores() -> dict:
+
+def generate_mock_scores(concerns: list[str] | None = None) -> dict:
     """
     Generate mock skin analysis scores matching YouCam API structure.
 
@@ -17,8 +23,12 @@ def generate_mock_scores() -> dict:
     - Each concern has {"raw_score": float, "ui_score": float}
     - "all" has {"score": float}
     - "skin_age" is just an integer
+
+    Args:
+        concerns: Optional subset of concerns (YouCam actions); like YouCam,
+                  only their scores are returned (plus "all" and "skin_age")
     """
-    return {
+    scores = {
         # Individual concerns - match YouCam API structure
         "acne": {"raw_score": 45.2, "ui_score": 45.2},
         "wrinkle": {"raw_score": 62.8, "ui_score": 62.8},
@@ -36,105 +46,264 @@ def generate_mock_scores() -> dict:
         "all": {"score": 78.0},
         "skin_age": 28,
     }
+    return filter_scores(scores, concerns)
 
 
-def create_debug_mask(width: int, height: int, concern_name: str) -> bytes:
-    """
-    Create a simple debug mask image for visualization testing.
+# Mask colors per concern type (RGBA)
+MOCK_MASK_COLORS = {
+    "acne": (255, 100, 100, 150),  # Red
+    "wrinkle": (200, 150, 255, 150),  # Purple
+    "pore": (100, 200, 255, 150),  # Cyan
+    "age_spot": (255, 200, 100, 150),  # Orange
+    "oiliness": (255, 255, 100, 150),  # Yellow
+    "radiance": (255, 200, 200, 150),  # Pink
+    "texture": (150, 255, 150, 150),  # Light green
+    "redness": (255, 50, 50, 150),  # Bright red
+    "firmness": (200, 200, 255, 150),  # Light blue
+    "moisture": (100, 255, 255, 150),  # Aqua
+    "dark_circle_v2": (150, 100, 200, 150),  # Dark purple
+    "eye_bag": (180, 150, 200, 150),  # Lavender
+}
 
-    Args:
-        width: Image width in pixels
-        height: Image height in pixels
-        concern_name: Name of the concern (for labeling)
+MOCK_CONCERNS = list(MOCK_MASK_COLORS)
 
-    Returns:
-        PNG bytes of debug mask with simple patterns
+# Mask cache bound: encoded PNGs plus decoded RGBA masks of all cached sizes.
+# Decoded masks cost 4 bytes/pixel x 12 concerns (~100 MB at 1080p, ~576 MB
+# at 12MP), so larger frames only keep the encoded PNGs (<1 MB per size).
+MOCK_MASK_CACHE_MAX_BYTES = 128 * 1024 * 1024
+MOCK_MASK_DECODED_MAX_PIXELS = 1920 * 1080
+
+
+def _spot_pattern(width: int, height: int, concern_name: str) -> np.ndarray:
     """
-    # Create transparent image
-    img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-
-    # Define colors for different concern types
-    color_map = {
-        "acne": (255, 100, 100, 150),  # Red
-        "wrinkle": (200, 150, 255, 150),  # Purple
-        "pore": (100, 200, 255, 150),  # Cyan
-        "age_spot": (255, 200, 100, 150),  # Orange
-        "oiliness": (255, 255, 100, 150),  # Yellow
-        "radiance": (255, 200, 200, 150),  # Pink
-        "texture": (150, 255, 150, 150),  # Light green
-        "redness": (255, 50, 50, 150),  # Bright red
-        "firmness": (200, 200, 255, 150),  # Light blue
-        "moisture": (100, 255, 255, 150),  # Aqua
-        "dark_circle_v2": (150, 100, 200, 150),  # Dark purple
-        "eye_bag": (180, 150, 200, 150),  # Lavender
-    }
+    Boolean (height, width) map of the simulated problem areas of a concern.
 
-    color = color_map.get(concern_name, (150, 150, 150, 150))
+    Uses a local Generator seeded from the concern name (crc32, stable across
+    processes and threads, unlike hash() with the global np.random state).
+    """
+    rng = np.random.default_rng(zlib.crc32(concern_name.encode("utf-8")))
+    pattern = np.zeros((height, width), dtype=bool)
 
-    # Draw some simple patterns to simulate problem areas
     # Pattern 1: Random scattered dots (simulating problem spots)
-    np.random.seed(hash(concern_name) % 2**32)  # Consistent random pattern per concern
-    for _ in range(30):
-        x = np.random.randint(0, width)
-        y = np.random.randint(0, height)
-        radius = np.random.randint(5, 15)
-        draw.ellipse([(x - radius, y - radius), (x + radius, y + radius)], fill=color)
+    xs = rng.integers(0, width, 30)
+    ys = rng.integers(0, height, 30)
+    radii = rng.integers(5, 15, 30)
+    for x, y, radius in zip(xs, ys, radii, strict=True):
+        # Fill the disc inside its bounding window only
+        top, bottom = max(0, y - radius), min(height, y + radius + 1)
+        left, right = max(0, x - radius), min(width, x + radius + 1)
+        dy = np.arange(top, bottom)[:, None] - y
+        dx = np.arange(left, right)[None, :] - x
+        pattern[top:bottom, left:right] |= dx * dx + dy * dy <= radius * radius
 
     # Pattern 2: Some lines (for wrinkles, texture, etc.)
     if concern_name in ["wrinkle", "texture", "firmness"]:
         for i in range(5):
             y_pos = int(height * (0.3 + i * 0.1))
-            draw.line([(0, y_pos), (width, y_pos)], fill=color, width=2)
+            pattern[max(0, y_pos - 1) : y_pos + 1, :] = True
 
-    # Add label
+    return pattern
+
+
+def _render_debug_mask(width: int, height: int, concern_name: str) -> Image.Image:
+    """RGBA debug mask (transparent except the concern's spots and the label)"""
+    color = MOCK_MASK_COLORS.get(concern_name, (150, 150, 150, 150))
+    rows, cols = np.nonzero(_spot_pattern(width, height, concern_name))
+    pixels = np.zeros((height, width, 4), dtype=np.uint8)
+    pixels[rows, cols] = color
+
+    # Add label (drawn on the top-left corner only, then copied back)
     try:
-        # Draw label background
         label = f"[MOCK] {concern_name}"
-        bbox = draw.textbbox((0, 0), label)
-        label_width = bbox[2] - bbox[0] + 20
-        label_height = bbox[3] - bbox[1] + 10
-        draw.rectangle([(10, 10), (10 + label_width, 10 + label_height)], fill=(0, 0, 0, 180))
+        bbox = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox((0, 0), label)
+        right = min(width, 10 + bbox[2] - bbox[0] + 20 + 1)
+        bottom = min(height, 10 + bbox[3] - bbox[1] + 10 + 1)
+        corner = Image.fromarray(pixels[:bottom, :right].copy(), "RGBA")
+        draw = ImageDraw.Draw(corner)
+        draw.rectangle([(10, 10), (right - 1, bottom - 1)], fill=(0, 0, 0, 180))
         draw.text((20, 15), label, fill=(255, 255, 255, 255))
+        pixels[:bottom, :right] = np.asarray(corner)
     except Exception:
         pass  # Font rendering might fail in some environments
 
-    # Convert to bytes
+    return Image.fromarray(pixels, "RGBA")
+
+
+def _encode_png(img: Image.Image) -> bytes:
     buffer = io.BytesIO()
     img.save(buffer, format="PNG")
     return buffer.getvalue()
 
 
-def generate_mock_masks(image_width: int = 640, image_height: int = 480) -> dict[str, bytes]:
+def create_debug_mask(width: int, height: int, concern_name: str) -> bytes:
+    """
+    Create a simple debug mask image for visualization testing.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        concern_name: Name of the concern (for labeling)
+
+    Returns:
+        PNG bytes of debug mask with simple patterns
+    """
+    return _encode_png(_render_debug_mask(width, height, concern_name))
+
+
+class _MaskSet:
+    """Mock masks for one image size, encoded and (optionally) decoded"""
+
+    __slots__ = ("encoded", "decoded", "nbytes")
+
+    def __init__(self, encoded: dict[str, bytes], decoded: dict[int, tuple[bytes, Image.Image]]):
+        self.encoded = encoded
+        self.decoded = decoded  # id(mask bytes) -> (mask bytes, loaded RGBA image)
+        self.nbytes = sum(len(mask_bytes) for mask_bytes in encoded.values()) + sum(
+            img.width * img.height * len(img.getbands()) for _, img in decoded.values()
+        )
+
+
+class MockMaskCache:
+    """
+    Mock masks per (width, height), LRU bounded by bytes.
+
+    generate_mock_masks() returns the cached PNG bytes; renderers that open
+    masks through open_mask() get the already decoded image for them
+    instead of decoding the PNG again. A size is built outside the lock;
+    concurrent callers for the same size wait for that one build.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = MOCK_MASK_CACHE_MAX_BYTES,
+        decoded_max_pixels: int = MOCK_MASK_DECODED_MAX_PIXELS,
+    ):
+        self.max_bytes = max_bytes
+        self.decoded_max_pixels = decoded_max_pixels
+        self._sizes: OrderedDict[tuple[int, int], _MaskSet] = OrderedDict()
+        self._building: dict[tuple[int, int], Future] = {}
+        self._decoded: dict[int, tuple[bytes, Image.Image]] = {}
+        self._bytes = 0
+        # Bypass requests render in worker threads
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, width: int, height: int) -> dict[str, bytes]:
+        """mask name -> PNG bytes for an image size (built on first use)"""
+        key = (width, height)
+        with self._lock:
+            mask_set = self._sizes.get(key)
+            if mask_set is not None:
+                self._sizes.move_to_end(key)
+                self.hits += 1
+                return dict(mask_set.encoded)
+            building = self._building.get(key)
+            if building is None:
+                self.misses += 1
+                future = self._building[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if building is not None:
+            return dict(building.result())
+
+        try:
+            mask_set = self._build(width, height)
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._building[key]
+            self._insert(key, mask_set)
+        future.set_result(mask_set.encoded)
+        return dict(mask_set.encoded)
+
+    def _build(self, width: int, height: int) -> _MaskSet:
+        keep_decoded = width * height <= self.decoded_max_pixels
+        encoded, decoded = {}, {}
+        for concern in MOCK_CONCERNS:
+            img = _render_debug_mask(width, height, concern)
+            mask_bytes = _encode_png(img)
+            encoded[f"sd_{concern}_output_all.png"] = mask_bytes
+            if keep_decoded:
+                decoded[id(mask_bytes)] = (mask_bytes, img)
+        return _MaskSet(encoded, decoded)
+
+    def _insert(self, key: tuple[int, int], mask_set: _MaskSet) -> None:
+        """Cache a built size (under the lock), evicting the oldest sizes over max_bytes"""
+        if mask_set.nbytes > self.max_bytes:
+            return
+        self._sizes[key] = mask_set
+        self._bytes += mask_set.nbytes
+        self._decoded.update(mask_set.decoded)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._sizes.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            for mask_id in evicted.decoded:
+                self._decoded.pop(mask_id, None)
+            self.evictions += 1
+
+    def decoded(self, mask_bytes: bytes) -> Image.Image | None:
+        """Cached decoded image of mask bytes returned by get(), else None"""
+        entry = self._decoded.get(id(mask_bytes))
+        # Identity check: ids of evicted masks can be reused by other objects
+        if entry is None or entry[0] is not mask_bytes:
+            return None
+        return entry[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sizes": len(self._sizes),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+
+def open_mask(mask_bytes: bytes) -> Image.Image:
+    """
+    Open a mask image (YouCam PNG or mock mask).
+
+    Mock masks come back already decoded from the cache; callers must treat
+    the image as read-only (resize/convert/split return new images).
+    """
+    cached = mock_mask_cache.decoded(mask_bytes)
+    if cached is not None:
+        return cached
+    return Image.open(io.BytesIO(mask_bytes))
+
+
+def generate_mock_masks(
+    image_width: int = 640, image_height: int = 480, concerns: list[str] | None = None
+) -> dict[str, bytes]:
     """
     Generate mock mask images for all skin concerns.
 
+    Masks are cached per image size, so repeated bypass-mode requests with
+    the same frame size only pay for the first one.
+
     Args:
         image_width: Width of the original image
         image_height: Height of the original image
+        concerns: Optional subset of concerns (YouCam actions); None = all
 
     Returns:
         Dictionary mapping concern names to PNG mask bytes
     """
-    concerns = [
-        "acne",
-        "wrinkle",
-        "pore",
-        "age_spot",
-        "oiliness",
-        "radiance",
-        "texture",
-        "redness",
-        "firmness",
-        "moisture",
-        "dark_circle_v2",
-        "eye_bag",
-    ]
-
-    masks = {}
-    for concern in concerns:
-        # Create mask with consistent naming pattern
-        mask_name = f"sd_{concern}_output_all.png"
-        masks[mask_name] = create_debug_mask(image_width, image_height, concern)
-
-    return masks
+    return filter_masks(mock_mask_cache.get(image_width, image_height), concerns)
+
+
+# Singleton instance
+mock_mask_cache = MockMaskCache()
@@ -0,0 +1,424 @@
+"""
+Rate-limit-aware OpenAI client.
+
+- Token buckets sized from the configured RPM (requests) and TPM (tokens) limits
+  pace requests before they reach the provider, instead of bursting into 429s.
+  The buckets are per process: callers pass this process' share of the
+  account limits (see AIAnalysisService).
+- 429 / 5xx / transport errors are retried with jittered exponential backoff,
+  honoring the Retry-After header when the provider sends one.
+- Every call has a deadline; waiting for the bucket, backoff and the HTTP call
+  itself all count against it.
+- One shared httpx.AsyncClient keeps connections alive across calls.
+"""
+
+import asyncio
+import email.utils
+import json
+import random
+import threading
+import time
+from collections.abc import AsyncIterator
+
+import httpx
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class OpenAIError(Exception):
+    """OpenAI request failed (after retries)"""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class DeadlineExceeded(OpenAIError):
+    """The request could not complete before its deadline"""
+
+
+class TokenBucket:
+    """
+    Async token bucket.
+
+    Tokens refill continuously at `rate` per second up to `capacity`. A caller
+    reserves its tokens up front (the level goes negative) and sleeps until the
+    refill has paid the debt, so waiters are served in FIFO order and each one
+    knows its wait, and can check its own deadline, without queueing behind
+    another caller's sleep. The level may also go negative after adjust() when a
+    request used more tokens than estimated.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # Never held across an await; also safe if the client is used from several event loops
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, amount: float, deadline: float | None) -> float:
+        """Take `amount` tokens now, returning how long to wait until they are paid for"""
+        with self._lock:
+            self._refill()
+            wait = max(0.0, (amount - self._tokens) / self.rate)
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise DeadlineExceeded("Rate limit wait exceeds request deadline")
+            self._tokens -= amount
+            return wait
+
+    async def acquire(self, amount: float = 1.0, deadline: float | None = None) -> float:
+        """
+        Take `amount` tokens, waiting for the refill if needed.
+
+        Args:
+            amount: Tokens to take (clamped to capacity so huge requests still pass)
+            deadline: Optional time.monotonic() deadline
+
+        Returns:
+            Seconds spent waiting (throttle delay)
+
+        Raises:
+            DeadlineExceeded: if the tokens would only be available after the deadline
+        """
+        amount = min(amount, self.capacity)
+        wait = self._reserve(amount, deadline)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                # Cancelled while waiting: give the reservation back
+                self.adjust(-amount)
+                raise
+        return wait
+
+    def adjust(self, delta: float) -> None:
+        """Charge (positive) or refund (negative) tokens after the fact"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - delta)
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+def parse_retry_after(headers: httpx.Headers) -> float | None:
+    """Seconds to wait from Retry-After / retry-after-ms headers, if present"""
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def estimate_tokens(payload: dict, completion_tokens: int) -> int:
+    """Rough token estimate for TPM pacing (~4 characters per token)"""
+    prompt_chars = sum(len(m.get("content") or "") for m in payload.get("messages", []))
+    return prompt_chars // 4 + payload.get("max_tokens", completion_tokens)
+
+
+class OpenAIClient:
+    """Chat completions client with RPM/TPM pacing, retries and deadlines"""
+
+    def __init__(
+        self,
+        api_key: str | None,
+        base_url: str,
+        rpm: int,
+        tpm: int,
+        max_retries: int = 4,
+        default_deadline_s: float = 60.0,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 20.0,
+        burst_seconds: float = 10.0,
+        expected_completion_tokens: int = 800,
+    ):
+        self.api_key = api_key
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.max_retries = max_retries
+        self.default_deadline_s = default_deadline_s
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.expected_completion_tokens = expected_completion_tokens
+
+        # Buckets hold `burst_seconds` worth of quota so short bursts are not delayed
+        self.request_bucket = TokenBucket(rpm / 60, max(1.0, rpm / 60 * burst_seconds))
+        self.token_bucket = TokenBucket(tpm / 60, max(1.0, tpm / 60 * burst_seconds))
+
+        self._client: httpx.AsyncClient | None = None
+        self._client_loop: asyncio.AbstractEventLoop | None = None
+
+        self._metrics = {
+            "requests": 0,
+            "streamed_requests": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "attempts": 0,
+            "retries": 0,
+            "status_429": 0,
+            "status_5xx": 0,
+            "transport_errors": 0,
+            "deadline_exceeded": 0,
+            "throttled_requests": 0,
+            "throttle_wait_seconds_total": 0.0,
+            "throttle_wait_seconds_max": 0.0,
+            "backoff_wait_seconds_total": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+        }
+
+    def _http_client(self) -> httpx.AsyncClient:
+        # httpx clients are bound to the event loop they were first used on
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After"""
+        jittered = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * 2**attempt))
+        if retry_after is not None:
+            return retry_after + jittered * 0.1
+        return jittered
+
+    async def _throttle(self, estimated_tokens: int, deadline: float) -> None:
+        waited = await self.request_bucket.acquire(1, deadline)
+        waited += await self.token_bucket.acquire(estimated_tokens, deadline)
+        if waited > 0:
+            self._metrics["throttled_requests"] += 1
+            self._metrics["throttle_wait_seconds_total"] += waited
+            self._metrics["throttle_wait_seconds_max"] = max(
+                self._metrics["throttle_wait_seconds_max"], waited
+            )
+
+    def _record_usage(self, result: dict, estimated_tokens: int) -> None:
+        usage = result.get("usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        self._metrics["prompt_tokens"] += prompt_tokens
+        self._metrics["completion_tokens"] += completion_tokens
+        if usage.get("total_tokens"):
+            # Reconcile the TPM bucket with what the request really used
+            self.token_bucket.adjust(usage["total_tokens"] - estimated_tokens)
+
+    async def chat_completion(self, payload: dict, deadline_s: float | None = None) -> dict:
+        """
+        POST /chat/completions with pacing and retries.
+
+        Args:
+            payload: Request body (model, messages, ...)
+            deadline_s: Total time budget in seconds (default: client default)
+
+        Returns:
+            Parsed JSON response
+
+        Raises:
+            DeadlineExceeded: deadline reached before a successful response
+            OpenAIError: non-retryable error or retries exhausted
+        """
+        deadline = time.monotonic() + (deadline_s or self.default_deadline_s)
+        estimated_tokens = estimate_tokens(payload, self.expected_completion_tokens)
+        self._metrics["requests"] += 1
+
+        try:
+            result = await self._send_with_retries(payload, deadline, estimated_tokens)
+        except DeadlineExceeded:
+            self._metrics["deadline_exceeded"] += 1
+            self._metrics["failed"] += 1
+            raise
+        except OpenAIError:
+            self._metrics["failed"] += 1
+            raise
+
+        self._metrics["succeeded"] += 1
+        self._record_usage(result, estimated_tokens)
+        return result
+
+    def _error_from_response(self, response: httpx.Response) -> tuple[OpenAIError, float | None]:
+        """
+        Classify a non-200 response.
+
+        Returns:
+            Tuple of (error, Retry-After seconds) for retryable statuses
+
+        Raises:
+            OpenAIError: for non-retryable statuses
+        """
+        if response.status_code == 429:
+            self._metrics["status_429"] += 1
+        elif response.status_code >= 500:
+            self._metrics["status_5xx"] += 1
+
+        error = OpenAIError(
+            f"OpenAI API error: {response.status_code} - {response.text[:500]}",
+            response.status_code,
+        )
+        if response.status_code not in RETRYABLE_STATUS_CODES:
+            raise error
+        return error, parse_retry_after(response.headers)
+
+    async def _sleep_before_retry(
+        self, attempt: int, retry_after: float | None, deadline: float, error: OpenAIError
+    ) -> None:
+        wait = self._backoff(attempt, retry_after)
+        if time.monotonic() + wait >= deadline:
+            raise DeadlineExceeded(f"Deadline exceeded while retrying: {error}")
+        self._metrics["retries"] += 1
+        self._metrics["backoff_wait_seconds_total"] += wait
+        await asyncio.sleep(wait)
+
+    async def _start_attempt(self, estimated_tokens: int, deadline: float) -> float:
+        """Wait for the rate limiter, then return the time left for the HTTP call"""
+        await self._throttle(estimated_tokens, deadline)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        self._metrics["attempts"] += 1
+        return remaining
+
+    async def _send_with_retries(
+        self, payload: dict, deadline: float, estimated_tokens: int
+    ) -> dict:
+        last_error: OpenAIError | None = None
+
+        for attempt in range(self.max_retries + 1):
+            remaining = await self._start_attempt(estimated_tokens, deadline)
+
+            retry_after = None
+            try:
+                response = await self._http_client().post(self.url, json=payload, timeout=remaining)
+            except httpx.TimeoutException as e:
+                self._metrics["transport_errors"] += 1
+                last_error = OpenAIError(f"OpenAI request timed out: {e}")
+            except httpx.TransportError as e:
+                self._metrics["transport_errors"] += 1
+                last_error = OpenAIError(f"OpenAI transport error: {e}")
+            else:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except json.JSONDecodeError as e:
+                        raise OpenAIError(f"Invalid JSON from OpenAI: {e}", 200) from e
+                last_error, retry_after = self._error_from_response(response)
+
+            if attempt == self.max_retries:
+                break
+            await self._sleep_before_retry(attempt, retry_after, deadline, last_error)
+
+        raise last_error or OpenAIError("OpenAI request failed")
+
+    async def stream_chat_completion(
+        self, payload: dict, deadline_s: float | None = None
+    ) -> AsyncIterator[str]:
+        """
+        Streaming chat completion: yield message content deltas as they arrive.
+
+        Pacing, retries and the deadline work like chat_completion(), except
+        that a stream which already produced content is never retried (the
+        caller has consumed partial output); the error is raised instead.
+
+        Args:
+            payload: Request body (model, messages, ...); "stream" is set here
+            deadline_s: Total time budget in seconds (default: client default)
+
+        Yields:
+            Content text chunks
+        """
+        deadline = time.monotonic() + (deadline_s or self.default_deadline_s)
+        estimated_tokens = estimate_tokens(payload, self.expected_completion_tokens)
+        payload = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+        self._metrics["requests"] += 1
+        self._metrics["streamed_requests"] += 1
+
+        last_error: OpenAIError | None = None
+        try:
+            for attempt in range(self.max_retries + 1):
+                remaining = await self._start_attempt(estimated_tokens, deadline)
+
+                retry_after = None
+                started = False
+                try:
+                    async with self._http_client().stream(
+                        "POST", self.url, json=payload, timeout=remaining
+                    ) as response:
+                        if response.status_code == 200:
+                            async for line in response.aiter_lines():
+                                if time.monotonic() > deadline:
+                                    raise DeadlineExceeded("Deadline exceeded while streaming")
+                                if not line.startswith("data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == "[DONE]":
+                                    break
+                                chunk = json.loads(data)
+                                if chunk.get("usage"):
+                                    self._record_usage(chunk, estimated_tokens)
+                                for choice in chunk.get("choices") or []:
+                                    content = (choice.get("delta") or {}).get("content")
+                                    if content:
+                                        started = True
+                                        yield content
+                            self._metrics["succeeded"] += 1
+                            return
+
+                        await response.aread()
+                        last_error, retry_after = self._error_from_response(response)
+                except (httpx.TimeoutException, httpx.TransportError, json.JSONDecodeError) as e:
+                    self._metrics["transport_errors"] += 1
+                    last_error = OpenAIError(f"OpenAI stream error: {e}")
+                    if started:
+                        raise last_error from e
+
+                if attempt == self.max_retries:
+                    break
+                await self._sleep_before_retry(attempt, retry_after, deadline, last_error)
+
+            raise last_error or OpenAIError("OpenAI request failed")
+        except DeadlineExceeded:
+            self._metrics["deadline_exceeded"] += 1
+            self._metrics["failed"] += 1
+            raise
+        except OpenAIError:
+            self._metrics["failed"] += 1
+            raise
+
+    def metrics(self) -> dict:
+        """Throttling / retry counters for monitoring"""
+        metrics = dict(self._metrics)
+        metrics["request_bucket_available"] = round(self.request_bucket.available, 2)
+        metrics["token_bucket_available"] = round(self.token_bucket.available, 2)
+        return metrics
@@ -0,0 +1,252 @@
+"""
+Sampling profiler for production requests.
+
+ProfilingMiddleware profiles a fraction (PROFILE_SAMPLE_RATE) of
+POST /api/analyze requests, and any request whose PROFILE_HEADER header
+equals PROFILE_TOKEN (required with profiling; the same header guards the
+/api/admin/profiles endpoints). While a request is
+profiled, a background thread snapshots the stacks of all other threads
+every PROFILE_INTERVAL_MS via sys._current_frames(); the profiled code
+itself is not instrumented, so its overhead is the sampler thread only.
+
+Profiles are wall-clock: a thread waiting on I/O or the event loop's
+selector shows up as such. Only one request is profiled at a time, so
+samples of concurrent requests can appear in the same profile.
+
+Output goes to results_dir/profiles/<id>.folded in collapsed-stack format
+(one "thread;frame;frame... count" line per stack), which flamegraph.pl,
+speedscope and inferno read directly, next to a <id>.json with the
+request metadata. Only the newest PROFILE_MAX_FILES profiles are kept.
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from app.config import settings
+
+# Profile ids: <unix time>-<hex>
+_PROFILE_ID = re.compile(r"^\d{10}-[0-9a-f]{8}$")
+
+_CWD = os.getcwd() + os.sep
+
+
+class StackSampler:
+    """Background thread that counts the stacks of all other threads"""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._labels: dict[object, str] = {}  # code object -> frame label
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.stacks[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+            self.samples += 1
+
+    def _collapse(self, thread_name: str, frame) -> str:
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _frame_label(code)
+            labels.append(label)
+            frame = frame.f_back
+        labels.append(thread_name.replace(";", ":"))
+        labels.reverse()
+        return ";".join(labels)
+
+
+def _frame_label(code) -> str:
+    """'function (module path:first line)', paths relative to site-packages or the app"""
+    filename = code.co_filename
+    index = filename.rfind("site-packages/")
+    if index != -1:
+        filename = filename[index + len("site-packages/") :]
+    elif filename.startswith(_CWD):
+        filename = filename[len(_CWD) :]
+    else:
+        filename = os.path.basename(filename)
+    name = getattr(code, "co_qualname", code.co_name)  # co_qualname: Python 3.11+
+    # ';' separates frames in the collapsed format (the count follows the last space)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class RequestProfiler:
+    """Decides which requests to profile and stores the profiles"""
+
+    def __init__(
+        self,
+        root: str,
+        enabled: bool,
+        sample_rate: float,
+        header: str,
+        token: str | None,
+        interval_ms: float,
+        max_files: int,
+    ):
+        self.root = root
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        self._token = token.encode("utf-8") if token else None
+        self.interval_s = interval_ms / 1000
+        self.max_files = max_files
+
+        self._busy = threading.Lock()  # One profile at a time
+
+        # Counters
+        self.profiled = 0
+        self.skipped_busy = 0
+
+    def wants(self, scope: dict) -> bool:
+        """Whether this request should be profiled (debug header or sampled /api/analyze)"""
+        if not self.enabled:
+            return False
+        for name, value in scope.get("headers", ()):
+            if name == self.header:
+                return self.check_token(value)
+        return (
+            self.sample_rate > 0
+            and scope.get("method") == "POST"
+            and scope.get("path") == "/api/analyze"
+            and random.random() < self.sample_rate
+        )
+
+    def check_token(self, value: bytes | None) -> bool:
+        """Whether a header value is the profile token (always False without a token)"""
+        if self._token is None or value is None:
+            return False
+        return hmac.compare_digest(value, self._token)
+
+    def start(self) -> tuple[str, StackSampler] | None:
+        """
+        Start sampling.
+
+        Returns:
+            Tuple of (profile_id, sampler), or None if another request is being profiled
+        """
+        if not self._busy.acquire(blocking=False):
+            self.skipped_busy += 1
+            return None
+        sampler = StackSampler(self.interval_s)
+        try:
+            sampler.start()
+        except BaseException:
+            self._busy.release()
+            raise
+        return f"{int(time.time())}-{uuid.uuid4().hex[:8]}", sampler
+
+    async def finish(self, profile_id: str, sampler: StackSampler, meta: dict) -> bool:
+        """Stop sampling and write the profile. Returns False if it could not be written."""
+        try:
+            stacks = await asyncio.to_thread(sampler.stop)
+        finally:
+            self._busy.release()
+
+        meta = {
+            "id": profile_id,
+            **meta,
+            "samples": sampler.samples,
+            "interval_ms": self.interval_s * 1000,
+            "created_at": time.time(),
+        }
+        try:
+            await asyncio.to_thread(self._write, profile_id, stacks, meta)
+        except OSError as e:
+            print(f"Warning: Failed to write profile {profile_id}: {e}")
+            return False
+        self.profiled += 1
+        return True
+
+    def _write(self, profile_id: str, stacks: Counter[str], meta: dict) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, f"{profile_id}.folded"), "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.root, f"{profile_id}.json"), "w") as f:
+            json.dump(meta, f)
+        self._prune()
+
+    def _prune(self) -> None:
+        profile_ids = self._profile_ids()
+        for profile_id in profile_ids[self.max_files :]:
+            for extension in ("folded", "json"):
+                try:
+                    os.remove(os.path.join(self.root, f"{profile_id}.{extension}"))
+                except FileNotFoundError:
+                    pass
+
+    def _profile_ids(self) -> list[str]:
+        """Stored profile ids, newest first"""
+        if not os.path.isdir(self.root):
+            return []
+        profile_ids = [
+            name.removesuffix(".json")
+            for name in os.listdir(self.root)
+            if name.endswith(".json") and _PROFILE_ID.match(name.removesuffix(".json"))
+        ]
+        return sorted(profile_ids, reverse=True)
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        """Metadata of the newest profiles"""
+        profiles = []
+        for profile_id in self._profile_ids()[:limit]:
+            try:
+                with open(os.path.join(self.root, f"{profile_id}.json")) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def path_for(self, profile_id: str) -> str | None:
+        """Path of a profile's collapsed stacks, or None for an invalid id"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        return os.path.join(self.root, f"{profile_id}.folded")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "interval_ms": self.interval_s * 1000,
+            "profiled": self.profiled,
+            "skipped_busy": self.skipped_busy,
+        }
+
+
+# Singleton instance
+request_profiler = RequestProfiler(
+    root=os.path.join(settings.results_dir, "profiles"),
+    enabled=settings.profiling_enabled,
+    sample_rate=settings.profile_sample_rate,
+    header=settings.profile_header,
+    token=settings.profile_token,
+    interval_ms=settings.profile_interval_ms,
+    max_files=settings.profile_max_files,
+)
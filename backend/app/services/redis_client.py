@@ -0,0 +1,171 @@
+"""
+Minimal Redis client (RESP2 over asyncio streams).
+
+Only what the result store needs: single commands and pipelines over a
+small connection pool, AUTH/SELECT from the URL. Replies are decoded as
+RESP2 types: simple strings -> str, bulk strings -> bytes (None for nil),
+integers -> int, arrays -> list. Server errors raise RedisError.
+"""
+
+import asyncio
+from urllib.parse import unquote, urlparse
+
+# Scripts for EVAL (scripts/resp_server.py runs these without Lua)
+# HSET only if the hash still exists, in one atomic step; -1 = expired or deleted
+HSET_IF_EXISTS_SCRIPT = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('HSET', KEYS[1], unpack(ARGV)) end "
+    "return -1"
+)
+
+
+class RedisError(Exception):
+    """Redis command or connection failed"""
+
+
+def encode_command(*args) -> bytes:
+    """Encode one command as a RESP2 array of bulk strings"""
+    out = bytearray(f"*{len(args)}\r\n".encode())
+    for arg in args:
+        if isinstance(arg, bytes | bytearray | memoryview):
+            data = bytes(arg)
+        elif isinstance(arg, str):
+            data = arg.encode("utf-8")
+        elif isinstance(arg, int | float):
+            data = repr(arg).encode()
+        else:
+            raise TypeError(f"Unsupported Redis argument type: {type(arg).__name__}")
+        out += b"$%d\r\n" % len(data)
+        out += data
+        out += b"\r\n"
+    return bytes(out)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    """
+    Read one RESP2 reply.
+
+    Returns:
+        Decoded reply; server errors are returned as RedisError instances
+        (not raised) so pipelines can read all replies
+    """
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Redis connection closed")
+    kind, payload = line[:1], line[1:-2]
+
+    if kind == b"+":
+        return payload.decode("utf-8")
+    if kind == b"-":
+        return RedisError(payload.decode("utf-8"))
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(payload)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise RedisError(f"Unexpected RESP reply: {line!r}")
+
+
+class RedisClient:
+    """Pooled RESP2 client for redis://[:password@]host[:port][/db] URLs"""
+
+    def __init__(self, url: str, pool_size: int = 8, timeout_s: float = 5.0):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported Redis URL scheme: {parsed.scheme!r}")
+
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.pool_size = pool_size
+        self.timeout_s = timeout_s
+
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _bind_loop(self) -> asyncio.Semaphore:
+        # Streams are bound to the event loop they were opened on
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            for _, writer in self._idle:
+                writer.close()
+            self._idle = []
+            self._slots = asyncio.Semaphore(self.pool_size)
+            self._loop = loop
+        return self._slots
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            if self.username:
+                setup.append(("AUTH", self.username, self.password))
+            else:
+                setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        for reply in await self._roundtrip(reader, writer, setup):
+            if isinstance(reply, RedisError):
+                writer.close()
+                raise reply
+        return reader, writer
+
+    @staticmethod
+    async def _roundtrip(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter, commands: list[tuple]
+    ) -> list:
+        if not commands:
+            return []
+        writer.write(b"".join(encode_command(*command) for command in commands))
+        await writer.drain()
+        return [await read_reply(reader) for _ in commands]
+
+    async def pipeline(self, commands: list[tuple]) -> list:
+        """
+        Send several commands in one round trip.
+
+        Returns:
+            One reply per command; failed commands yield RedisError instances
+        """
+        slots = self._bind_loop()
+        async with slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._connect(), self.timeout_s)
+                replies = await asyncio.wait_for(self._roundtrip(*conn, commands), self.timeout_s)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, TimeoutError) as e:
+                # Connection state is unknown after a failure, never reuse it
+                if conn is not None:
+                    conn[1].close()
+                raise RedisError(f"Redis connection to {self.host}:{self.port} failed: {e}") from e
+            except BaseException:
+                # Cancelled mid-reply or protocol error
+                if conn is not None:
+                    conn[1].close()
+                raise
+            self._idle.append(conn)
+            return replies
+
+    async def execute(self, *args):
+        """Run a single command, raising RedisError on a server error"""
+        (reply,) = await self.pipeline([args])
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    async def aclose(self) -> None:
+        for _, writer in self._idle:
+            writer.close()
+        self._idle = []
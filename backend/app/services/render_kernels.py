@@ -0,0 +1,148 @@
+"""
+Fused uint8 render kernels (RENDER_BACKEND=opencv).
+
+Counterparts of the PIL overlay path that work in place on RGB uint8 arrays:
+threshold, face/exclusion weight and alpha gain become one or two OpenCV
+passes over the uint8 mask, the blend is a uint16 fixed-point pass over the
+pixels the mask actually covers. No float32 mask arrays, RGBA layers,
+putalpha or alpha_composite. Output matches the PIL path within rounding
+(python -m benchmarks.golden --backend opencv).
+"""
+
+import functools
+
+import cv2
+import numpy as np
+
+from app.config import settings
+
+RENDER_BACKENDS = ("pil", "opencv")
+
+# Mask dengan alpha non-zero kurang dari fraksi ini: hanya pixel tersebut yang di-blend
+SPARSE_BLEND_FRACTION = 0.25
+
+# Blend padat dikerjakan per band baris (buffer uint16 tetap kecil)
+BLEND_BAND_ROWS = 256
+
+
+def use_fused_kernels() -> bool:
+    """True jika RENDER_BACKEND memilih kernel OpenCV/NumPy (bukan PIL)"""
+    return settings.render_backend == "opencv"
+
+
+@functools.lru_cache(maxsize=8)
+def _uv_tint_lut(color: tuple[int, int, int], opacity: float) -> np.ndarray:
+    """LUT per channel (1x256x3) dengan rumus float32 yang sama seperti _apply_uv_tint"""
+    levels = np.arange(256, dtype=np.float32)
+    tint_alpha = np.full(256, int(255 * opacity), dtype=np.float32) / 255.0
+    channels = []
+    for i, boost in enumerate((None, 1.05, 1.08)):
+        tint = np.full(256, color[i], dtype=np.float32)
+        value = levels * (1 - tint_alpha * 0.6) + tint * tint_alpha * 0.6
+        if boost is not None:
+            value = np.clip(value * boost, 0, 255)
+        channels.append(value.astype(np.uint8))
+    return np.stack(channels, axis=-1)[None, :, :]
+
+
+def apply_uv_tint(rgb: np.ndarray, config: dict) -> np.ndarray:
+    """
+    UV tint sebagai satu lookup per channel (identik dengan _apply_uv_tint).
+
+    Tint berwarna konstan, jadi setiap channel output hanya fungsi dari nilai
+    channel input yang sama.
+
+    Args:
+        rgb: RGB uint8 array (HxWx3)
+        config: Dict dengan keys 'color' dan 'opacity' (lihat UV_TINT_CONFIG)
+
+    Returns:
+        RGB uint8 array baru dengan UV tint
+    """
+    lut = _uv_tint_lut(tuple(config.get("color", (0, 160, 170))), config.get("opacity", 0.35))
+    return cv2.LUT(rgb, lut)
+
+
+def mask_alpha(
+    mask: np.ndarray,
+    gain: float = 1.0,
+    threshold: int = 0,
+    weight: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Alpha dari mask intensity, di tempat (in place) pada `mask`.
+
+    alpha = min(255, (mask >= threshold ? mask : 0) * gain) * weight / 255
+
+    Args:
+        mask: uint8 mask intensity (HxW, writable)
+        gain: Alpha multiplier (saturating)
+        threshold: Minimum intensity; di bawahnya alpha 0
+        weight: Optional uint8 bobot per pixel (face region, exclusion = 0)
+
+    Returns:
+        `mask`, berisi alpha uint8
+    """
+    if threshold > 0:
+        cv2.threshold(mask, threshold - 1, 255, cv2.THRESH_TOZERO, dst=mask)
+    if weight is not None and gain <= 1.0:
+        # Tanpa saturasi gain bisa digabung ke scale multiply (satu pass)
+        cv2.multiply(mask, weight, dst=mask, scale=gain / 255.0)
+        return mask
+    if gain != 1.0:
+        cv2.convertScaleAbs(mask, dst=mask, alpha=gain)
+    if weight is not None:
+        cv2.multiply(mask, weight, dst=mask, scale=1 / 255.0)
+    return mask
+
+
+def _blend_pixels(dst: np.ndarray, src: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """(dst * (255 - a) + src * a) / 255 dibulatkan, dalam uint16 fixed point"""
+    a = alpha.astype(np.uint16)[..., None]
+    out = dst.astype(np.uint16)
+    out *= 255 - a
+    out += src * a
+    # x / 255 dibulatkan tanpa pembagian: (x + 128 + ((x + 128) >> 8)) >> 8
+    out += 128
+    out += out >> 8
+    out >>= 8
+    return out.astype(np.uint8)
+
+
+def blend(dst: np.ndarray, src: np.ndarray | tuple, alpha: np.ndarray) -> None:
+    """
+    Alpha blend src di atas dst, di tempat (in place).
+
+    Sama dengan alpha_composite sebuah layer di atas gambar opaque. Mask
+    jarang (spots) hanya mengerjakan pixel dengan alpha > 0; mask padat
+    dikerjakan per band baris.
+
+    Args:
+        dst: RGB uint8 array atau view (HxWx3), diubah
+        src: Warna RGB tuple, atau RGB uint8 array seukuran dst
+        alpha: uint8 alpha (HxW)
+    """
+    covered = cv2.countNonZero(alpha)
+    if covered == 0:
+        return
+    per_pixel = isinstance(src, np.ndarray)
+    if not per_pixel:
+        src = np.asarray(src[:3], dtype=np.uint16)
+
+    if covered < alpha.size * SPARSE_BLEND_FRACTION:
+        # findNonZero: (x, y) per pixel, jauh lebih cepat dari np.nonzero
+        points = cv2.findNonZero(alpha).reshape(-1, 2)
+        xs, ys = points[:, 0], points[:, 1]
+        pixels = src[ys, xs].astype(np.uint16) if per_pixel else src
+        dst[ys, xs] = _blend_pixels(dst[ys, xs], pixels, alpha[ys, xs])
+        return
+
+    for top in range(0, alpha.shape[0], BLEND_BAND_ROWS):
+        band = slice(top, top + BLEND_BAND_ROWS)
+        pixels = src[band].astype(np.uint16) if per_pixel else src
+        dst[band] = _blend_pixels(dst[band], pixels, alpha[band])
+
+
+def blend_rgba(dst: np.ndarray, overlay: np.ndarray) -> None:
+    """Blend RGBA overlay (HxWx4 uint8, seukuran dst) di atas dst, in place"""
+    blend(dst, np.ascontiguousarray(overlay[..., :3]), np.ascontiguousarray(overlay[..., 3]))
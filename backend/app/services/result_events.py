@@ -0,0 +1,142 @@
+"""
+In-process event channel per task for incremental result delivery.
+
+Used in deadline mode: analysis texts that are still being generated after
+POST /api/analyze returned are published here (streamed GPT fields and
+finished analyses) and forwarded to clients by
+GET /api/result/{task_id}/stream as Server-Sent Events.
+
+Every channel keeps its events so a subscriber that connects late receives
+the full history first (replay), then live events until the channel closes.
+
+Channels live in the worker process that runs the analysis. A subscriber
+that lands on another worker follows the task in the shared result store
+instead (follow_result_store): the same "analysis" and "complete" events,
+derived from analysis_texts / analysis_texts_pending; "field" events are only
+available from the worker that runs the task.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+
+from app.services.result_store import ResultStore
+
+
+@dataclass
+class _Channel:
+    events: list[dict] = field(default_factory=list)
+    closed: bool = False
+    closed_at: float = 0.0
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def notify(self) -> None:
+        # Swap in a fresh Event so every waiter wakes up exactly once per change
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class ResultEventBus:
+    """Per-task append-only event channels with replay"""
+
+    def __init__(self, max_events: int = 5000, retention_s: float = 300.0):
+        self.max_events = max_events
+        self.retention_s = retention_s
+        self._channels: dict[str, _Channel] = {}
+
+    def _purge(self) -> None:
+        """Drop channels that were closed longer than retention_s ago"""
+        cutoff = time.monotonic() - self.retention_s
+        expired = [
+            task_id
+            for task_id, channel in self._channels.items()
+            if channel.closed and channel.closed_at < cutoff
+        ]
+        for task_id in expired:
+            del self._channels[task_id]
+
+    def open(self, task_id: str) -> None:
+        """Create the channel for a task (no-op if it exists)"""
+        self._purge()
+        self._channels.setdefault(task_id, _Channel())
+
+    def publish(self, task_id: str, event: dict) -> None:
+        """Append an event and wake up subscribers"""
+        channel = self._channels.get(task_id)
+        if channel is None or channel.closed:
+            return
+        if len(channel.events) < self.max_events:
+            channel.events.append(event)
+        channel.notify()
+
+    def close(self, task_id: str) -> None:
+        """Publish the final "complete" event and close the channel"""
+        channel = self._channels.get(task_id)
+        if channel is None or channel.closed:
+            return
+        channel.events.append({"type": "complete"})
+        channel.closed = True
+        channel.closed_at = time.monotonic()
+        channel.notify()
+
+    def subscribe(self, task_id: str) -> AsyncIterator[dict] | None:
+        """
+        Iterate over a task's events (history first, then live).
+
+        Returns:
+            Async iterator that ends after the "complete" event, or None if
+            the task has no channel (unknown task or already purged)
+        """
+        channel = self._channels.get(task_id)
+        if channel is None:
+            return None
+
+        async def iterate() -> AsyncIterator[dict]:
+            position = 0
+            while True:
+                changed = channel.changed
+                while position < len(channel.events):
+                    yield channel.events[position]
+                    position += 1
+                if channel.closed:
+                    return
+                await changed.wait()
+
+        return iterate()
+
+
+async def follow_result_store(
+    task_id: str,
+    store: ResultStore,
+    poll_interval_s: float = 0.5,
+    max_wait_s: float = 300.0,
+) -> AsyncIterator[dict]:
+    """
+    Events of a task whose channel is in another worker, from the result store.
+
+    Emits "analysis" for every GPT text that is no longer pending (first
+    the ones already done, then as they arrive) and "complete" once nothing
+    is pending, the task is unknown, or max_wait_s has passed.
+    """
+    deadline = time.monotonic() + max_wait_s
+    sent: set[str] = set()
+    while True:
+        meta = await store.get_meta(task_id)
+        if meta is None:
+            break
+        texts = meta.get("analysis_texts") or {}
+        pending = set(meta.get("analysis_texts_pending") or ())
+        for concern, analysis in texts.items():
+            if concern in pending or concern in sent or analysis.get("source") != "ai":
+                continue
+            sent.add(concern)
+            yield {"type": "analysis", "concern": concern, "analysis": analysis}
+        if not pending or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(poll_interval_s)
+    yield {"type": "complete"}
+
+
+# Singleton instance
+result_events = ResultEventBus()
@@ -0,0 +1,311 @@
+"""
+Bounded result store for completed analyses.
+
+Results are kept as small JSON-able metadata plus raw image bytes (never
+base64 strings, which are 33% larger); base64 encoding happens only when a
+response is built.
+
+Backends (RESULT_BACKEND):
+- memory: per-process LRU (single worker only)
+- sqlite: metadata in SQLite, image blobs as files under results_dir; shared
+  by all workers on one host
+- redis: metadata and blobs in separate Redis hashes; shared across hosts
+
+Eviction:
+- TTL: entries expire RESULT_STORE_TTL_S seconds after they were stored
+- LRU (memory, sqlite): least recently used entries are dropped while the byte
+  budget (RESULT_STORE_MAX_BYTES) or entry limit (RESULT_STORE_MAX_ENTRIES) is
+  exceeded; Redis relies on its own maxmemory policy instead
+"""
+
+import base64
+import copy
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from app.config import settings
+
+# Result fields holding a single image (raw bytes)
+IMAGE_FIELDS = ("original_image", "composite_image", "overlay_base")
+# Result fields holding name -> image bytes mappings
+IMAGE_MAP_FIELDS = ("concern_overlays", "masks", "overlay_layers")
+
+
+def split_result(result: dict) -> tuple[dict, dict[str, bytes]]:
+    """
+    Separate a result into JSON-able metadata and raw image blobs.
+
+    Blob keys are the field name for single images ("composite_image") and
+    "<field>/<name>" for mappings ("masks/sd_acne_output_all.png").
+    """
+    meta = {}
+    blobs: dict[str, bytes] = {}
+
+    for key, value in result.items():
+        if key in IMAGE_FIELDS and isinstance(value, bytes | bytearray):
+            blobs[key] = bytes(value)
+            meta[key] = True
+        elif key in IMAGE_MAP_FIELDS and isinstance(value, dict):
+            meta[key] = list(value)
+            for name, content in value.items():
+                blobs[f"{key}/{name}"] = content
+        else:
+            # Snapshot: later in-place changes must go through ResultStore.update
+            meta[key] = copy.deepcopy(value)
+
+    return meta, blobs
+
+
+def blob_keys(meta: dict) -> list[str]:
+    """Blob keys referenced by a result's metadata (see split_result)"""
+    keys = [key for key in IMAGE_FIELDS if meta.get(key) is True]
+    for key in IMAGE_MAP_FIELDS:
+        names = meta.get(key)
+        if isinstance(names, list):
+            keys.extend(f"{key}/{name}" for name in names)
+    return keys
+
+
+def join_result(meta: dict, blobs: dict[str, bytes]) -> dict:
+    """Inverse of split_result"""
+    result = dict(meta)
+
+    for key in IMAGE_FIELDS:
+        if meta.get(key) is True:
+            result[key] = blobs.get(key)
+    for key in IMAGE_MAP_FIELDS:
+        names = meta.get(key)
+        if isinstance(names, list):
+            result[key] = {
+                name: blobs[f"{key}/{name}"] for name in names if f"{key}/{name}" in blobs
+            }
+
+    return result
+
+
+def encode_result(result: dict) -> dict:
+    """
+    JSON response body: image bytes as base64 strings.
+
+    Images that were stored as artifacts (result["artifact_urls"]) are left
+    out; clients load them by URL.
+    """
+
+    def b64(content: bytes | None) -> str | None:
+        return base64.b64encode(content).decode("utf-8") if content is not None else None
+
+    urls = result.get("artifact_urls") or {}
+    encoded = dict(result)
+    for key in IMAGE_FIELDS:
+        if key in urls:
+            encoded.pop(key, None)
+        elif isinstance(encoded.get(key), bytes | bytearray):
+            encoded[key] = b64(encoded[key])
+    for key in IMAGE_MAP_FIELDS:
+        if isinstance(encoded.get(key), dict):
+            stored = urls.get(key) or {}
+            encoded[key] = {
+                name: b64(content) for name, content in encoded[key].items() if name not in stored
+            }
+    return encoded
+
+
+@dataclass
+class _Entry:
+    meta: dict
+    blobs: dict[str, bytes]
+    size: int
+    expires_at: float
+
+
+def _meta_size(meta: dict) -> int:
+    return len(json.dumps(meta, default=str))
+
+
+class ResultStore(ABC):
+    """Async result store interface (image fields as raw bytes)"""
+
+    backend = ""
+
+    @abstractmethod
+    async def put(self, task_id: str, result: dict) -> bool:
+        """
+        Store a result, replacing any previous one for the task.
+
+        Returns:
+            False if the result was not stored (e.g. exceeds the byte budget)
+        """
+
+    @abstractmethod
+    async def get(self, task_id: str) -> dict | None:
+        """Full result or None if missing/expired"""
+
+    @abstractmethod
+    async def get_meta(self, task_id: str) -> dict | None:
+        """Result without the image fields (cheap to poll), None if missing/expired"""
+
+    @abstractmethod
+    async def update(self, task_id: str, fields: dict) -> bool:
+        """
+        Merge non-image fields into a stored result (e.g. late AI texts).
+
+        Returns:
+            False if the task is not in the store
+        """
+
+    @abstractmethod
+    async def delete(self, task_id: str) -> None:
+        """Remove a result"""
+
+    @abstractmethod
+    async def stats(self) -> dict:
+        """Backend statistics for the admin endpoint"""
+
+    @abstractmethod
+    async def aclose(self) -> None:
+        """Release connections (called at shutdown)"""
+
+
+class MemoryResultStore(ResultStore):
+    """In-memory result store with byte budget, LRU and TTL eviction"""
+
+    backend = "memory"
+
+    def __init__(self, max_bytes: int, ttl_s: float, max_entries: int):
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.rejected = 0
+        self.evictions_lru = 0
+        self.evictions_ttl = 0
+
+    def _remove(self, task_id: str) -> None:
+        entry = self._entries.pop(task_id, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        expired = [task_id for task_id, e in self._entries.items() if e.expires_at <= now]
+        for task_id in expired:
+            self._remove(task_id)
+            self.evictions_ttl += 1
+
+    def _evict(self) -> None:
+        while self._entries and (
+            self._bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            task_id = next(iter(self._entries))
+            self._remove(task_id)
+            self.evictions_lru += 1
+
+    async def put(self, task_id: str, result: dict) -> bool:
+        meta, blobs = split_result(result)
+        size = _meta_size(meta) + sum(len(b) for b in blobs.values())
+
+        self._remove(task_id)
+        if size > self.max_bytes:
+            self.rejected += 1
+            print(f"Warning: Result {task_id} ({size} bytes) exceeds result store budget")
+            return False
+
+        self._entries[task_id] = _Entry(meta, blobs, size, time.monotonic() + self.ttl_s)
+        self._bytes += size
+        self.puts += 1
+
+        self._expire()
+        self._evict()
+        return True
+
+    async def get(self, task_id: str) -> dict | None:
+        entry = self._entries.get(task_id)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                self._remove(task_id)
+                self.evictions_ttl += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(task_id)
+        self.hits += 1
+        return join_result(entry.meta, entry.blobs)
+
+    async def get_meta(self, task_id: str) -> dict | None:
+        entry = self._entries.get(task_id)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        return copy.deepcopy(entry.meta)
+
+    async def update(self, task_id: str, fields: dict) -> bool:
+        entry = self._entries.get(task_id)
+        if entry is None:
+            return False
+
+        old_meta_size = _meta_size(entry.meta)
+        entry.meta.update(copy.deepcopy(fields))
+        delta = _meta_size(entry.meta) - old_meta_size
+        entry.size += delta
+        self._bytes += delta
+        self._evict()
+        return True
+
+    async def delete(self, task_id: str) -> None:
+        self._remove(task_id)
+
+    async def aclose(self) -> None:
+        pass  # Nothing to release
+
+    async def stats(self) -> dict:
+        self._expire()
+        return {
+            "backend": self.backend,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "puts": self.puts,
+            "rejected": self.rejected,
+            "evictions_lru": self.evictions_lru,
+            "evictions_ttl": self.evictions_ttl,
+        }
+
+
+def create_result_store() -> ResultStore:
+    """Result store for the configured RESULT_BACKEND"""
+    backend = settings.result_backend
+    limits = {
+        "max_bytes": settings.result_store_max_bytes,
+        "ttl_s": settings.result_store_ttl_s,
+        "max_entries": settings.result_store_max_entries,
+    }
+
+    if backend == "memory":
+        return MemoryResultStore(**limits)
+    if backend == "sqlite":
+        from app.services.result_store_sqlite import SQLiteResultStore
+
+        return SQLiteResultStore(os.path.join(settings.results_dir, "result_store"), **limits)
+    if backend == "redis":
+        from app.services.result_store_redis import RedisResultStore
+
+        return RedisResultStore(settings.redis_url, ttl_s=settings.result_store_ttl_s)
+    raise ValueError(f"Unknown RESULT_BACKEND: {settings.result_backend!r}")
+
+
+# Singleton instance
+result_store = create_result_store()
@@ -0,0 +1,156 @@
+"""
+Redis result store backend.
+
+Each result is two hashes with the same TTL:
+
+    result:<task_id>:meta   field -> JSON value (small, updated in place)
+    result:<task_id>:blobs  blob key -> raw image bytes
+
+Keeping metadata separate lets late AI texts be merged with a single HSET
+without rewriting the images; the HSET runs in a script together with the
+existence check, so it never recreates an expired hash without a TTL. Memory is bounded by the Redis server's own
+maxmemory policy; RESULT_STORE_TTL_S still applies.
+"""
+
+import json
+
+from app.services.redis_client import HSET_IF_EXISTS_SCRIPT, RedisClient, RedisError
+from app.services.result_store import ResultStore, join_result, split_result
+
+
+class RedisResultStore(ResultStore):
+    """Result store shared across workers and hosts"""
+
+    backend = "redis"
+
+    def __init__(self, url: str, ttl_s: float, prefix: str = "result:"):
+        self.client = RedisClient(url)
+        self.ttl_s = ttl_s
+        self.prefix = prefix
+
+        # Counters (this process)
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.errors = 0
+
+    def _keys(self, task_id: str) -> tuple[str, str]:
+        return f"{self.prefix}{task_id}:meta", f"{self.prefix}{task_id}:blobs"
+
+    @staticmethod
+    def _check(replies: list) -> list:
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    async def put(self, task_id: str, result: dict) -> bool:
+        meta, blobs = split_result(result)
+        meta_key, blobs_key = self._keys(task_id)
+        ttl_ms = int(self.ttl_s * 1000)
+
+        commands: list[tuple] = [("DEL", meta_key, blobs_key)]
+        if blobs:
+            commands.append(("HSET", blobs_key, *(x for item in blobs.items() for x in item)))
+            commands.append(("PEXPIRE", blobs_key, ttl_ms))
+        # Meta last: its presence marks the result as complete
+        fields = [
+            (key, json.dumps(value, ensure_ascii=False, default=str)) for key, value in meta.items()
+        ]
+        commands.append(("HSET", meta_key, *(x for item in fields for x in item)))
+        commands.append(("PEXPIRE", meta_key, ttl_ms))
+
+        try:
+            self._check(await self.client.pipeline(commands))
+        except RedisError as e:
+            self.errors += 1
+            print(f"Warning: Failed to store result {task_id} in Redis: {e}")
+            return False
+        self.puts += 1
+        return True
+
+    async def get(self, task_id: str) -> dict | None:
+        meta_key, blobs_key = self._keys(task_id)
+        try:
+            meta_reply, blobs_reply = self._check(
+                await self.client.pipeline([("HGETALL", meta_key), ("HGETALL", blobs_key)])
+            )
+        except RedisError as e:
+            self.errors += 1
+            print(f"Warning: Failed to read result {task_id} from Redis: {e}")
+            return None
+
+        if not meta_reply:
+            self.misses += 1
+            return None
+
+        meta = {
+            meta_reply[i].decode("utf-8"): json.loads(meta_reply[i + 1])
+            for i in range(0, len(meta_reply), 2)
+        }
+        blobs = {
+            blobs_reply[i].decode("utf-8"): blobs_reply[i + 1]
+            for i in range(0, len(blobs_reply), 2)
+        }
+        self.hits += 1
+        return join_result(meta, blobs)
+
+    async def get_meta(self, task_id: str) -> dict | None:
+        meta_key, _ = self._keys(task_id)
+        try:
+            meta_reply = await self.client.execute("HGETALL", meta_key)
+        except RedisError as e:
+            self.errors += 1
+            print(f"Warning: Failed to read result {task_id} from Redis: {e}")
+            return None
+        if not meta_reply:
+            return None
+        return {
+            meta_reply[i].decode("utf-8"): json.loads(meta_reply[i + 1])
+            for i in range(0, len(meta_reply), 2)
+        }
+
+    async def update(self, task_id: str, fields: dict) -> bool:
+        if not fields:
+            return True
+        meta_key, _ = self._keys(task_id)
+        values = [
+            (key, json.dumps(value, ensure_ascii=False, default=str))
+            for key, value in fields.items()
+        ]
+        try:
+            # A separate EXISTS + HSET could recreate a key expiring in between, without TTL
+            reply = await self.client.execute(
+                "EVAL", HSET_IF_EXISTS_SCRIPT, 1, meta_key, *(x for item in values for x in item)
+            )
+        except RedisError as e:
+            self.errors += 1
+            print(f"Warning: Failed to update result {task_id} in Redis: {e}")
+            return False
+        return reply != -1
+
+    async def delete(self, task_id: str) -> None:
+        try:
+            await self.client.execute("DEL", *self._keys(task_id))
+        except RedisError as e:
+            self.errors += 1
+            print(f"Warning: Failed to delete result {task_id} from Redis: {e}")
+
+    async def stats(self) -> dict:
+        try:
+            keys = await self.client.execute("DBSIZE")
+        except RedisError:
+            keys = None
+        return {
+            "backend": self.backend,
+            "url": f"redis://{self.client.host}:{self.client.port}/{self.client.db}",
+            "keys": keys,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "puts": self.puts,
+            "errors": self.errors,
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
@@ -0,0 +1,271 @@
+"""
+SQLite result store backend.
+
+Metadata lives in one SQLite database (WAL mode, safe for several worker
+processes), image blobs as individual files next to it:
+
+    <root>/results.sqlite3
+    <root>/blobs/<sha[:2]>/<sha>/<blob sha>   (sha = sha256 of the task_id)
+
+Blob files are written before the row that references them, so a reader
+never sees metadata without its blobs.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from app.services.result_store import ResultStore, blob_keys, join_result, split_result
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    task_id TEXT PRIMARY KEY,
+    meta TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed_at ON results (accessed_at);
+CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at);
+"""
+
+
+def _sha(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+class SQLiteResultStore(ResultStore):
+    """Result store shared by all workers on one host"""
+
+    backend = "sqlite"
+
+    def __init__(self, root: str, max_bytes: int, ttl_s: float, max_entries: int):
+        self.root = root
+        self.db_path = os.path.join(root, "results.sqlite3")
+        self.blob_dir = os.path.join(root, "blobs")
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+
+        # Opened lazily so every (forked) worker gets its own connection
+        self._conn: sqlite3.Connection | None = None
+        self._conn_pid: int | None = None
+        self._lock = threading.Lock()
+
+        # Counters (this process)
+        self.hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.rejected = 0
+        self.evictions_lru = 0
+        self.evictions_ttl = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(self.blob_dir, exist_ok=True)
+            conn = sqlite3.connect(
+                self.db_path, timeout=10.0, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _task_dir(self, task_id: str) -> str:
+        digest = _sha(task_id)
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _blob_path(self, task_id: str, key: str) -> str:
+        return os.path.join(self._task_dir(task_id), _sha(key))
+
+    def _remove_blobs(self, task_ids: list[str]) -> None:
+        for task_id in task_ids:
+            shutil.rmtree(self._task_dir(task_id), ignore_errors=True)
+
+    def _put_sync(self, task_id: str, meta: dict, blobs: dict[str, bytes]) -> bool:
+        meta_json = json.dumps(meta, ensure_ascii=False, default=str)
+        size = len(meta_json) + sum(len(b) for b in blobs.values())
+        if size > self.max_bytes:
+            self.rejected += 1
+            print(f"Warning: Result {task_id} ({size} bytes) exceeds result store budget")
+            return False
+
+        # Blobs first (atomic per file), then the row that makes them visible
+        task_dir = self._task_dir(task_id)
+        os.makedirs(task_dir, exist_ok=True)
+        for key, content in blobs.items():
+            path = self._blob_path(task_id, key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO results (task_id, meta, size, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (task_id, meta_json, size, now + self.ttl_s, now),
+            )
+            self.puts += 1
+            removed = self._evict_locked(now)
+        self._remove_blobs(removed)
+        return True
+
+    def _evict_locked(self, now: float) -> list[str]:
+        """Drop expired rows, then LRU rows over budget. Returns removed task_ids."""
+        conn = self._connection()
+        removed = [
+            row[0]
+            for row in conn.execute("SELECT task_id FROM results WHERE expires_at <= ?", (now,))
+        ]
+        if removed:
+            conn.execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+            self.evictions_ttl += len(removed)
+
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        if total <= self.max_bytes and count <= self.max_entries:
+            return removed
+
+        lru: list[str] = []
+        for task_id, size in conn.execute("SELECT task_id, size FROM results ORDER BY accessed_at"):
+            if total <= self.max_bytes and count <= self.max_entries:
+                break
+            lru.append(task_id)
+            total -= size
+            count -= 1
+        conn.executemany("DELETE FROM results WHERE task_id = ?", [(t,) for t in lru])
+        self.evictions_lru += len(lru)
+        return removed + lru
+
+    def _get_sync(self, task_id: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT meta FROM results WHERE task_id = ? AND expires_at > ?", (task_id, now)
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE results SET accessed_at = ? WHERE task_id = ?", (now, task_id))
+        if row is None:
+            self.misses += 1
+            return None
+
+        meta = json.loads(row[0])
+        blobs = {}
+        try:
+            for key in blob_keys(meta):
+                with open(self._blob_path(task_id, key), "rb") as f:
+                    blobs[key] = f.read()
+        except FileNotFoundError:
+            # Evicted by another worker between the row read and the file read
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return join_result(meta, blobs)
+
+    def _get_meta_sync(self, task_id: str) -> dict | None:
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT meta FROM results WHERE task_id = ? AND expires_at > ?",
+                    (task_id, time.time()),
+                )
+                .fetchone()
+            )
+        return json.loads(row[0]) if row is not None else None
+
+    def _update_sync(self, task_id: str, fields: dict) -> bool:
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE: read-modify-write must not interleave with other workers
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT meta, size FROM results WHERE task_id = ? AND expires_at > ?",
+                    (task_id, time.time()),
+                ).fetchone()
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return False
+                old_json, size = row
+                meta = json.loads(old_json)
+                meta.update(fields)
+                meta_json = json.dumps(meta, ensure_ascii=False, default=str)
+                conn.execute(
+                    "UPDATE results SET meta = ?, size = ? WHERE task_id = ?",
+                    (meta_json, size + len(meta_json) - len(old_json), task_id),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _delete_sync(self, task_id: str) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM results WHERE task_id = ?", (task_id,))
+        self._remove_blobs([task_id])
+
+    def _stats_sync(self) -> dict:
+        with self._lock:
+            removed = self._evict_locked(time.time())
+            count, total = (
+                self._connection()
+                .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results")
+                .fetchone()
+            )
+        self._remove_blobs(removed)
+        return {
+            "backend": self.backend,
+            "path": self.db_path,
+            "entries": count,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "puts": self.puts,
+            "rejected": self.rejected,
+            "evictions_lru": self.evictions_lru,
+            "evictions_ttl": self.evictions_ttl,
+        }
+
+    async def put(self, task_id: str, result: dict) -> bool:
+        # Snapshot synchronously, the caller may keep mutating the result
+        meta, blobs = split_result(result)
+        return await asyncio.to_thread(self._put_sync, task_id, meta, blobs)
+
+    async def get(self, task_id: str) -> dict | None:
+        return await asyncio.to_thread(self._get_sync, task_id)
+
+    async def get_meta(self, task_id: str) -> dict | None:
+        return await asyncio.to_thread(self._get_meta_sync, task_id)
+
+    async def update(self, task_id: str, fields: dict) -> bool:
+        fields = json.loads(json.dumps(fields, default=str))
+        return await asyncio.to_thread(self._update_sync, task_id, fields)
+
+    async def delete(self, task_id: str) -> None:
+        await asyncio.to_thread(self._delete_sync, task_id)
+
+    async def stats(self) -> dict:
+        return await asyncio.to_thread(self._stats_sync)
+
+    async def aclose(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
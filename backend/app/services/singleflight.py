@@ -0,0 +1,75 @@
+"""Single-flight helper: deduplicate identical concurrent async calls"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share the same key.
+
+    The first caller for a key runs the coroutine factory; every caller that
+    arrives while it is still running awaits the same future instead of doing
+    the work again. Once the call finishes the key is released, so later calls
+    run fresh (results are not cached here).
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], detach: bool = False) -> Any:
+        """
+        Run fn() once per key among concurrent callers.
+
+        Args:
+            key: Deduplication key
+            fn: Zero-argument coroutine factory executed by the first caller
+            detach: Run fn() in its own task, so it also survives cancellation
+                    of the first caller (e.g. a client that disconnects)
+
+        Returns:
+            The result of fn() (shared by all concurrent callers)
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield: a cancelled waiter must not cancel the shared call
+            return await asyncio.shield(future)
+
+        if detach:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            self.calls += 1
+            task.add_done_callback(lambda done: self._release(key, done))
+            return await asyncio.shield(task)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.calls += 1
+        try:
+            result = await fn()
+        except BaseException as e:
+            if not future.cancelled():
+                future.set_exception(e)
+                # Mark retrieved so an error without waiters is not logged as unhandled
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def _release(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so an error without waiters is not logged as unhandled
+            task.exception()
+
+    def inflight(self) -> int:
+        """Number of keys currently being computed"""
+        return len(self._inflight)
@@ -0,0 +1,114 @@
+"""
+Startup warmup for the image pipeline.
+
+The first analysis after a deploy used to pay for importing mediapipe/cv2,
+building the MediaPipe graphs and initializing the PIL codecs. Warmup does
+all of that at startup, on a synthetic frame, in a worker thread:
+
+1. imports   - image_processing, landmark_service (mediapipe, cv2), mock_data
+2. models    - LandmarkService (Face Detection + Face Mesh graphs)
+3. inference - detect_landmarks() on a synthetic JPEG frame
+4. render    - composite + landmark-enhanced overlays with mock masks
+               (PIL JPEG/PNG encode/decode, NumPy blending)
+
+GET /api/ready answers 503 until warmup has finished.
+"""
+
+import asyncio
+import io
+import time
+from dataclasses import dataclass, field
+
+WARMUP_FRAME_SIZE = (640, 480)
+
+
+@dataclass
+class WarmupState:
+    """Readiness of this worker"""
+
+    ready: bool = False
+    started_at: float | None = None
+    finished_at: float | None = None
+    steps_ms: dict[str, float] = field(default_factory=dict)
+    error: str | None = None
+
+    def as_dict(self) -> dict:
+        duration_ms = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration_ms = round((self.finished_at - self.started_at) * 1000, 1)
+        return {
+            "ready": self.ready,
+            "duration_ms": duration_ms,
+            "steps_ms": self.steps_ms,
+            "error": self.error,
+        }
+
+
+def synthetic_frame(width: int, height: int) -> bytes:
+    """JPEG of a skin-toned face-like ellipse (no real face, exercises the full path)"""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (width, height), (200, 170, 150))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((width * 0.3, height * 0.15, width * 0.7, height * 0.85), fill=(228, 188, 165))
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def run_warmup(state: WarmupState) -> None:
+    """Run all warmup steps (blocking), recording per-step timings in state"""
+
+    def step(name: str, fn) -> None:
+        started = time.perf_counter()
+        fn()
+        state.steps_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    modules = {}
+
+    def imports() -> None:
+        from app.services import image_processing, landmark_service, mock_data
+
+        modules.update(
+            image_processing=image_processing,
+            landmark_service=landmark_service,
+            mock_data=mock_data,
+        )
+
+    step("imports", imports)
+    step("models", lambda: modules["landmark_service"].get_landmark_service())
+
+    frame = synthetic_frame(*WARMUP_FRAME_SIZE)
+    step(
+        "inference",
+        lambda: modules["landmark_service"].get_landmark_service().detect_landmarks(frame),
+    )
+
+    def render() -> None:
+        mock_data = modules["mock_data"]
+        image_processing = modules["image_processing"]
+        scores = mock_data.generate_mock_scores()
+        masks = mock_data.generate_mock_masks(*WARMUP_FRAME_SIZE)
+        image_processing.create_composite_visualization(frame, masks, scores)
+        image_processing.create_landmark_enhanced_overlays(frame, masks, scores)
+
+    step("render", render)
+
+
+async def warmup(state: WarmupState) -> None:
+    """Warm up in a worker thread and mark the worker ready (started from the lifespan)"""
+    state.started_at = time.perf_counter()
+    try:
+        await asyncio.to_thread(run_warmup, state)
+    except Exception as e:
+        # A failed warmup does not make the worker unusable (landmark fallbacks
+        # still apply), so readiness is granted and the error reported
+        state.error = f"{type(e).__name__}: {e}"
+        print(f"Warning: Warmup failed: {state.error}")
+    state.finished_at = time.perf_counter()
+    state.ready = True
+    print(f"Warmup finished in {state.as_dict()['duration_ms']} ms: {state.steps_ms}")
+
+
+# Singleton instance
+warmup_state = WarmupState()
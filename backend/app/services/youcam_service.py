@@ -1,5 +1,4 @@
 import asyncio
-import base64
 import json
 import os
 import zipfile
@@ -8,6 +7,13 @@ from io import BytesIO
 import httpx
 
 from app.config import settings
+from app.services.artifact_store import artifact_store
+from app.services.codec_executor import codec_executor
+from app.services.concerns import is_selected_mask, selected_concerns
+from app.services.metrics import stage
+from app.services.result_events import result_events
+from app.services.result_store import result_store
+from app.services.singleflight import SingleFlight
 
 
 class YouCamService:
@@ -23,6 +29,14 @@ class YouCamService:
             "Content-Type": "application/json",
         }
 
+        # Concurrent polls of the same task share one poll/download/render
+        self.result_flight = SingleFlight()
+
+        # ANALYSIS_CONCERNS, already validated and normalized by Settings
+        self.default_concerns = (
+            settings.analysis_concerns.split(",") if settings.analysis_concerns else None
+        )
+
     async def upload_file(self, file_content: bytes, file_name: str, content_type: str) -> str:
         """
         Step 1: Upload file to YouCam and get file_id
@@ -68,31 +82,22 @@ class YouCamService:
 
             return file_id
 
-    async def submit_task(self, file_id: str, src_file_url: str | None = None) -> str:
+    async def submit_task(
+        self, file_id: str, src_file_url: str | None = None, concerns: list[str] | None = None
+    ) -> str:
         """
         Step 2: Submit skin analysis task
 
+        Args:
+            concerns: Optional subset of concerns (YouCam actions); None = all 14
+                      available actions (see concerns.CONCERNS)
+
         Returns:
             task_id for polling results
         """
-        # All 14 available actions from YouCam API v2.0 documentation
+        # All 14 available actions from YouCam API v2.0 documentation, or the subset
         # Mapped to Indonesian UI: Laporan Permukaan + Laporan Mendalam
-        dst_actions = [
-            "acne",  # Jerawat
-            "dark_circle_v2",  # Lingkaran Hitam
-            "droopy_upper_eyelid",
-            "firmness",  # Serat Kolagen
-            "oiliness",  # Sebum
-            "radiance",  # Warna Kulit
-            "age_spot",  # Flek, Titik UV, Pigmen
-            "wrinkle",  # Keriput
-            "redness",  # Sensitivitas PL
-            "texture",  # Tekstur
-            "moisture",  # Kelembaban
-            "eye_bag",  # Kantung Mata
-            "droopy_lower_eyelid",
-            "pore",  # Pori-Pori, Komedo
-        ]
+        dst_actions = [concern.action for concern in selected_concerns(concerns)]
 
         payload = {
             "src_file_id": file_id,
@@ -158,11 +163,15 @@ class YouCamService:
             raise Exception(f"Task polling timeout after {max_attempts * interval} seconds")
 
     async def download_and_extract_zip(
-        self, zip_url: str, task_id: str
+        self, zip_url: str, task_id: str, concerns: list[str] | None = None
     ) -> tuple[dict, dict[str, bytes]]:
         """
         Step 4: Download and extract ZIP file
 
+        Args:
+            concerns: Optional subset of concerns (YouCam actions); masks of
+                      other concerns are not decompressed
+
         Returns:
             Tuple of (score_info dict, masks dict)
         """
@@ -182,10 +191,12 @@ class YouCamService:
                     with zf.open(score_file) as f:
                         scores = json.load(f)
 
-                # Extract all PNG masks
+                # Extract all PNG masks (of the selected concerns)
                 for name in zf.namelist():
                     if name.endswith(".png") and "skinanalysisResult/" in name:
                         mask_name = os.path.basename(name)
+                        if not is_selected_mask(mask_name, concerns):
+                            continue
                         with zf.open(name) as f:
                             masks[mask_name] = f.read()
 
@@ -194,107 +205,351 @@ class YouCamService:
 
             return scores, masks
 
-    async def analyze_image(self, image_content: bytes, file_name: str, content_type: str) -> dict:
+    async def get_task_result(self, task_id: str) -> dict:
+        """
+        Result of a task for GET /api/result/{task_id}, polling YouCam if needed.
+
+        Concurrent calls for the same task_id (several tabs, aggressive
+        polling loops) share one poll/download/render; it runs detached, so a
+        client disconnecting does not abort the work of the others. The
+        completed result is published to the result store.
+
+        Returns:
+            Completed result (image fields as raw bytes), or a status dict
+            {"task_id", "status": "processing"} / {"task_id", "status": "failed",
+            "error", "error_message"}
+        """
+        return await self.result_flight.do(
+            task_id, lambda: self._fetch_task_result(task_id), detach=True
+        )
+
+    async def _fetch_task_result(self, task_id: str) -> dict:
+        # Check if we've already completed this task (also covers a flight that just finished)
+        stored = await result_store.get(task_id)
+        if stored is not None and stored.get("status") == "completed":
+            return stored
+
+        # Poll the task
+        with stage("poll"):
+            task_result = await self.poll_task(task_id, max_attempts=1, interval=0)
+
+        task_status = task_result.get("task_status")
+
+        if task_status == "success":  # YouCam v2 API returns 'success' not 'completed'
+            # Download and extract results
+            zip_url = task_result["results"]["url"]
+            with stage("download"):
+                scores, masks = await self.download_and_extract_zip(zip_url, task_id)
+
+            # Generate composite visualization
+            from app.services.image_processing import create_composite_visualization
+
+            composite_bytes = None
+
+            # Try to generate composite if we have original image stored
+            original_bytes = stored.get("original_image") if stored is not None else None
+            if original_bytes:
+                try:
+                    with stage("composite"):
+                        composite_bytes = create_composite_visualization(
+                            original_bytes, masks, scores
+                        )
+                except Exception as e:
+                    print(f"Warning: Failed to create composite: {e}")
+                    # Fallback to original image
+                    composite_bytes = original_bytes
+
+            result = {
+                "task_id": task_id,
+                "status": "completed",
+                "scores": scores,
+                "composite_image": composite_bytes,
+                "masks": masks,
+                "original_image": None,  # Don't send back to frontend (too large)
+            }
+
+            # Store the result (and its image artifacts)
+            await self.store_result(result)
+            return result
+
+        if task_status == "error":  # YouCam v2 API returns 'error' not 'failed'
+            return {
+                "task_id": task_id,
+                "status": "failed",
+                "error": task_result.get("error", "Unknown error"),
+                "error_message": task_result.get("error_message", "No error message"),
+            }
+
+        # Still processing
+        return {"task_id": task_id, "status": "processing"}
+
+    async def _generate_analysis_texts(
+        self,
+        task_id: str,
+        scores: dict,
+        ai_mode: str | None,
+        ai_budget_ms: int | None,
+        ai_stream: bool | None,
+        stored: asyncio.Event,
+        concerns: list[str] | None = None,
+    ) -> tuple[dict, list[str]]:
+        """
+        Step 6: Generate analysis texts, blocking on GPT or within a latency budget.
+
+        With a budget (per request or AI_TEXT_BUDGET_MS), template texts are
+        returned right away and GPT texts that miss the deadline are written
+        to the task's entry in the result store later, so the result served by
+        GET /api/result/{task_id} picks them up. Late texts are also published
+        on the task's event channel (GET /api/result/{task_id}/stream); with
+        streaming enabled every GPT field is published as soon as it is complete.
+
+        Args:
+            stored: Set once the task's result is in the result store; late
+                    texts wait for it so their update cannot be lost
+            concerns: Optional subset of concerns (YouCam actions); None = all
+
+        Returns:
+            Tuple of (analysis_texts, concern keys still pending)
+        """
+        from app.services.ai_analysis_service import ai_analysis_service
+
+        budget_ms = ai_budget_ms if ai_budget_ms is not None else settings.ai_text_budget_ms
+        if budget_ms is None:
+            return (
+                await ai_analysis_service.generate_all_analyses(
+                    scores, mode=ai_mode, concerns=concerns
+                ),
+                [],
+            )
+
+        stream = ai_stream if ai_stream is not None else settings.openai_stream
+        analysis_texts: dict = {}
+        pending: list[str] = []
+        result_events.open(task_id)
+
+        def on_field(concern_key: str, field: str, value: object) -> None:
+            result_events.publish(
+                task_id, {"type": "field", "concern": concern_key, "field": field, "value": value}
+            )
+
+        async def on_late_result(concern_key: str, analysis: dict | None) -> None:
+            if analysis is not None:
+                analysis_texts[concern_key] = analysis
+                result_events.publish(
+                    task_id, {"type": "analysis", "concern": concern_key, "analysis": analysis}
+                )
+            if concern_key in pending:
+                pending.remove(concern_key)
+            await stored.wait()
+            await result_store.update(
+                task_id, {"analysis_texts": analysis_texts, "analysis_texts_pending": pending}
+            )
+            if not pending:
+                result_events.close(task_id)
+
+        texts, pending_keys = await ai_analysis_service.generate_analyses_within_budget(
+            scores,
+            budget_ms / 1000,
+            mode=ai_mode,
+            on_late_result=on_late_result,
+            on_field=on_field if stream else None,
+            concerns=concerns,
+        )
+        analysis_texts.update(texts)
+        pending.extend(pending_keys)
+        if not pending:
+            result_events.close(task_id)
+
+        return analysis_texts, pending
+
+    async def store_result(self, result: dict, stored: asyncio.Event | None = None) -> None:
+        """
+        Step 7: Persist image artifacts and put the result in the result store.
+
+        Adds "artifact_urls" to the result. `stored` is set afterwards to
+        release late AI text updates (see _generate_analysis_texts).
+        """
+        try:
+            if settings.artifacts_enabled:
+                try:
+                    with stage("artifacts"):
+                        result["artifact_urls"] = await artifact_store.write_result(result)
+                except OSError as e:
+                    print(f"Warning: Failed to write image artifacts: {e}")
+            with stage("store"):
+                await result_store.put(result["task_id"], result)
+        finally:
+            if stored is not None:
+                stored.set()
+
+    async def analyze_image(
+        self,
+        image_content: bytes,
+        file_name: str,
+        content_type: str,
+        ai_mode: str | None = None,
+        ai_budget_ms: int | None = None,
+        ai_stream: bool | None = None,
+        overlay_mode: str | None = None,
+        concerns: list[str] | None = None,
+    ) -> dict:
         """
         Complete pipeline: upload -> submit -> poll -> extract -> generate composite
 
+        Args:
+            image_content: Original uploaded image bytes
+            file_name: Original file name
+            content_type: MIME type of the upload
+            ai_mode: Optional GPT call mode ("fanout" or "batched") for this request
+            ai_budget_ms: Optional GPT latency budget (deadline mode) for this request
+            ai_stream: Optional override of OPENAI_STREAM (deadline mode only)
+            overlay_mode: Optional concern overlay delivery ("images" or "layers")
+            concerns: Optional subset of concerns (YouCam actions, from
+                      concerns.resolve_concerns); default ANALYSIS_CONCERNS, else all.
+                      Only these are requested from YouCam, rendered and analyzed by GPT
+
         Returns:
-            Dict with scores, composite_image, masks (base64), and task_id
+            Dict with scores, composite_image, masks (raw bytes), and task_id.
+            The result is already in the result store; image fields are
+            base64-encoded by the route when the response is built.
         """
+        overlay_mode = overlay_mode or settings.overlay_mode
+        if concerns is None:
+            concerns = self.default_concerns
+
         # BYPASS MODE: Use mock data for development without consuming YouCam tokens
         if settings.bypass_youcam:
             print("[BYPASS MODE] Using mock data - no YouCam tokens consumed")
-            return await self._analyze_with_mock_data(image_content)
+            return await self._analyze_with_mock_data(
+                image_content,
+                ai_mode=ai_mode,
+                ai_budget_ms=ai_budget_ms,
+                ai_stream=ai_stream,
+                overlay_mode=overlay_mode,
+                concerns=concerns,
+            )
 
         # PRODUCTION MODE: Real YouCam API pipeline
         # Step 1: Upload file
-        file_id = await self.upload_file(image_content, file_name, content_type)
+        with stage("upload"):
+            file_id = await self.upload_file(image_content, file_name, content_type)
 
         # Step 2: Submit analysis task
-        task_id = await self.submit_task(file_id)
+        with stage("submit"):
+            task_id = await self.submit_task(file_id, concerns=concerns)
 
         # Step 3: Poll for completion
-        task_result = await self.poll_task(task_id)
+        with stage("poll"):
+            task_result = await self.poll_task(task_id)
 
         # Step 4: Download and extract results
         zip_url = task_result["results"]["url"]
-        scores, masks = await self.download_and_extract_zip(zip_url, task_id)
+        with stage("download"):
+            scores, masks = await self.download_and_extract_zip(zip_url, task_id, concerns)
 
-        # Step 5: Generate composite visualization
+        # Step 5: Generate composite visualization (codec executor, parallel to overlays)
         from app.services.image_processing import (
             create_all_concern_overlays,
-            create_composite_visualization,
+            create_landmark_enhanced_layers,
             create_landmark_enhanced_overlays,
         )
 
-        try:
-            composite_bytes = create_composite_visualization(image_content, masks, scores)
-            composite_b64 = base64.b64encode(composite_bytes).decode("utf-8")
-        except Exception as e:
-            print(f"Warning: Failed to create composite: {e}")
-            # Fallback to original image if composite fails
-            composite_b64 = base64.b64encode(image_content).decode("utf-8")
+        composite_future = codec_executor.submit(
+            self._render_composite, image_content, masks, scores, concerns
+        )
 
         # Step 5b: Generate per-concern overlay images with landmark enhancement
         # Now includes severity-based coloring using scores
-        concern_overlays_b64 = {}
+        # overlay_mode "layers": UV-tinted base sekali + layer kecil per concern
+        concern_overlays = {}
+        overlay_layers = {}
         landmark_statuses = {}
         try:
             # Gunakan landmark-enhanced overlays (MediaPipe + YouCam mask + severity colors)
-            concern_overlays, landmark_statuses = create_landmark_enhanced_overlays(
-                image_content, masks, scores
-            )
-            concern_overlays_b64 = {
-                name: base64.b64encode(content).decode("utf-8")
-                for name, content in concern_overlays.items()
-            }
+            with stage("overlays"):
+                if overlay_mode == "layers":
+                    overlay_layers, landmark_statuses = create_landmark_enhanced_layers(
+                        image_content, masks, scores, concerns
+                    )
+                else:
+                    concern_overlays, landmark_statuses = create_landmark_enhanced_overlays(
+                        image_content, masks, scores, concerns
+                    )
         except Exception as e:
             print(f"Warning: Failed to create landmark-enhanced overlays: {e}")
             # Fallback ke overlay biasa tanpa landmark
             try:
-                concern_overlays = create_all_concern_overlays(image_content, masks)
-                concern_overlays_b64 = {
-                    name: base64.b64encode(content).decode("utf-8")
-                    for name, content in concern_overlays.items()
-                }
+                concern_overlays = create_all_concern_overlays(image_content, masks, concerns)
                 landmark_statuses = {
                     "_global": {"landmark_status": "failed", "fallback_used": True}
                 }
             except Exception as e2:
                 print(f"Warning: Fallback overlay creation also failed: {e2}")
 
-        # Convert masks to base64 for JSON response
-        masks_b64 = {
-            name: base64.b64encode(content).decode("utf-8") for name, content in masks.items()
-        }
-
-        # Convert original image to base64
-        original_b64 = base64.b64encode(image_content).decode("utf-8")
+        composite_bytes = composite_future.result()
 
         # Step 6: Generate AI-powered analysis texts (no fallback for development)
-        from app.services.ai_analysis_service import ai_analysis_service
-
-        analysis_texts = {}
+        stored = asyncio.Event()
         try:
-            analysis_texts = await ai_analysis_service.generate_all_analyses(scores)
+            with stage("ai_texts"):
+                analysis_texts, analysis_texts_pending = await self._generate_analysis_texts(
+                    task_id, scores, ai_mode, ai_budget_ms, ai_stream, stored, concerns
+                )
         except Exception as e:
             # No fallback - let error propagate for debugging
             print(f"ERROR: Failed to generate AI analysis texts: {e}")
             raise e
 
-        return {
+        result = {
             "task_id": task_id,
             "status": "completed",
             "scores": scores,
-            "composite_image": composite_b64,  # Composite visualization
-            "concern_overlays": concern_overlays_b64,  # Per-concern overlay images (landmark-enhanced)
-            "masks": masks_b64,
-            "original_image": original_b64,
+            "concerns": concerns,  # Requested subset (None = all concerns)
+            "composite_image": composite_bytes,  # Composite visualization
+            "concern_overlays": concern_overlays,  # Per-concern overlay images (landmark-enhanced)
+            **overlay_layers,  # overlay_base/overlay_layers/overlay_layer_info (layers mode)
+            "masks": masks,
+            "original_image": image_content,
             "analysis_texts": analysis_texts,  # Dynamic Indonesian analysis texts
+            "analysis_texts_pending": analysis_texts_pending,  # Concerns still waiting on GPT
             "landmark_statuses": landmark_statuses,  # Status deteksi landmark per concern
         }
+        await self.store_result(result, stored)
+        return result
+
+    def _render_composite(
+        self,
+        image_content: bytes,
+        masks: dict[str, bytes],
+        scores: dict,
+        concerns: list[str] | None,
+        log_prefix: str = "",
+    ) -> bytes:
+        """
+        Composite visualization untuk analyze pipeline, original image jika gagal.
+
+        Dijalankan lewat codec_executor.submit sehingga composite dirender
+        bersamaan dengan overlay per concern.
+        """
+        from app.services.image_processing import create_composite_visualization
 
-    async def _analyze_with_mock_data(self, image_content: bytes) -> dict:
+        try:
+            with stage("composite"):
+                return create_composite_visualization(image_content, masks, scores, concerns)
+        except Exception as e:
+            print(f"{log_prefix}Warning: Failed to create composite: {e}")
+            # Fallback to original image if composite fails
+            return image_content
+
+    async def _analyze_with_mock_data(
+        self,
+        image_content: bytes,
+        ai_mode: str | None = None,
+        ai_budget_ms: int | None = None,
+        ai_stream: bool | None = None,
+        overlay_mode: str = "images",
+        concerns: list[str] | None = None,
+    ) -> dict:
         """
         Bypass mode: Generate results using mock data instead of YouCam API.
 
@@ -304,6 +559,11 @@ class YouCamService:
 
         Args:
             image_content: Original uploaded image bytes
+            ai_mode: Optional GPT call mode ("fanout" or "batched") for this request
+            ai_budget_ms: Optional GPT latency budget (deadline mode) for this request
+            ai_stream: Optional override of OPENAI_STREAM (deadline mode only)
+            overlay_mode: Concern overlay delivery ("images" or "layers")
+            concerns: Optional subset of concerns (YouCam actions); None = all
 
         Returns:
             Same response structure as analyze_image (real mode)
@@ -313,7 +573,7 @@ class YouCamService:
 
         from app.services.image_processing import (
             create_all_concern_overlays,
-            create_composite_visualization,
+            create_landmark_enhanced_layers,
             create_landmark_enhanced_overlays,
         )
         from app.services.mock_data import generate_mock_masks, generate_mock_scores
@@ -324,7 +584,7 @@ class YouCamService:
 
         # Step 1-4: SKIPPED (no API calls to YouCam)
         # Generate mock scores and masks instead
-        scores = generate_mock_scores()
+        scores = generate_mock_scores(concerns)
 
         # Get image dimensions for mask generation
         import io
@@ -332,33 +592,34 @@ class YouCamService:
         from PIL import Image
 
         img = Image.open(io.BytesIO(image_content))
-        masks = generate_mock_masks(img.width, img.height)
+        with stage("mock_masks"):
+            masks = generate_mock_masks(img.width, img.height, concerns)
 
         print(f"[BYPASS MODE] Generated {len(masks)} mock masks")
 
         # Step 5: Generate composite visualization (same as real mode)
-        try:
-            composite_bytes = create_composite_visualization(image_content, masks, scores)
-            composite_b64 = base64.b64encode(composite_bytes).decode("utf-8")
-        except Exception as e:
-            print(f"[BYPASS MODE] Warning: Failed to create composite: {e}")
-            composite_b64 = base64.b64encode(image_content).decode("utf-8")
+        composite_future = codec_executor.submit(
+            self._render_composite, image_content, masks, scores, concerns, "[BYPASS MODE] "
+        )
 
         # Step 5b: Generate per-concern overlays with MediaPipe landmark enhancement
         # Now includes severity-based coloring using scores
-        concern_overlays_b64 = {}
+        concern_overlays = {}
+        overlay_layers = {}
         landmark_statuses = {}
         try:
             print("[BYPASS MODE] Attempting MediaPipe landmark detection with severity colors...")
-            concern_overlays, landmark_statuses = create_landmark_enhanced_overlays(
-                image_content, masks, scores
-            )
-            concern_overlays_b64 = {
-                name: base64.b64encode(content).decode("utf-8")
-                for name, content in concern_overlays.items()
-            }
+            with stage("overlays"):
+                if overlay_mode == "layers":
+                    overlay_layers, landmark_statuses = create_landmark_enhanced_layers(
+                        image_content, masks, scores, concerns
+                    )
+                else:
+                    concern_overlays, landmark_statuses = create_landmark_enhanced_overlays(
+                        image_content, masks, scores, concerns
+                    )
             print(
-                f"[BYPASS MODE] MediaPipe SUCCESS - Generated {len(concern_overlays)} landmark-enhanced overlays"
+                f"[BYPASS MODE] MediaPipe SUCCESS - Generated {len(landmark_statuses)} landmark-enhanced overlays"
             )
         except Exception as e:
             print(f"[BYPASS MODE] MediaPipe FAILED: {e}")
@@ -369,32 +630,23 @@ class YouCamService:
 
             # Fallback to simple overlays
             try:
-                concern_overlays = create_all_concern_overlays(image_content, masks)
-                concern_overlays_b64 = {
-                    name: base64.b64encode(content).decode("utf-8")
-                    for name, content in concern_overlays.items()
-                }
+                concern_overlays = create_all_concern_overlays(image_content, masks, concerns)
                 landmark_statuses = {
                     "_global": {"landmark_status": "failed", "fallback_used": True}
                 }
             except Exception as e2:
                 print(f"[BYPASS MODE] Fallback overlay creation also failed: {e2}")
 
-        # Convert masks to base64
-        masks_b64 = {
-            name: base64.b64encode(content).decode("utf-8") for name, content in masks.items()
-        }
-
-        # Convert original image to base64
-        original_b64 = base64.b64encode(image_content).decode("utf-8")
+        composite_bytes = composite_future.result()
 
         # Step 6: Generate AI-powered analysis (same as real mode, uses mock scores)
-        from app.services.ai_analysis_service import ai_analysis_service
-
-        analysis_texts = {}
+        stored = asyncio.Event()
         try:
             print("[BYPASS MODE] Attempting GPT-4o-mini AI analysis...")
-            analysis_texts = await ai_analysis_service.generate_all_analyses(scores)
+            with stage("ai_texts"):
+                analysis_texts, analysis_texts_pending = await self._generate_analysis_texts(
+                    task_id, scores, ai_mode, ai_budget_ms, ai_stream, stored, concerns
+                )
             print(f"[BYPASS MODE] GPT-4o-mini SUCCESS - Generated {len(analysis_texts)} analyses")
         except Exception as e:
             print(f"[BYPASS MODE] GPT-4o-mini FAILED: {e}")
@@ -405,17 +657,22 @@ class YouCamService:
             # Re-raise for transparency (development mode expects errors to be visible)
             raise e
 
-        return {
+        result = {
             "task_id": task_id,
             "status": "completed",
             "scores": scores,
-            "composite_image": composite_b64,
-            "concern_overlays": concern_overlays_b64,
-            "masks": masks_b64,
-            "original_image": original_b64,
+            "concerns": concerns,
+            "composite_image": composite_bytes,
+            "concern_overlays": concern_overlays,
+            **overlay_layers,
+            "masks": masks,
+            "original_image": image_content,
             "analysis_texts": analysis_texts,
+            "analysis_texts_pending": analysis_texts_pending,
             "landmark_statuses": landmark_statuses,
         }
+        await self.store_result(result, stored)
+        return result
 
 
 # Singleton instance
@@ -0,0 +1,76 @@
+"""Synthetic inputs for the benchmarks (offline, deterministic, no real faces)"""
+
+from contextlib import contextmanager
+from unittest import mock
+
+import numpy as np
+
+from app.services.landmark_service import (
+    FaceBoundingBox,
+    LandmarkResult,
+    LandmarkStatus,
+    get_landmark_service,
+)
+from app.services.mock_data import generate_mock_masks, generate_mock_scores
+from app.services.warmup import synthetic_frame
+
+# Frame sizes (width, height)
+SIZES = {
+    "vga": (640, 480),
+    "1080p": (1920, 1080),
+    "12mp": (4000, 3000),
+}
+
+# Face Mesh with refine_landmarks=True returns 478 points
+LANDMARK_COUNT = 478
+
+
+def synthetic_landmarks(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """(478, 3) pixel landmarks spread over the face ellipse of synthetic_frame()"""
+    rng = np.random.default_rng(seed)
+    angle = rng.uniform(0, 2 * np.pi, LANDMARK_COUNT)
+    radius = np.sqrt(rng.uniform(0, 1, LANDMARK_COUNT))
+    x = width * (0.5 + 0.2 * radius * np.cos(angle))
+    y = height * (0.5 + 0.35 * radius * np.sin(angle))
+    return np.stack([x, y, np.zeros(LANDMARK_COUNT)], axis=1)
+
+
+def synthetic_face_bbox(width: int, height: int) -> FaceBoundingBox:
+    """Bounding box matching the synthetic landmarks (with detection margin)"""
+    return FaceBoundingBox(
+        x=int(width * 0.25),
+        y=int(height * 0.1),
+        width=int(width * 0.5),
+        height=int(height * 0.8),
+        confidence=0.9,
+    )
+
+
+def synthetic_landmark_result(width: int, height: int) -> LandmarkResult:
+    """Successful detection result for the synthetic frame"""
+    return LandmarkResult(
+        status=LandmarkStatus.SUCCESS,
+        landmarks=synthetic_landmarks(width, height),
+        confidence=0.85,
+        face_bbox=synthetic_face_bbox(width, height),
+    )
+
+
+class Frame:
+    """All inputs for one frame size, built once per size"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.width, self.height = SIZES[name]
+        self.image_bytes = synthetic_frame(self.width, self.height)
+        self.masks = generate_mock_masks(self.width, self.height)
+        self.scores = generate_mock_scores()
+        self.landmark_result = synthetic_landmark_result(self.width, self.height)
+
+
+@contextmanager
+def synthetic_detection(frame: Frame):
+    """Make LandmarkService.detect_landmarks return the frame's synthetic landmarks"""
+    service = get_landmark_service()
+    with mock.patch.object(service, "detect_landmarks", return_value=frame.landmark_result):
+        yield service
@@ -0,0 +1,364 @@
+"""
+Golden-image equivalence check for the render path.
+
+Renders fixed synthetic inputs (a textured face-like frame, per-concern
+masks and landmarks, all seeded) through:
+
+    uv_tint                              LandmarkService.prepare_render_base (UV tint)
+    composite                            image_processing.create_composite_visualization
+    overlay/<concern>                    image_processing.create_concern_overlay
+    zone/<concern>/<style>/s<level>      LandmarkService.create_zone_visualization for
+                                         every concern x style (dots, heatmap, boundary,
+                                         polygon = boundary without a mask) x severity
+                                         level, style forced per case
+    layers/<concern>/<style>/s<level>    the same zones as overlay_mode=layers delivers
+                                         them (encode_layer PNG over the UV-tinted base),
+                                         composited like the frontend does and checked
+                                         against the zone/... golden
+
+and compares each output with the stored golden PNG in benchmarks/goldens/:
+a case fails if more than --max-diff-fraction of its pixels differ by more
+than --max-diff (any channel), or if its PSNR is below --min-psnr. Runs
+offline (MediaPipe detection is replaced by the fixed landmarks).
+
+Re-record the goldens (--update) only for intended visual changes;
+performance work on the renderers must pass against the existing ones.
+The goldens are recorded with the PIL render backend; --backend opencv
+checks the fused kernels against the same images (rounding differences
+only, within the default tolerances).
+
+Usage (from backend/):
+    python -m benchmarks.golden
+    python -m benchmarks.golden --backend opencv
+    python -m benchmarks.golden --cases 'zone/acne/*' --diff-dir /tmp/golden-diff
+    python -m benchmarks.golden --update
+"""
+
+import os
+
+os.environ.setdefault("YOUCAM_API_KEY", "golden")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+import argparse  # noqa: E402
+import fnmatch  # noqa: E402
+import io  # noqa: E402
+import json  # noqa: E402
+import math  # noqa: E402
+import sys  # noqa: E402
+from collections.abc import Callable  # noqa: E402
+from unittest import mock  # noqa: E402
+
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services import image_processing, landmark_service, render_kernels  # noqa: E402
+from benchmarks.fixtures import synthetic_landmark_result  # noqa: E402
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "goldens")
+
+# Small frame: goldens stay small, every code path is still exercised
+FRAME_SIZE = (240, 180)
+
+# "polygon": boundary style without a mask (landmark zone polygons)
+STYLES = ("dots", "heatmap", "boundary", "polygon")
+
+# Mask names as in the YouCam ZIP (sd_<concern>_output_all.png)
+MASK_CONCERNS = (
+    "acne",
+    "wrinkle",
+    "pore",
+    "age_spot",
+    "oiliness",
+    "radiance",
+    "texture",
+    "redness",
+    "firmness",
+    "moisture",
+    "dark_circle_v2",
+    "eye_bag",
+)
+
+
+def golden_frame(width: int, height: int) -> bytes:
+    """PNG of a shaded face-like ellipse with a smooth skin texture"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    background = np.stack(
+        [150 + 60 * x / width, 130 + 40 * y / height, np.full_like(x, 120)], axis=-1
+    )
+    inside = ((x - width / 2) / (width * 0.22)) ** 2 + ((y - height / 2) / (height * 0.4)) ** 2 < 1
+    skin = np.array([228, 188, 165], dtype=np.float32) - 25 * (y / height)[..., None]
+    pixels = np.where(inside[..., None], skin, background)
+    pixels += (3 * np.sin(x / 3.0) * np.cos(y / 4.0))[..., None]
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def golden_masks(width: int, height: int) -> dict[str, bytes]:
+    """RGBA PNG masks with seeded blobs (and lines for the linear concerns)"""
+    masks = {}
+    for index, concern in enumerate(MASK_CONCERNS):
+        rng = np.random.default_rng(100 + index)
+        mask = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(mask)
+        for _ in range(25):
+            cx = int(rng.integers(width * 0.25, width * 0.75))
+            cy = int(rng.integers(height * 0.1, height * 0.9))
+            radius = int(rng.integers(2, 8))
+            alpha = int(rng.integers(80, 256))
+            draw.ellipse(
+                (cx - radius, cy - radius, cx + radius, cy + radius), fill=(255, 255, 255, alpha)
+            )
+        if concern in ("wrinkle", "texture", "firmness"):
+            for i in range(4):
+                y_pos = int(height * (0.3 + i * 0.12))
+                draw.line(
+                    (width * 0.3, y_pos, width * 0.7, y_pos), fill=(255, 255, 255, 200), width=2
+                )
+        buffer = io.BytesIO()
+        mask.save(buffer, format="PNG")
+        masks[f"sd_{concern}_output_all.png"] = buffer.getvalue()
+    return masks
+
+
+def severity_scores(concern: str) -> list[float | None]:
+    """One score per severity level of the concern (None: concern without levels)"""
+    levels = len(landmark_service.SEVERITY_COLOR_LEVELS.get(concern, []))
+    thresholds = landmark_service.SEVERITY_THRESHOLDS.get(levels)
+    if not thresholds:
+        return [None]
+    # Level i: score >= thresholds[i]; the last level is below all thresholds
+    return [thresholds[i] + 1 for i in range(len(thresholds))] + [thresholds[-1] - 5]
+
+
+def _decode(image_bytes: bytes) -> np.ndarray:
+    return np.asarray(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+
+
+def _rgb(canvas: Image.Image | np.ndarray) -> np.ndarray:
+    """RGB array of a render canvas (PIL Image or the fused backend's RGB array)"""
+    if isinstance(canvas, np.ndarray):
+        return canvas
+    return np.asarray(canvas.convert("RGB"))
+
+
+def composite_png_layer(base: np.ndarray, png: bytes, info: dict) -> np.ndarray:
+    """Reference client compositor: one encode_layer PNG over the base image"""
+    pixels = np.asarray(Image.open(io.BytesIO(png)), dtype=np.float32)
+    if info["format"] == "alpha":
+        alpha, color = pixels / 255.0, np.array(info["color"], dtype=np.float32)
+    else:
+        alpha, color = pixels[..., 3] / 255.0, pixels[..., :3]
+    x, y, w, h = info["x"], info["y"], info["width"], info["height"]
+    result = base.copy()
+    region = result[y : y + h, x : x + w].astype(np.float32)
+    region = region * (1 - alpha[..., None]) + color * alpha[..., None]
+    result[y : y + h, x : x + w] = np.clip(np.rint(region), 0, 255).astype(np.uint8)
+    return result
+
+
+def golden_name(case: str) -> str:
+    """Golden image of a case (layers/... are checked against zone/...)"""
+    if case.startswith("layers/"):
+        return "zone/" + case.removeprefix("layers/")
+    return case
+
+
+def build_cases() -> dict[str, Callable[[], np.ndarray]]:
+    """case name -> render function returning an RGB array"""
+    width, height = FRAME_SIZE
+    frame = golden_frame(width, height)
+    masks = golden_masks(width, height)
+    landmark_result = synthetic_landmark_result(width, height)
+    service = landmark_service.get_landmark_service()
+
+    cases: dict[str, Callable[[], np.ndarray]] = {}
+
+    def uv_tint() -> np.ndarray:
+        with mock.patch.object(service, "detect_landmarks", return_value=landmark_result):
+            return _rgb(service.prepare_render_base(frame).tinted)
+
+    cases["uv_tint"] = uv_tint
+    cases["composite"] = lambda: _decode(
+        image_processing.create_composite_visualization(frame, masks, {})
+    )
+
+    for concern in MASK_CONCERNS:
+        cases[f"overlay/{concern}"] = lambda concern=concern: _decode(
+            image_processing.create_concern_overlay(frame, masks, concern)
+        )
+
+    for concern in landmark_service.CONCERN_ZONE_MAPPING:
+        mask_bytes = next((m for name, m in masks.items() if concern in name), None)
+        for style in STYLES:
+            for level, score in enumerate(severity_scores(concern)):
+
+                def render(concern=concern, style=style, score=score, mask_bytes=mask_bytes):
+                    if style == "polygon":
+                        style, mask_bytes = "boundary", None
+                    with (
+                        mock.patch.dict(
+                            landmark_service.VISUALIZATION_STYLE_MAPPING, {concern: style}
+                        ),
+                        mock.patch.object(
+                            service, "detect_landmarks", return_value=landmark_result
+                        ),
+                    ):
+                        viz_bytes, _ = service.create_zone_visualization(
+                            frame, concern, mask_bytes=mask_bytes, score=score
+                        )
+                    return _decode(viz_bytes)
+
+                def render_layer(concern=concern, style=style, score=score, mask_bytes=mask_bytes):
+                    if style == "polygon":
+                        style, mask_bytes = "boundary", None
+                    with (
+                        mock.patch.dict(
+                            landmark_service.VISUALIZATION_STYLE_MAPPING, {concern: style}
+                        ),
+                        mock.patch.object(
+                            service, "detect_landmarks", return_value=landmark_result
+                        ),
+                    ):
+                        base = service.prepare_render_base(frame)
+                        layer, _ = service.create_zone_layer(
+                            frame, concern, mask_bytes=mask_bytes, score=score, base=base
+                        )
+                    # Composite on the lossless base, then JPEG like the images mode,
+                    # so only the layer encoding and the client compositing are checked
+                    result = _rgb(base.tinted)
+                    encoded = landmark_service.encode_layer(layer) if layer else None
+                    if encoded is not None:
+                        result = composite_png_layer(result, *encoded)
+                    return _decode(landmark_service._encode_jpeg(result))
+
+                cases[f"zone/{concern}/{style}/s{level}"] = render
+                cases[f"layers/{concern}/{style}/s{level}"] = render_layer
+
+    return cases
+
+
+def compare(actual: np.ndarray, golden: np.ndarray) -> dict:
+    """Pixel difference statistics and PSNR (dB, inf if identical)"""
+    if actual.shape != golden.shape:
+        return {"shape": list(actual.shape), "golden_shape": list(golden.shape)}
+    diff = np.abs(actual.astype(np.int16) - golden.astype(np.int16))
+    mse = float(np.mean(diff.astype(np.float64) ** 2))
+    pixel_diff = diff.max(axis=-1)
+    return {
+        "max_diff": int(pixel_diff.max()),
+        "pixel_diffs": pixel_diff,
+        "psnr": math.inf if mse == 0 else 10 * math.log10(255**2 / mse),
+    }
+
+
+def _golden_path(case: str) -> str:
+    return os.path.join(GOLDEN_DIR, golden_name(case).replace("/", "__") + ".png")
+
+
+def _environment() -> dict:
+    import PIL
+
+    return {"numpy": np.__version__, "pillow": PIL.__version__, "frame_size": list(FRAME_SIZE)}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Golden-image check of the render path")
+    parser.add_argument("--cases", nargs="+", default=["*"], help="Case name patterns")
+    parser.add_argument("--update", action="store_true", help="Re-record the goldens")
+    parser.add_argument(
+        "--backend",
+        choices=render_kernels.RENDER_BACKENDS,
+        default="pil",
+        help="Render backend to check (goldens are recorded with pil)",
+    )
+    parser.add_argument(
+        "--max-diff", type=int, default=8, help="Per-pixel tolerance (0-255, any channel)"
+    )
+    parser.add_argument(
+        "--max-diff-fraction",
+        type=float,
+        default=0.001,
+        help="Fraction of pixels allowed over --max-diff",
+    )
+    parser.add_argument("--min-psnr", type=float, default=40.0, help="Minimum PSNR in dB")
+    parser.add_argument("--diff-dir", help="Write actual/golden/diff images of failing cases")
+    args = parser.parse_args()
+    if args.update and args.backend != "pil":
+        parser.error("goldens are recorded with --backend pil")
+    settings.render_backend = args.backend
+
+    cases = {
+        name: render
+        for name, render in build_cases().items()
+        if any(fnmatch.fnmatch(name, pattern) for pattern in args.cases)
+    }
+
+    if args.update:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        # layers/... share the zone/... goldens, they are only checked
+        recorded_cases = {
+            name: render for name, render in cases.items() if golden_name(name) == name
+        }
+        for name, render in recorded_cases.items():
+            Image.fromarray(render()).save(_golden_path(name), optimize=True)
+        # Keep the goldens of cases not selected by --cases
+        recorded = [
+            name
+            for name in build_cases()
+            if golden_name(name) == name and os.path.exists(_golden_path(name))
+        ]
+        with open(os.path.join(GOLDEN_DIR, "manifest.json"), "w") as f:
+            json.dump({"environment": _environment(), "cases": sorted(recorded)}, f, indent=2)
+            f.write("\n")
+        print(f"Recorded {len(recorded_cases)} golden image(s) in {GOLDEN_DIR}")
+        return 0
+
+    failures = 0
+    for name, render in cases.items():
+        path = _golden_path(name)
+        if not os.path.exists(path):
+            print(f"MISSING {name} (run with --update)")
+            failures += 1
+            continue
+        actual = render()
+        golden = np.asarray(Image.open(path).convert("RGB"))
+        result = compare(actual, golden)
+
+        if "shape" in result:
+            ok = False
+            detail = f"shape {result['shape']} != golden {result['golden_shape']}"
+        else:
+            over = float(np.mean(result["pixel_diffs"] > args.max_diff))
+            ok = over <= args.max_diff_fraction and result["psnr"] >= args.min_psnr
+            detail = (
+                f"psnr {result['psnr']:.1f} dB, max diff {result['max_diff']}, "
+                f"{over:.3%} pixels over {args.max_diff}"
+            )
+        if not ok:
+            failures += 1
+            print(f"FAIL    {name}: {detail}")
+            if args.diff_dir and "pixel_diffs" in result:
+                _write_diff(args.diff_dir, name, actual, golden, result["pixel_diffs"])
+        else:
+            print(f"ok      {name}: {detail}")
+
+    print(f"\n{len(cases) - failures}/{len(cases)} case(s) match the goldens ({args.backend})")
+    return 1 if failures else 0
+
+
+def _write_diff(
+    diff_dir: str, name: str, actual: np.ndarray, golden: np.ndarray, pixel_diffs: np.ndarray
+) -> None:
+    os.makedirs(diff_dir, exist_ok=True)
+    base = os.path.join(diff_dir, name.replace("/", "__"))
+    Image.fromarray(actual).save(f"{base}.actual.png")
+    Image.fromarray(golden).save(f"{base}.golden.png")
+    scaled = np.clip(pixel_diffs.astype(np.int32) * 8, 0, 255).astype(np.uint8)
+    Image.fromarray(scaled, "L").save(f"{base}.diff.png")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
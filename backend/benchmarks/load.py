@@ -0,0 +1,489 @@
+"""
+End-to-end load test of POST /api/analyze and GET /api/result/{task_id}.
+
+Starts the production server (python -m app.server) with a fresh
+RESULTS_DIR and drives it over HTTP:
+
+- bypass mode (default): BYPASS_YOUCAM=true, mock scores/masks
+- real mode (--mode real): the YouCam client talks to scripts.service_stubs
+
+With --ai, GPT runs against the OpenAI stand-in of scripts.service_stubs
+(AI_ANALYSIS_ENABLED=false otherwise). Every virtual request uploads a
+synthetic frame drawn from the --mix of sizes and then fetches the result.
+
+Load is applied in phases, one per --concurrency level (closed loop: N
+clients back to back) or per --rate (open loop: Poisson arrivals per
+second; latency counts from the scheduled arrival, so a saturated server
+shows up as queueing instead of a lower request rate). Each phase reports
+throughput, latency percentiles and error rates per endpoint, plus CPU and
+RSS of the server process tree sampled from /proc. Results are written as
+JSON (--out) so runs can be compared.
+
+Usage (from backend/):
+    python -m benchmarks.load --concurrency 1 2 4 8 --duration 30
+    python -m benchmarks.load --mode real --ai --rate 0.5 1 2 --mix vga=3,1080p=1
+    python -m benchmarks.load --url http://127.0.0.1:8000 --server-pid 1234 --concurrency 4
+"""
+
+import os
+
+# app settings are loaded on import (fixtures); the server gets its own environment
+os.environ.setdefault("YOUCAM_API_KEY", "loadtest")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import io  # noqa: E402
+import json  # noqa: E402
+import platform  # noqa: E402
+import random  # noqa: E402
+import shutil  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import time  # noqa: E402
+
+import httpx  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from app.services.warmup import synthetic_frame  # noqa: E402
+from benchmarks.fixtures import SIZES  # noqa: E402
+
+PERCENTILES = (50, 90, 95, 99)
+
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    """'vga=3,1080p=1' -> {"vga": 3.0, "1080p": 1.0}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SIZES:
+            raise argparse.ArgumentTypeError(f"Unknown size {name!r} (choose from {list(SIZES)})")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+def make_images(sizes: list[str], variants: int, seed: int) -> dict[str, list[bytes]]:
+    """A few distinct JPEGs per size, so artifacts and AI texts are not all deduplicated"""
+    rng = random.Random(seed)
+    images = {}
+    for name in sizes:
+        width, height = SIZES[name]
+        base = Image.open(io.BytesIO(synthetic_frame(width, height)))
+        images[name] = []
+        for _ in range(variants):
+            frame = base.copy()
+            x, y = rng.randrange(width // 2), rng.randrange(height // 2)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            ImageDraw.Draw(frame).rectangle((x, y, x + width // 20, y + height // 20), fill=color)
+            buffer = io.BytesIO()
+            frame.save(buffer, format="JPEG", quality=90)
+            images[name].append(buffer.getvalue())
+    return images
+
+
+class ServerStats:
+    """CPU time and RSS of a process and its descendants (Linux /proc)"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.samples: list[tuple[float, float, int]] = []  # (time, cpu seconds, rss bytes)
+
+    def _tree(self) -> list[int]:
+        parents: dict[int, int] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                parents[int(entry)] = int(fields[1])
+            except (OSError, IndexError, ValueError):
+                continue
+        tree, frontier = [self.pid], [self.pid]
+        while frontier:
+            children = [pid for pid, ppid in parents.items() if ppid in frontier]
+            tree.extend(children)
+            frontier = children
+        return tree
+
+    def sample(self) -> None:
+        cpu_ticks = 0
+        rss = 0
+        for pid in self._tree():
+            try:
+                with open(f"/proc/{pid}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                cpu_ticks += int(fields[11]) + int(fields[12])  # utime + stime
+                rss += int(fields[21]) * os.sysconf("SC_PAGE_SIZE")
+            except (OSError, IndexError, ValueError):
+                continue
+        self.samples.append((time.monotonic(), cpu_ticks / _CLOCK_TICKS, rss))
+
+    async def run(self, interval_s: float) -> None:
+        while True:
+            await asyncio.to_thread(self.sample)
+            await asyncio.sleep(interval_s)
+
+    def window(self, start: float, end: float) -> dict:
+        """Mean CPU (percent of one core) and peak RSS between two monotonic times"""
+        inside = [s for s in self.samples if start <= s[0] <= end]
+        if len(inside) < 2:
+            return {"cpu_percent": None, "rss_max_mb": None, "samples": len(inside)}
+        (t0, cpu0, _), (t1, cpu1, _) = inside[0], inside[-1]
+        return {
+            "cpu_percent": round((cpu1 - cpu0) / (t1 - t0) * 100, 1),
+            "rss_max_mb": round(max(s[2] for s in inside) / 1024 / 1024, 1),
+            "samples": len(inside),
+        }
+
+
+class LoadRun:
+    """Virtual clients for one phase"""
+
+    def __init__(self, client: httpx.AsyncClient, images: dict, mix: dict[str, float], args):
+        self.client = client
+        self.images = images
+        self.sizes = list(mix)
+        self.weights = list(mix.values())
+        self.args = args
+        self.records: list[dict] = []
+
+    async def one(self, scheduled: float | None = None) -> None:
+        """Analyze one image and fetch its result"""
+        size = random.choices(self.sizes, self.weights)[0]
+        image = random.choice(self.images[size])
+        started = scheduled if scheduled is not None else time.perf_counter()
+
+        task_id = None
+        record = {"endpoint": "analyze", "size": size, "status": None, "error": None}
+        try:
+            response = await self.client.post(
+                "/api/analyze",
+                files={"file": (f"{size}.jpg", image, "image/jpeg")},
+                params={"ai_mode": self.args.ai_mode} if self.args.ai_mode else None,
+            )
+            record["status"] = response.status_code
+            if response.status_code == 200:
+                task_id = response.json().get("task_id")
+        except httpx.HTTPError as e:
+            record["error"] = type(e).__name__
+        record["latency_s"] = time.perf_counter() - started
+        self.records.append(record)
+
+        if task_id is None:
+            return
+        started = time.perf_counter()
+        record = {"endpoint": "result", "size": size, "status": None, "error": None}
+        try:
+            response = await self.client.get(f"/api/result/{task_id}")
+            record["status"] = response.status_code
+            if response.status_code == 200 and response.json().get("status") != "completed":
+                record["error"] = "not_completed"
+        except httpx.HTTPError as e:
+            record["error"] = type(e).__name__
+        record["latency_s"] = time.perf_counter() - started
+        self.records.append(record)
+
+    async def closed_loop(self, concurrency: int, duration_s: float) -> None:
+        deadline = time.perf_counter() + duration_s
+
+        async def client_loop():
+            while time.perf_counter() < deadline:
+                await self.one()
+
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+
+    async def open_loop(self, rate: float, duration_s: float) -> int:
+        """Poisson arrivals; returns the number of arrivals dropped at --max-inflight"""
+        deadline = time.perf_counter() + duration_s
+        inflight: set[asyncio.Task] = set()
+        dropped = 0
+        next_arrival = time.perf_counter()
+        while next_arrival < deadline:
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if len(inflight) >= self.args.max_inflight:
+                dropped += 1
+            else:
+                task = asyncio.create_task(self.one(scheduled=next_arrival))
+                inflight.add(task)
+                task.add_done_callback(inflight.discard)
+            next_arrival += random.expovariate(rate)
+        if inflight:
+            await asyncio.gather(*inflight)
+        return dropped
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    """Nearest-rank percentile"""
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(records: list[dict], elapsed_s: float) -> dict[str, dict]:
+    summary = {}
+    for endpoint in ("analyze", "result"):
+        rows = [r for r in records if r["endpoint"] == endpoint]
+        ok = [r for r in rows if r["status"] == 200 and r["error"] is None]
+        errors = len(rows) - len(ok)
+        latencies = sorted(r["latency_s"] * 1000 for r in ok)
+        statuses: dict[str, int] = {}
+        for r in rows:
+            key = r["error"] or str(r["status"])
+            statuses[key] = statuses.get(key, 0) + 1
+        entry = {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+            "throughput_rps": round(len(ok) / elapsed_s, 3) if elapsed_s else 0.0,
+            "statuses": statuses,
+        }
+        if latencies:
+            entry["latency_ms"] = {
+                **{f"p{p}": round(_percentile(latencies, p), 1) for p in PERCENTILES},
+                "mean": round(sum(latencies) / len(latencies), 1),
+                "max": round(latencies[-1], 1),
+            }
+        summary[endpoint] = entry
+    return summary
+
+
+def start_process(cmd: list[str], env: dict, log_path: str) -> subprocess.Popen:
+    with open(log_path, "w") as log:
+        # The child keeps its own copy of the log file descriptor
+        return subprocess.Popen(
+            cmd, env={**os.environ, **env}, stdout=log, stderr=subprocess.STDOUT
+        )
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+async def wait_ready(url: str, timeout_s: float, process: subprocess.Popen | None) -> None:
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient(base_url=url, timeout=5.0) as client:
+        while time.monotonic() < deadline:
+            if process is not None and process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {process.returncode}")
+            try:
+                if (await client.get("/api/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Server at {url} not ready after {timeout_s:.0f}s")
+
+
+def server_env(args, results_dir: str, stub_url: str | None) -> dict[str, str]:
+    env = {
+        "RESULTS_DIR": results_dir,
+        "UPLOAD_DIR": os.path.join(results_dir, "uploads"),
+        "RESULT_BACKEND": args.result_backend,
+        "YOUCAM_API_KEY": "loadtest",
+        "BYPASS_YOUCAM": "true" if args.mode == "bypass" else "false",
+        "AI_ANALYSIS_ENABLED": "true" if args.ai else "false",
+    }
+    if stub_url is not None:
+        env["YOUCAM_BASE_URL"] = f"{stub_url}/s2s/v2.0"
+        env["OPENAI_BASE_URL"] = f"{stub_url}/v1"
+        env["OPENAI_API_KEY"] = "loadtest"
+    return env
+
+
+async def run(args) -> dict:
+    mix = args.mix
+    images = make_images(list(mix), args.variants, args.seed)
+    random.seed(args.seed)
+
+    processes: list[subprocess.Popen] = []
+    url = args.url
+    server_pid = args.server_pid
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    try:
+        if url is None:
+            stub_url = None
+            if args.mode == "real" or args.ai:
+                stub_url = f"http://127.0.0.1:{args.port + 1}"
+                processes.append(
+                    start_process(
+                        [
+                            sys.executable,
+                            "-m",
+                            "scripts.service_stubs",
+                            "--port",
+                            str(args.port + 1),
+                            "--task-delay",
+                            str(args.task_delay),
+                            "--openai-delay",
+                            str(args.openai_delay),
+                        ],
+                        {},
+                        os.path.join(workdir, "stubs.log"),
+                    )
+                )
+            server = start_process(
+                [
+                    sys.executable,
+                    "-m",
+                    "app.server",
+                    "--host",
+                    "127.0.0.1",
+                    "--port",
+                    str(args.port),
+                    "--workers",
+                    str(args.workers),
+                    "--log-level",
+                    "warning",
+                ],
+                server_env(args, os.path.join(workdir, "results"), stub_url),
+                os.path.join(workdir, "server.log"),
+            )
+            processes.append(server)
+            url = f"http://127.0.0.1:{args.port}"
+            server_pid = server.pid
+            print(f"Server logs in {workdir}")
+        await wait_ready(url, args.ready_timeout, processes[-1] if processes else None)
+
+        stats = ServerStats(server_pid) if server_pid and os.path.isdir("/proc") else None
+        sampler = asyncio.create_task(stats.run(0.5)) if stats is not None else None
+
+        phases = []
+        levels = [("concurrency", c) for c in args.concurrency or []]
+        levels += [("rate", r) for r in args.rate or []]
+        timeout = httpx.Timeout(args.request_timeout)
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+            for kind, level in levels:
+                load = LoadRun(client, images, mix, args)
+                started_at = time.monotonic()
+                started = time.perf_counter()
+                dropped = 0
+                if kind == "concurrency":
+                    await load.closed_loop(int(level), args.duration)
+                else:
+                    dropped = await load.open_loop(level, args.duration)
+                elapsed = time.perf_counter() - started
+                if stats is not None:
+                    await asyncio.to_thread(stats.sample)
+
+                phase = {
+                    kind: level,
+                    "elapsed_s": round(elapsed, 2),
+                    "endpoints": summarize(load.records, elapsed),
+                    "server": stats.window(started_at, time.monotonic()) if stats else None,
+                }
+                if kind == "rate":
+                    phase["dropped"] = dropped
+                phases.append(phase)
+                print_phase(phase)
+
+        if sampler is not None:
+            sampler.cancel()
+    finally:
+        for process in reversed(processes):
+            stop_process(process)
+        # Keep the logs, drop stored results and artifacts
+        shutil.rmtree(os.path.join(workdir, "results"), ignore_errors=True)
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "mode": args.mode,
+            "ai": args.ai,
+            "ai_mode": args.ai_mode,
+            "mix": mix,
+            "workers": args.workers if args.url is None else None,
+            "result_backend": args.result_backend,
+            "duration_s": args.duration,
+            "url": args.url,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "phases": phases,
+    }
+
+
+def print_phase(phase: dict) -> None:
+    level = f"concurrency {phase['concurrency']}" if "concurrency" in phase else None
+    level = level or f"rate {phase['rate']}/s"
+    server = phase["server"] or {}
+    print(
+        f"\n{level} ({phase['elapsed_s']}s)  server cpu {server.get('cpu_percent')}%  "
+        f"rss max {server.get('rss_max_mb')} MB"
+        + (f"  dropped {phase['dropped']}" if phase.get("dropped") else "")
+    )
+    for endpoint, entry in phase["endpoints"].items():
+        latency = entry.get("latency_ms", {})
+        print(
+            f"  {endpoint:<8} {entry['requests']:>5} req  {entry['throughput_rps']:>7.2f} rps  "
+            f"err {entry['error_rate']:>6.1%}  "
+            + "  ".join(f"{key} {value:>8.1f}" for key, value in latency.items())
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test of the analyze/result API")
+    parser.add_argument("--mode", choices=("bypass", "real"), default="bypass")
+    parser.add_argument("--ai", action="store_true", help="GPT against the OpenAI stand-in")
+    parser.add_argument("--ai-mode", choices=("fanout", "batched"), default=None)
+    parser.add_argument(
+        "--mix", type=parse_mix, default=parse_mix("vga"), help="Image sizes, e.g. vga=3,1080p=1"
+    )
+    parser.add_argument("--variants", type=int, default=4, help="Distinct images per size")
+    parser.add_argument("--concurrency", type=int, nargs="+", help="Closed-loop client counts")
+    parser.add_argument("--rate", type=float, nargs="+", help="Open-loop arrivals per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per phase")
+    parser.add_argument("--max-inflight", type=int, default=256, help="Open-loop cap")
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--workers", type=int, default=2, help="Server worker processes")
+    parser.add_argument(
+        "--result-backend",
+        default="sqlite",
+        choices=("memory", "sqlite", "redis"),
+        help="RESULT_BACKEND of the server (sqlite: results are shared by the workers)",
+    )
+    parser.add_argument("--port", type=int, default=8765, help="Server port (stubs: port + 1)")
+    parser.add_argument("--task-delay", type=float, default=1.0, help="YouCam stand-in delay")
+    parser.add_argument("--openai-delay", type=float, default=0.3, help="OpenAI stand-in delay")
+    parser.add_argument("--ready-timeout", type=float, default=300.0)
+    parser.add_argument("--url", help="Load an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="PID for CPU/RSS sampling with --url")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--out",
+        help="Result JSON (default: $RESULTS_DIR/loadtest/loadtest-<time>.json)",
+    )
+    args = parser.parse_args()
+    if args.workers > 1 and args.result_backend == "memory" and not args.url:
+        parser.error("--result-backend memory only works with --workers 1")
+    if not args.concurrency and not args.rate:
+        args.concurrency = [1, 2, 4]
+
+    report = asyncio.run(run(args))
+
+    out = args.out or os.path.join(
+        os.environ.get("RESULTS_DIR", "/tmp/results"),
+        "loadtest",
+        f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
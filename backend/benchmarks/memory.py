@@ -0,0 +1,160 @@
+"""
+Memory budget check for a reference analysis.
+
+Runs one full bypass-mode analysis (mock masks, synthetic landmarks, no
+GPT) on a synthetic frame with MEMORY_TRACKING_ENABLED, including the
+base64/JSON encoding of the response, and reports the peak RSS and peak
+traced allocations of every pipeline stage and of the whole request.
+
+The numbers are compared with a recorded budget (benchmarks/memory_budget.json
+by default); the exit status is 1 if any stage goes over its budget, so
+this can run in CI. --record measures and writes a new budget with
+--headroom on top. RSS is process-wide and includes the interpreter,
+NumPy, OpenCV and MediaPipe, so the budget only holds for the same
+dependency versions; re-record it when they change. Budgets are kept per
+size and render backend (RENDER_BACKEND; the traced numbers differ because
+the opencv kernels allocate NumPy buffers where PIL allocates untraced ones).
+
+Usage (from backend/):
+    python -m benchmarks.memory                      # 12MP, check against the budget
+    python -m benchmarks.memory --size 1080p
+    python -m benchmarks.memory --record             # write a new budget for the size
+    RENDER_BACKEND=opencv python -m benchmarks.memory
+"""
+
+import os
+import tempfile
+
+# Settings are read at import time
+os.environ["MEMORY_TRACKING_ENABLED"] = "true"
+os.environ["METRICS_ENABLED"] = "true"
+os.environ["BYPASS_YOUCAM"] = "true"
+os.environ["AI_ANALYSIS_ENABLED"] = "false"
+os.environ["ARTIFACTS_ENABLED"] = "false"
+os.environ["RESULT_BACKEND"] = "memory"
+os.environ.setdefault("YOUCAM_API_KEY", "memory-benchmark")
+os.environ.setdefault("RESULTS_DIR", tempfile.mkdtemp(prefix="memory-benchmark-"))
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import sys  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.services.metrics import end_request_timings, stage, start_request_timings  # noqa: E402
+from app.services.result_store import encode_result  # noqa: E402
+from app.services.youcam_service import youcam_service  # noqa: E402
+from benchmarks.fixtures import SIZES, Frame, synthetic_detection  # noqa: E402
+
+DEFAULT_BUDGET = os.path.join(os.path.dirname(__file__), "memory_budget.json")
+
+_MB = 1024 * 1024
+
+
+async def reference_run(frame: Frame) -> dict[str, dict]:
+    """
+    One analysis of the frame, as POST /api/analyze would run it.
+
+    Returns:
+        stage name -> {"rss_mb", "traced_mb", "calls"}; peaks of repeated
+        stages (per concern) are the maximum over the calls
+    """
+    timings, token = start_request_timings()
+    try:
+        with stage("request"), synthetic_detection(frame):
+            result = await youcam_service.analyze_image(
+                frame.image_bytes, "reference.jpg", "image/jpeg"
+            )
+            with stage("encode"):
+                body = json.dumps(encode_result(result))
+            del result, body
+    finally:
+        end_request_timings(token)
+
+    stages: dict[str, dict] = {}
+    for name, _seconds, memory in timings:
+        rss_peak, traced_peak = memory
+        entry = stages.setdefault(name, {"rss_mb": 0.0, "traced_mb": 0.0, "calls": 0})
+        entry["rss_mb"] = max(entry["rss_mb"], round((rss_peak or 0) / _MB, 1))
+        entry["traced_mb"] = max(entry["traced_mb"], round(traced_peak / _MB, 1))
+        entry["calls"] += 1
+    return stages
+
+
+def check(stages: dict[str, dict], budget: dict[str, dict]) -> list[str]:
+    """Stages/metrics over budget, as printable lines"""
+    over = []
+    for name, limits in budget.items():
+        measured = stages.get(name)
+        if measured is None:
+            continue
+        for metric in ("rss_mb", "traced_mb"):
+            if metric in limits and measured[metric] > limits[metric]:
+                over.append(f"{name}.{metric}: {measured[metric]} MB > {limits[metric]} MB budget")
+    return over
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Peak memory of a reference analysis")
+    parser.add_argument("--size", default="12mp", choices=list(SIZES))
+    parser.add_argument("--budget", default=DEFAULT_BUDGET, help="Budget JSON file")
+    parser.add_argument("--record", action="store_true", help="Write the budget for --size")
+    parser.add_argument(
+        "--headroom",
+        type=float,
+        default=0.15,
+        help="Margin added to the measured peaks by --record (default: 0.15)",
+    )
+    args = parser.parse_args()
+
+    frame = Frame(args.size)
+    stages = asyncio.run(reference_run(frame))
+    # Budget key: "12mp" for the default pil backend, "12mp/opencv" otherwise
+    key = (
+        args.size if settings.render_backend == "pil" else f"{args.size}/{settings.render_backend}"
+    )
+
+    print(f"Reference analysis, {key} ({frame.width}x{frame.height}):")
+    print(f"{'stage':<14} {'calls':>5} {'peak RSS':>12} {'traced':>12}")
+    for name, entry in sorted(stages.items(), key=lambda item: -item[1]["rss_mb"]):
+        print(
+            f"{name:<14} {entry['calls']:>5} {entry['rss_mb']:>9.1f} MB "
+            f"{entry['traced_mb']:>9.1f} MB"
+        )
+
+    budgets = {}
+    if os.path.exists(args.budget):
+        with open(args.budget) as f:
+            budgets = json.load(f)
+
+    if args.record:
+        budgets[key] = {
+            name: {
+                "rss_mb": round(entry["rss_mb"] * (1 + args.headroom), 1),
+                "traced_mb": round(max(entry["traced_mb"], 1.0) * (1 + args.headroom), 1),
+            }
+            for name, entry in sorted(stages.items())
+        }
+        with open(args.budget, "w") as f:
+            json.dump(budgets, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nRecorded budget for {key} in {args.budget}")
+        return 0
+
+    budget = budgets.get(key)
+    if budget is None:
+        print(f"\nNo budget for {key} in {args.budget} (run with --record)")
+        return 1
+
+    over = check(stages, budget)
+    if over:
+        print(f"\nOver the memory budget ({args.budget}):")
+        for line in over:
+            print(f"  {line}")
+        return 1
+    print(f"\nWithin the memory budget ({args.budget})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""
+Microbenchmarks for the rendering and landmark hot paths.
+
+Every case runs on synthetic frames (640x480, 1080p, 12MP) with
+generate_mock_masks() and reports wall time (median/min over --repeat runs)
+and the tracemalloc peak of one extra run (Python and NumPy allocations;
+PIL image buffers are not traced). Results can be saved as a baseline and
+later runs compared against it. Offline and CPU-only. --backend selects
+the render backend (RENDER_BACKEND: pil or the fused opencv kernels); a
+pil baseline compared with an opencv run shows the kernel speedup.
+--codec-workers sets the codec executor threads (CODEC_WORKERS, default:
+CPUs available to the process); composite, zone_e2e and zone_layers
+decode/render/encode per mask or concern on that pool.
+
+Cases:
+    uv_tint             UV tint on the frame (_apply_uv_tint / render_kernels.apply_uv_tint)
+    face_region_mask    create_face_region_mask with bbox and landmarks
+    mask_visualization  draw_mask_based_visualization for one concern mask
+    composite           create_composite_visualization (all masks)
+    concern_overlay     create_concern_overlay for one concern
+    detect_landmarks    LandmarkService.detect_landmarks (MediaPipe, no face found)
+    zone_e2e            LandmarkService.create_all_zone_visualizations with
+                        synthetic landmarks in place of MediaPipe detection
+    zone_layers         LandmarkService.create_all_zone_layers (overlay_mode=layers),
+                        same inputs as zone_e2e
+
+Usage (from backend/):
+    python -m benchmarks.run --sizes vga 1080p --save /tmp/results/bench_baseline.json
+    python -m benchmarks.run --sizes vga 1080p --compare /tmp/results/bench_baseline.json
+    python -m benchmarks.run --cases composite zone_e2e --repeat 10
+    python -m benchmarks.run --backend opencv --compare /tmp/results/bench_baseline.json
+    python -m benchmarks.run --cases composite zone_e2e --codec-workers 1 --save /tmp/results/w1.json
+    python -m benchmarks.run --cases composite zone_e2e --codec-workers 4 --compare /tmp/results/w1.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+
+import numpy as np
+from PIL import Image
+
+from app.config import settings
+from app.services import image_processing, landmark_service, render_kernels
+from app.services.codec_executor import available_cpus, codec_executor
+from benchmarks.fixtures import SIZES, Frame, synthetic_detection
+
+# case name -> setup(frame) returning the zero-argument callable to time
+Case = Callable[[Frame], Callable[[], object]]
+
+
+def _canvas(frame: Frame) -> Image.Image | np.ndarray:
+    """Decoded frame as the selected render backend takes it"""
+    if render_kernels.use_fused_kernels():
+        return np.asarray(Image.open(io.BytesIO(frame.image_bytes)).convert("RGB"))
+    return Image.open(io.BytesIO(frame.image_bytes)).convert("RGBA")
+
+
+def _uv_tint(frame: Frame) -> Callable[[], object]:
+    image = _canvas(frame)
+    if isinstance(image, np.ndarray):
+        return lambda: render_kernels.apply_uv_tint(image, landmark_service.UV_TINT_CONFIG)
+    return lambda: landmark_service._apply_uv_tint(image)
+
+
+def _face_region_mask(frame: Frame) -> Callable[[], object]:
+    result = frame.landmark_result
+    return lambda: landmark_service.create_face_region_mask(
+        frame.width, frame.height, result.face_bbox, result.landmarks
+    )
+
+
+def _mask_visualization(frame: Frame) -> Callable[[], object]:
+    image = _canvas(frame)
+    mask_bytes = frame.masks["sd_acne_output_all.png"]
+    result = frame.landmark_result
+    return lambda: landmark_service.draw_mask_based_visualization(
+        image, mask_bytes, (255, 80, 80), result.landmarks, result.face_bbox
+    )
+
+
+def _composite(frame: Frame) -> Callable[[], object]:
+    return lambda: image_processing.create_composite_visualization(
+        frame.image_bytes, frame.masks, frame.scores
+    )
+
+
+def _concern_overlay(frame: Frame) -> Callable[[], object]:
+    return lambda: image_processing.create_concern_overlay(frame.image_bytes, frame.masks, "acne")
+
+
+def _detect_landmarks(frame: Frame) -> Callable[[], object]:
+    service = landmark_service.get_landmark_service()
+    return lambda: service.detect_landmarks(frame.image_bytes)
+
+
+def _zone_e2e(frame: Frame) -> Callable[[], object]:
+    def run():
+        with synthetic_detection(frame) as service:
+            return service.create_all_zone_visualizations(
+                frame.image_bytes, frame.masks, frame.scores
+            )
+
+    return run
+
+
+def _zone_layers(frame: Frame) -> Callable[[], object]:
+    def run():
+        with synthetic_detection(frame) as service:
+            return service.create_all_zone_layers(frame.image_bytes, frame.masks, frame.scores)
+
+    return run
+
+
+CASES: dict[str, Case] = {
+    "uv_tint": _uv_tint,
+    "face_region_mask": _face_region_mask,
+    "mask_visualization": _mask_visualization,
+    "composite": _composite,
+    "concern_overlay": _concern_overlay,
+    "detect_landmarks": _detect_landmarks,
+    "zone_e2e": _zone_e2e,
+    "zone_layers": _zone_layers,
+}
+
+
+def measure(fn: Callable[[], object], repeat: int) -> dict:
+    """Median/min wall time over `repeat` runs plus tracemalloc peak of one run"""
+    fn()  # Warm caches, lazy imports and MediaPipe graphs
+
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+
+    # Separate run: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "min_ms": round(min(times), 3),
+        "peak_kb": round(peak / 1024, 1),
+        "repeat": repeat,
+    }
+
+
+def run(cases: list[str], sizes: list[str], repeat: int) -> dict[str, dict]:
+    results = {}
+    for size in sizes:
+        frame = Frame(size)
+        for case in cases:
+            key = f"{case}@{size}"
+            results[key] = measure(CASES[case](frame), repeat)
+            r = results[key]
+            print(
+                f"{key:<30} median {r['median_ms']:>10.2f} ms   min {r['min_ms']:>10.2f} ms"
+                f"   peak {r['peak_kb'] / 1024:>8.1f} MB",
+                flush=True,
+            )
+    return results
+
+
+def environment() -> dict:
+    import cv2
+    import mediapipe
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pillow": Image.__version__,
+        "opencv": cv2.__version__,
+        "mediapipe": mediapipe.__version__,
+        "render_backend": settings.render_backend,
+        "available_cpus": available_cpus(),
+        "codec_workers": codec_executor.workers,
+        "created_at": int(time.time()),
+    }
+
+
+def compare(results: dict[str, dict], baseline_path: str, threshold: float) -> int:
+    """
+    Print the change against a saved baseline.
+
+    Returns:
+        Number of cases slower than the baseline by more than `threshold` (fraction)
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (median time, peak memory):")
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f"{key:<30} (not in baseline)")
+            continue
+        time_delta = r["median_ms"] / base["median_ms"] - 1 if base["median_ms"] else 0.0
+        mem_delta = r["peak_kb"] / base["peak_kb"] - 1 if base["peak_kb"] else 0.0
+        flag = ""
+        if time_delta > threshold:
+            flag = "  SLOWER"
+            regressions += 1
+        elif time_delta < -threshold:
+            flag = "  faster"
+        print(
+            f"{key:<30} {base['median_ms']:>10.2f} -> {r['median_ms']:>10.2f} ms "
+            f"({time_delta:+7.1%})   peak {mem_delta:+7.1%}{flag}"
+        )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Rendering/landmark microbenchmarks")
+    parser.add_argument("--cases", nargs="+", default=list(CASES), choices=list(CASES))
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case")
+    parser.add_argument(
+        "--backend",
+        choices=render_kernels.RENDER_BACKENDS,
+        default=settings.render_backend,
+        help="Render backend (default: RENDER_BACKEND)",
+    )
+    parser.add_argument(
+        "--codec-workers",
+        type=int,
+        default=settings.codec_workers,
+        help="Codec executor threads (default: CODEC_WORKERS or available CPUs)",
+    )
+    parser.add_argument("--save", help="Write results as a baseline JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Relative slowdown reported as a regression (default: 0.10)",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        help="Exit with status 1 if any case regressed beyond --threshold",
+    )
+    args = parser.parse_args()
+    settings.render_backend = args.backend
+    settings.codec_workers = args.codec_workers
+    print(f"Codec workers: {codec_executor.workers} (available CPUs: {available_cpus()})")
+
+    results = run(args.cases, args.sizes, args.repeat)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions and args.fail_on_regression:
+            print(f"\n{regressions} case(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
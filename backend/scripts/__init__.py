@@ -0,0 +1 @@
+# Scripts package (run from backend/: python -m scripts.<name>)
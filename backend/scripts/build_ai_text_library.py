@@ -0,0 +1,112 @@
+"""
+Build the precomputed AI text library.
+
+Generates one GPT analysis per (concern, score bucket) for every concern in
+CONCERN_NAMES using the regular concern prompt, and writes them to a
+memory-mappable index file that AIAnalysisService loads at startup
+(AI_TEXT_LIBRARY_PATH).
+
+Each bucket is generated from a scores dict that holds only the focus
+concern at the bucket's center score, so the text does not depend on the
+other concerns' scores.
+
+Usage (from backend/):
+    python -m scripts.build_ai_text_library --out /tmp/results/ai_text_library.bin
+    python -m scripts.build_ai_text_library --bucket-width 10 --concerns acne pore
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from app.config import settings
+from app.services.ai_analysis_service import (
+    CONCERN_NAMES,
+    PROMPT_VERSION,
+    ai_analysis_service,
+    validate_analysis,
+)
+from app.services.ai_text_library import bucket_center, bucket_count, write_library
+
+
+async def build(
+    concerns: list[str], bucket_width: float, concurrency: int, retries: int
+) -> dict[tuple[str, int], dict]:
+    """Generate all (concern, bucket) analyses with bounded concurrency"""
+    semaphore = asyncio.Semaphore(concurrency)
+    entries: dict[tuple[str, int], dict] = {}
+    jobs = [
+        (concern, bucket) for concern in concerns for bucket in range(bucket_count(bucket_width))
+    ]
+
+    async def generate(concern: str, bucket: int) -> None:
+        scores = {concern: {"raw_score": bucket_center(bucket, bucket_width)}}
+        async with semaphore:
+            for _attempt in range(retries + 1):
+                analysis = await ai_analysis_service.generate_fresh_analysis(concern, scores)
+                # Library entries win over cache and GPT: never store an empty/malformed one
+                if analysis is not None and validate_analysis(analysis) is not None:
+                    entries[(concern, bucket)] = analysis
+                    print(f"  {concern} bucket {bucket}: ok ({len(entries)}/{len(jobs)})")
+                    return
+        print(f"  {concern} bucket {bucket}: FAILED after {retries + 1} attempt(s)")
+
+    await asyncio.gather(*(generate(concern, bucket) for concern, bucket in jobs))
+    return entries
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Build the precomputed AI text library")
+    parser.add_argument(
+        "--out",
+        default=settings.ai_text_library_path
+        or os.path.join(settings.results_dir, "ai_text_library.bin"),
+        help="Output index file (default: AI_TEXT_LIBRARY_PATH or RESULTS_DIR/ai_text_library.bin)",
+    )
+    parser.add_argument(
+        "--bucket-width",
+        type=float,
+        default=settings.ai_cache_bucket_width,
+        help="Score bucket width on the 0-100 scale",
+    )
+    parser.add_argument(
+        "--concerns",
+        nargs="+",
+        default=list(CONCERN_NAMES),
+        choices=list(CONCERN_NAMES),
+        help="Concerns to generate (default: all)",
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel GPT requests")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per failed entry")
+    args = parser.parse_args()
+
+    if not ai_analysis_service.enabled:
+        print("AI analysis is disabled. Set AI_ANALYSIS_ENABLED=true and provide OPENAI_API_KEY.")
+        return 1
+
+    total = len(args.concerns) * bucket_count(args.bucket_width)
+    print(
+        f"Generating {total} analyses ({len(args.concerns)} concerns x "
+        f"{bucket_count(args.bucket_width)} buckets) with {ai_analysis_service.model}..."
+    )
+    started = time.perf_counter()
+    entries = asyncio.run(build(args.concerns, args.bucket_width, args.concurrency, args.retries))
+
+    write_library(
+        args.out,
+        entries,
+        bucket_width=args.bucket_width,
+        model=ai_analysis_service.model,
+        prompt_version=PROMPT_VERSION,
+    )
+    print(
+        f"Wrote {len(entries)}/{total} entries to {args.out} "
+        f"({os.path.getsize(args.out) / 1024:.1f} KB) in {time.perf_counter() - started:.1f}s"
+    )
+    return 0 if len(entries) == total else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Stand-in Redis server (RESP2, in-memory) for local runs of RESULT_BACKEND=redis.
+
+Implements the subset of commands used by the result store: strings,
+hashes, key expiry, a few housekeeping commands and EVAL of the scripts
+in redis_client (no Lua interpreter). Single process, no persistence,
+no eviction; not a replacement for a real Redis.
+
+Usage (from backend/):
+    python -m scripts.resp_server --port 6379
+    RESULT_BACKEND=redis REDIS_URL=redis://127.0.0.1:6379/0 uvicorn app.main:app --workers 4
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from app.services.redis_client import HSET_IF_EXISTS_SCRIPT, RedisError, read_reply
+
+
+class _Store:
+    """Keyspace with lazy expiry"""
+
+    def __init__(self):
+        self.data: dict[bytes, bytes | dict[bytes, bytes]] = {}
+        self.expires: dict[bytes, float] = {}
+
+    def alive(self, key: bytes) -> bool:
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def delete(self, key: bytes) -> bool:
+        self.expires.pop(key, None)
+        return self.data.pop(key, None) is not None
+
+    def hash(self, key: bytes, create: bool = False) -> dict[bytes, bytes] | None:
+        if not self.alive(key):
+            if not create:
+                return None
+            self.data[key] = {}
+        value = self.data[key]
+        if not isinstance(value, dict):
+            raise RedisError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+
+def _encode_reply(reply) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, RedisError):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, bool | int):
+        return b":%d\r\n" % int(reply)
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(_encode_reply(item) for item in reply)
+    raise TypeError(f"Cannot encode reply of type {type(reply).__name__}")
+
+
+def execute(store: _Store, args: list[bytes]):
+    """Run one command against the keyspace and return its reply"""
+    if not args:
+        return RedisError("ERR empty command")
+    name, args = args[0].upper().decode(), args[1:]
+    now = time.monotonic()
+
+    if name == "PING":
+        return args[0] if args else "PONG"
+    if name in ("AUTH", "SELECT", "CLIENT"):
+        return "OK"
+    if name == "DBSIZE":
+        return sum(1 for key in list(store.data) if store.alive(key))
+    if name == "FLUSHDB":
+        store.data.clear()
+        store.expires.clear()
+        return "OK"
+    if name == "EXISTS":
+        return sum(1 for key in args if store.alive(key))
+    if name == "DEL":
+        return sum(1 for key in args if store.alive(key) and store.delete(key))
+    if name in ("EXPIRE", "PEXPIRE"):
+        if not store.alive(args[0]):
+            return 0
+        scale = 1.0 if name == "EXPIRE" else 0.001
+        store.expires[args[0]] = now + int(args[1]) * scale
+        return 1
+    if name == "PTTL":
+        if not store.alive(args[0]):
+            return -2
+        deadline = store.expires.get(args[0])
+        return -1 if deadline is None else int((deadline - now) * 1000)
+    if name == "GET":
+        if not store.alive(args[0]):
+            return None
+        value = store.data[args[0]]
+        if isinstance(value, dict):
+            return RedisError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+    if name == "SET":
+        key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+        exists = store.alive(key)
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return None
+        keep_ttl = b"KEEPTTL" in options
+        store.data[key] = value
+        if not keep_ttl:
+            store.expires.pop(key, None)
+        for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+            if unit in options:
+                store.expires[key] = now + int(args[2 + options.index(unit) + 1]) * scale
+        return "OK"
+    if name == "HSET":
+        if len(args) < 3 or len(args) % 2 == 0:
+            return RedisError("ERR wrong number of arguments for 'hset' command")
+        fields = store.hash(args[0], create=True)
+        added = 0
+        for i in range(1, len(args), 2):
+            added += args[i] not in fields
+            fields[args[i]] = args[i + 1]
+        return added
+    if name == "HGET":
+        fields = store.hash(args[0])
+        return fields.get(args[1]) if fields is not None else None
+    if name == "HMGET":
+        fields = store.hash(args[0]) or {}
+        return [fields.get(field) for field in args[1:]]
+    if name == "HGETALL":
+        fields = store.hash(args[0]) or {}
+        return [x for item in fields.items() for x in item]
+    if name == "HDEL":
+        fields = store.hash(args[0])
+        if fields is None:
+            return 0
+        removed = sum(1 for field in args[1:] if fields.pop(field, None) is not None)
+        if not fields:
+            store.delete(args[0])
+        return removed
+    if name == "EVAL":
+        return _eval(store, args)
+    return RedisError(f"ERR unknown command '{name.lower()}'")
+
+
+def _eval(store: _Store, args: list[bytes]):
+    """EVAL of known scripts, run as Python (atomic: one command at a time)"""
+    if len(args) < 2:
+        return RedisError("ERR wrong number of arguments for 'eval' command")
+    script, num_keys = args[0].decode(), int(args[1])
+    keys, argv = args[2 : 2 + num_keys], args[2 + num_keys :]
+    if script == HSET_IF_EXISTS_SCRIPT:
+        if not store.alive(keys[0]):
+            return -1
+        return execute(store, [b"HSET", keys[0], *argv])
+    return RedisError("ERR the stand-in server only runs the result store's scripts")
+
+
+async def serve(host: str, port: int) -> None:
+    store = _Store()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                command = await read_reply(reader)
+                if not isinstance(command, list):
+                    writer.write(_encode_reply(RedisError("ERR protocol error")))
+                    break
+                if command and command[0].upper() == b"QUIT":
+                    writer.write(_encode_reply("OK"))
+                    break
+                try:
+                    reply = execute(store, command)
+                except RedisError as e:
+                    reply = e
+                except (IndexError, ValueError):
+                    reply = RedisError("ERR syntax error")
+                writer.write(_encode_reply(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"RESP stand-in server listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Stand-in Redis (RESP2) server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+Stand-ins for the YouCam and OpenAI APIs, for local load tests of the real (non-bypass) pipeline.
+
+YouCam v2 (base URL http://HOST:PORT/s2s/v2.0):
+    POST /file/skin-analysis             presigned upload URL (points back at this server)
+    PUT  /upload/{file_id}               stores the image
+    POST /task/skin-analysis             creates a task
+    GET  /task/skin-analysis/{task_id}   "running" until --task-delay has passed, then "success"
+    GET  /results/{task_id}.zip          score_info.json + masks sized like the uploaded image,
+                                         only for the task's dst_actions
+
+OpenAI (base URL http://HOST:PORT/v1):
+    POST /chat/completions               valid analysis JSON after --openai-delay, plain or
+                                         streamed, per concern or batched
+
+Scores and masks come from app.services.mock_data. Everything is kept in
+memory; not a replacement for the real services.
+
+Usage (from backend/):
+    python -m scripts.service_stubs --port 9100 --task-delay 1.0
+    YOUCAM_BASE_URL=http://127.0.0.1:9100/s2s/v2.0 OPENAI_BASE_URL=http://127.0.0.1:9100/v1 \\
+        OPENAI_API_KEY=stub uvicorn app.main:app
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import re
+import time
+import uuid
+import zipfile
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from PIL import Image
+
+from app.services.mock_data import generate_mock_masks, generate_mock_scores
+
+YOUCAM_PREFIX = "/s2s/v2.0"
+
+# Concern keys listed in a batched prompt: - "acne": Jerawat (Score: ...)
+_BATCH_KEY = re.compile(r'^- "([a-z_0-9]+)":', re.MULTILINE)
+
+
+def create_app(task_delay_s: float, openai_delay_s: float) -> FastAPI:
+    app = FastAPI(title="YouCam/OpenAI stand-ins")
+    uploads: dict[str, bytes] = {}
+    tasks: dict[str, dict] = {}
+    stats = {"uploads": 0, "tasks": 0, "polls": 0, "zips": 0, "completions": 0}
+
+    # --- YouCam -------------------------------------------------------------
+
+    @app.post(f"{YOUCAM_PREFIX}/file/skin-analysis")
+    async def request_upload(request: Request):
+        body = await request.json()
+        file_info = body["files"][0]
+        file_id = uuid.uuid4().hex
+        base = str(request.base_url).rstrip("/")
+        return {
+            "status": 200,
+            "data": {
+                "files": [
+                    {
+                        "file_id": file_id,
+                        "requests": [
+                            {
+                                "method": "PUT",
+                                "url": f"{base}/upload/{file_id}",
+                                "headers": {"Content-Type": file_info["content_type"]},
+                            }
+                        ],
+                    }
+                ]
+            },
+        }
+
+    @app.put("/upload/{file_id}")
+    async def upload(file_id: str, request: Request):
+        uploads[file_id] = await request.body()
+        stats["uploads"] += 1
+        return Response(status_code=200)
+
+    @app.post(f"{YOUCAM_PREFIX}/task/skin-analysis")
+    async def submit(request: Request):
+        body = await request.json()
+        file_id = body["src_file_id"]
+        if file_id not in uploads:
+            return JSONResponse(status_code=400, content={"status": 400, "error": "unknown file"})
+        task_id = uuid.uuid4().hex
+        tasks[task_id] = {
+            "file_id": file_id,
+            "actions": body.get("dst_actions"),
+            "created": time.monotonic(),
+        }
+        stats["tasks"] += 1
+        return {"status": 200, "data": {"task_id": task_id}}
+
+    @app.get(f"{YOUCAM_PREFIX}/task/skin-analysis/{{task_id}}")
+    async def poll(task_id: str, request: Request):
+        task = tasks.get(task_id)
+        if task is None:
+            return {"status": 200, "data": {"task_status": "error", "error": "not_found"}}
+        stats["polls"] += 1
+        if time.monotonic() - task["created"] < task_delay_s:
+            return {"status": 200, "data": {"task_status": "running"}}
+        base = str(request.base_url).rstrip("/")
+        return {
+            "status": 200,
+            "data": {"task_status": "success", "results": {"url": f"{base}/results/{task_id}.zip"}},
+        }
+
+    @app.get("/results/{task_id}.zip")
+    async def results_zip(task_id: str):
+        task = tasks.get(task_id)
+        if task is None:
+            raise HTTPException(status_code=404)
+        if "zip" not in task:
+            task["zip"] = await asyncio.to_thread(
+                _build_zip, uploads[task["file_id"]], task["actions"]
+            )
+            uploads.pop(task["file_id"], None)
+        stats["zips"] += 1
+        return Response(task["zip"], media_type="application/zip")
+
+    # --- OpenAI -------------------------------------------------------------
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["completions"] += 1
+        await asyncio.sleep(openai_delay_s)
+
+        system_prompt = body["messages"][0]["content"]
+        user_prompt = body["messages"][-1]["content"]
+        if '"analyses"' in system_prompt:
+            keys = _BATCH_KEY.findall(user_prompt)
+            content = json.dumps({"analyses": {key: _analysis(key) for key in keys}})
+        else:
+            content = json.dumps(_analysis("concern"))
+        usage = {"prompt_tokens": 400, "completion_tokens": 350, "total_tokens": 750}
+
+        if not body.get("stream"):
+            return {"choices": [{"message": {"content": content}}], "usage": usage}
+
+        async def chunks():
+            for start in range(0, len(content), 16):
+                delta = {"choices": [{"delta": {"content": content[start : start + 16]}}]}
+                yield f"data: {json.dumps(delta)}\n\n"
+            yield f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def _build_zip(image_bytes: bytes, actions: list[str] | None = None) -> bytes:
+    """YouCam-style result ZIP with masks matching the uploaded image size"""
+    width, height = Image.open(io.BytesIO(image_bytes)).size
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+        scores = generate_mock_scores(actions)
+        zf.writestr("skinanalysisResult/score_info.json", json.dumps(scores))
+        for name, content in generate_mock_masks(width, height, actions).items():
+            zf.writestr(f"skinanalysisResult/{name}", content)
+    return buffer.getvalue()
+
+
+def _analysis(key: str) -> dict:
+    return {
+        "quantitative": f"Skor {key} berada pada kisaran menengah.",
+        "precautions": "Hindari paparan sinar matahari berlebih.",
+        "recommendations": ["Gunakan pembersih lembut", "Gunakan tabir surya setiap hari"],
+        "root_cause": "Kombinasi faktor genetik dan lingkungan.",
+        "lifestyle_tips": ["Tidur cukup", "Minum air putih"],
+        "product_ingredients": ["Niacinamide", "Ceramide"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="YouCam/OpenAI stand-ins")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument(
+        "--task-delay", type=float, default=1.0, help="Seconds until a task succeeds"
+    )
+    parser.add_argument(
+        "--openai-delay", type=float, default=0.3, help="Seconds per chat completion"
+    )
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(
+        create_app(args.task_delay, args.openai_delay),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { Activity, ChevronRight } from 'lucide-react';
 import SemiCircularGauge from './SemiCircularGauge';
 import ImageComparisonSlider from './ImageComparisonSlider';
 import ConcernDetail from './ConcernDetail';
+import {
+    composeConcernOverlays,
+    hasOverlayLayers,
+    releaseConcernOverlays,
+} from '../services/overlayLayers';
+import { imageNames, imageSource } from '../services/resultImages';
 import './ResultsDashboard.css';
 
 // Tab and concern configuration
@@ -34,12 +40,33 @@ const MENDALAM_CONCERNS = [
 export default function ResultsDashboard({ results }) {
     const [activeMainTab, setActiveMainTab] = useState('umum');
     const [activeSubTab, setActiveSubTab] = useState(null);
+    // overlay_mode=layers: concern_key -> composited overlay (object URL, revoked with the result)
+    const [layerOverlays, setLayerOverlays] = useState({});
+
+    useEffect(() => {
+        if (!hasOverlayLayers(results)) {
+            setLayerOverlays({});
+            return;
+        }
+        let cancelled = false;
+        composeConcernOverlays(results)
+            .then((overlays) => {
+                if (!cancelled) setLayerOverlays(overlays);
+            })
+            .catch((error) => console.warn('Failed to composite overlay layers:', error));
+        return () => {
+            cancelled = true;
+            releaseConcernOverlays(results);
+        };
+    }, [results]);
 
     if (!results || !results.scores) {
         return null;
     }
 
-    const { scores, composite_image, masks, original_image, analysis_texts, concern_overlays, landmark_statuses } = results;
+    const { scores, analysis_texts, landmark_statuses } = results;
+    const originalImage = imageSource(results, 'original_image');
+    const compositeImage = imageSource(results, 'composite_image');
 
     // Extract score value from various score structures
     const getScoreValue = (key) => {
@@ -55,40 +82,41 @@ export default function ResultsDashboard({ results }) {
 
     // Get mask image for a concern
     const getMaskImage = (key) => {
-        if (!masks) return null;
-
         // Find matching mask file
-        const matchingKey = Object.keys(masks).find(
+        const matchingKey = imageNames(results, 'masks').find(
             (name) => name.toLowerCase().includes(key.toLowerCase())
         );
 
-        if (matchingKey && masks[matchingKey]) {
-            return `data:image/png;base64,${masks[matchingKey]}`;
-        }
-        return null;
+        return matchingKey ? imageSource(results, 'masks', matchingKey, 'image/png') : null;
     };
 
     // Get concern overlay image (colored visualization)
     const getConcernOverlay = (key) => {
-        if (!concern_overlays) return null;
+        const cleanKey = key.replace('_v2', '');
+
+        // Layered overlays, composited in the browser
+        if (layerOverlays[cleanKey]) {
+            return layerOverlays[cleanKey];
+        }
+
+        const overlayNames = imageNames(results, 'concern_overlays');
 
         // Direct key match
-        const cleanKey = key.replace('_v2', '');
-        if (concern_overlays[cleanKey]) {
-            return `data:image/jpeg;base64,${concern_overlays[cleanKey]}`;
+        if (overlayNames.includes(cleanKey)) {
+            return imageSource(results, 'concern_overlays', cleanKey);
         }
 
         // Try partial match
-        const matchingKey = Object.keys(concern_overlays).find(
+        const matchingKey = overlayNames.find(
             (name) => name.toLowerCase().includes(cleanKey.toLowerCase())
         );
 
-        if (matchingKey && concern_overlays[matchingKey]) {
-            return `data:image/jpeg;base64,${concern_overlays[matchingKey]}`;
+        if (matchingKey) {
+            return imageSource(results, 'concern_overlays', matchingKey);
         }
 
         // Fallback to composite
-        return composite_image ? `data:image/jpeg;base64,${composite_image}` : null;
+        return compositeImage;
     };
 
     // Calculate overall scores for summary
@@ -128,11 +156,11 @@ export default function ResultsDashboard({ results }) {
             </div>
 
             {/* Main composite image with comparison slider */}
-            {original_image && composite_image && (
+            {originalImage && compositeImage && (
                 <div className="main-visual">
                     <ImageComparisonSlider
-                        beforeImage={`data:image/jpeg;base64,${original_image}`}
-                        afterImage={`data:image/jpeg;base64,${composite_image}`}
+                        beforeImage={originalImage}
+                        afterImage={compositeImage}
                         beforeLabel="Original"
                         afterLabel="Analisis"
                     />
@@ -276,14 +304,10 @@ export default function ResultsDashboard({ results }) {
                 <ConcernDetail
                     concern={currentConcern}
                     score={getScoreValue(currentConcern.key)}
-                    originalImage={
-                        original_image ? `data:image/jpeg;base64,${original_image}` : null
-                    }
+                    originalImage={originalImage}
                     maskImage={getMaskImage(currentConcern.key)}
                     concernOverlay={getConcernOverlay(currentConcern.key)}
-                    compositeImage={
-                        composite_image ? `data:image/jpeg;base64,${composite_image}` : null
-                    }
+                    compositeImage={compositeImage}
                     analysisText={analysis_texts?.[currentConcern.key.replace('_v2', '')]}
                     landmarkStatus={landmark_statuses?.[currentConcern.key.replace('_v2', '')]}
                 />
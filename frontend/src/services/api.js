@@ -7,7 +7,10 @@ import {
     generateMockResult 
 } from './mockData';
 
-const API_BASE_URL = import.meta.env.VITE_API_URL || '/api';
+export const API_BASE_URL = import.meta.env.VITE_API_URL || '/api';
+// 'layers': concern overlays as one base image plus small per-concern layers
+// (composited in the browser, see overlayLayers.js); unset = backend default
+const OVERLAY_MODE = import.meta.env.VITE_OVERLAY_MODE;
 
 // Store uploaded file for mock mode
 let _mockUploadedFile = null;
@@ -34,6 +37,7 @@ export async function uploadImage(file) {
         headers: {
             'Content-Type': 'multipart/form-data',
         },
+        params: OVERLAY_MODE ? { overlay_mode: OVERLAY_MODE } : undefined,
     });
 
     return response.data;
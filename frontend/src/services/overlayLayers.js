@@ -0,0 +1,128 @@
+/**
+ * Client-side compositing of layered concern overlays (overlay_mode=layers).
+ *
+ * The backend sends the UV-tinted image once (`overlay_base`) plus one small
+ * PNG per concern (`overlay_layers`), placed and colored per
+ * `overlay_layer_info`:
+ *   - "alpha": grayscale PNG, the gray value is the alpha of `color`
+ *   - "rgba":  PNG drawn as is (heatmap)
+ * Every concern is composited once per result and cached as an object URL,
+ * so switching concerns needs no network request and no re-render. The URLs
+ * hold the image blobs until releaseConcernOverlays() revokes them.
+ */
+
+import { imageNames, imageSource } from './resultImages';
+
+// result object -> Promise<{ concern_key: object URL }>
+const _cache = new WeakMap();
+
+function loadImage(src) {
+    return new Promise((resolve, reject) => {
+        const image = new Image();
+        // Artifact URLs are on the API host; CORS keeps the canvas exportable
+        image.crossOrigin = 'anonymous';
+        image.onload = () => resolve(image);
+        image.onerror = reject;
+        image.src = src;
+    });
+}
+
+/**
+ * Turn a grayscale alpha layer into an RGBA canvas in the layer color
+ */
+function colorizeAlphaLayer(image, color) {
+    const canvas = document.createElement('canvas');
+    canvas.width = image.width;
+    canvas.height = image.height;
+    const ctx = canvas.getContext('2d');
+    ctx.drawImage(image, 0, 0);
+
+    const pixels = ctx.getImageData(0, 0, canvas.width, canvas.height);
+    const data = pixels.data;
+    const [r, g, b] = color;
+    for (let i = 0; i < data.length; i += 4) {
+        data[i + 3] = data[i]; // Gray value = alpha
+        data[i] = r;
+        data[i + 1] = g;
+        data[i + 2] = b;
+    }
+    ctx.putImageData(pixels, 0, 0);
+    return canvas;
+}
+
+function canvasToObjectURL(canvas) {
+    return new Promise((resolve) => {
+        canvas.toBlob((blob) => resolve(URL.createObjectURL(blob)), 'image/jpeg', 0.95);
+    });
+}
+
+async function composeAll(results) {
+    const { overlay_layer_info, landmark_statuses } = results;
+    const base = await loadImage(imageSource(results, 'overlay_base'));
+
+    const canvas = document.createElement('canvas');
+    canvas.width = base.width;
+    canvas.height = base.height;
+    const ctx = canvas.getContext('2d');
+
+    // Concerns without a layer (e.g. landmarks failed, no mask) show the base only
+    const layerKeys = imageNames(results, 'overlay_layers');
+    const concernKeys = new Set([...Object.keys(landmark_statuses || {}), ...layerKeys]);
+
+    const overlays = {};
+    try {
+        for (const key of concernKeys) {
+            ctx.drawImage(base, 0, 0);
+            const info = overlay_layer_info?.[key];
+            if (layerKeys.includes(key) && info) {
+                const src = imageSource(results, 'overlay_layers', key, 'image/png');
+                const layer = await loadImage(src);
+                const source = info.format === 'alpha' ? colorizeAlphaLayer(layer, info.color) : layer;
+                ctx.drawImage(source, info.x, info.y);
+            }
+            overlays[key] = await canvasToObjectURL(canvas);
+        }
+    } catch (error) {
+        revokeAll(overlays);
+        throw error;
+    }
+    return overlays;
+}
+
+function revokeAll(overlays) {
+    Object.values(overlays).forEach((url) => URL.revokeObjectURL(url));
+}
+
+/**
+ * Check whether a result carries layered overlays
+ */
+export function hasOverlayLayers(results) {
+    const layers = results?.overlay_layers || results?.artifact_urls?.overlay_layers;
+    return Boolean(imageSource(results, 'overlay_base') && layers);
+}
+
+/**
+ * Composite every concern layer over the base image (cached per result)
+ * @returns {Promise<Object>} concern_key -> object URL of the composited image
+ */
+export function composeConcernOverlays(results) {
+    if (!hasOverlayLayers(results)) {
+        return Promise.resolve({});
+    }
+    if (!_cache.has(results)) {
+        _cache.set(results, composeAll(results));
+    }
+    return _cache.get(results);
+}
+
+/**
+ * Revoke the object URLs composited for a result (result changed or view unmounted)
+ */
+export function releaseConcernOverlays(results) {
+    const overlays = results && _cache.get(results);
+    if (!overlays) {
+        return;
+    }
+    _cache.delete(results);
+    overlays.then(revokeAll, () => {});
+}
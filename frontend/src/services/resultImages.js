@@ -0,0 +1,36 @@
+/**
+ * Image sources of an analysis result.
+ *
+ * With artifacts enabled the backend sends image URLs (`artifact_urls`,
+ * same shape as the image fields) instead of base64 strings in the JSON;
+ * the original image, mock mode and older results carry base64.
+ */
+import { API_BASE_URL } from './api';
+
+// Artifact URLs are absolute paths on the API host
+const API_ORIGIN = new URL(API_BASE_URL, window.location.href).origin;
+
+/**
+ * URL (artifact or data URL) of one image of a result
+ * @param {Object} results - Analysis result
+ * @param {string} field - Image field, e.g. 'composite_image' or 'masks'
+ * @param {string|null} name - Entry name for mapping fields (masks, concern_overlays, ...)
+ * @param {string} mimeType - MIME type of base64 data
+ * @returns {string|null}
+ */
+export function imageSource(results, field, name = null, mimeType = 'image/jpeg') {
+    const urls = results?.artifact_urls?.[field];
+    const url = name === null ? urls : urls?.[name];
+    if (typeof url === 'string') {
+        return new URL(url, API_ORIGIN).href;
+    }
+    const data = name === null ? results?.[field] : results?.[field]?.[name];
+    return data ? `data:${mimeType};base64,${data}` : null;
+}
+
+/**
+ * Entry names of a mapping image field (from the URLs or the base64 data)
+ */
+export function imageNames(results, field) {
+    return Object.keys({ ...(results?.[field] || {}), ...(results?.artifact_urls?.[field] || {}) });
+}